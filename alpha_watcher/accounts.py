@@ -0,0 +1,82 @@
+import logging
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+DEFAULT_USERNAME = 'binancezh'
+
+
+@dataclass
+class Account:
+    """一个被监控的账号及其专属配置。"""
+    username: str
+    user_id: str = ''
+    keywords: list[str] = field(default_factory=list)
+
+
+def _split_list(raw: str) -> list[str]:
+    return [item.strip() for item in raw.replace('\n', ',').split(',') if item.strip()]
+
+
+def _split_instance(url: str) -> tuple[str, str]:
+    """把实例 URL 拆成 (基础地址, 旧格式末尾的用户名)。"""
+    parts = urlsplit(url.strip())
+    if not parts.scheme or not parts.netloc:
+        return url.strip().rstrip('/'), ''
+    return f"{parts.scheme}://{parts.netloc}", parts.path.strip('/')
+
+
+def load_nitter_instances(config) -> list[str]:
+    """
+    读取 [Scraper] nitter_instances，返回去重后的实例基础地址。
+    兼容旧格式 `https://host/binancezh`：末尾用户名会被剥离，账号改由 load_accounts 决定。
+    """
+    raw = config['Scraper'].get('nitter_instances', '') if 'Scraper' in config else ''
+    instances: list[str] = []
+    for line in raw.split('\n'):
+        if not line.strip():
+            continue
+        base, _ = _split_instance(line)
+        if base not in instances:
+            instances.append(base)
+    return instances
+
+
+def load_accounts(config) -> list[Account]:
+    """
+    读取监控账号列表：
+    - [TWITTER] target_username 支持逗号分隔多个用户名
+    - 未填写时回退到旧格式实例 URL 末尾的用户名，再回退到 binancezh
+    - [Account:<username>] 段可单独覆盖 user_id 与 keywords，缺省沿用 [TWITTER]/[Scraper]
+    """
+    twitter = config['TWITTER'] if 'TWITTER' in config else {}
+    scraper = config['Scraper'] if 'Scraper' in config else {}
+
+    usernames = _split_list(twitter.get('target_username', ''))
+    if not usernames:
+        for line in scraper.get('nitter_instances', '').split('\n'):
+            _, legacy_user = _split_instance(line) if line.strip() else ('', '')
+            usernames.extend(u for u in _split_list(legacy_user) if u not in usernames)
+    if not usernames:
+        usernames = [DEFAULT_USERNAME]
+
+    default_keywords = _split_list(scraper.get('keywords', ''))
+    default_user_ids = _split_list(twitter.get('user_id', ''))
+
+    # 用户名大小写不敏感，段名按小写匹配
+    sections = {name.lower(): config[name] for name in config.sections() if name.lower().startswith('account:')}
+
+    accounts: list[Account] = []
+    seen: set[str] = set()
+    for index, username in enumerate(usernames):
+        username = username.lstrip('@')
+        if username.lower() in seen:
+            continue
+        seen.add(username.lower())
+
+        section = sections.get(f"account:{username.lower()}", {})
+        user_id = section.get('user_id', '').strip() or (default_user_ids[index] if index < len(default_user_ids) else '')
+        keywords = _split_list(section['keywords']) if 'keywords' in section else list(default_keywords)
+        accounts.append(Account(username=username, user_id=user_id, keywords=keywords))
+
+    logging.debug(f"监控账号: {[a.username for a in accounts]}")
+    return accounts
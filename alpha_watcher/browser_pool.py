@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+from .utils import USER_AGENTS
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # 可选依赖，缺失时不做 RSS 检查
+    psutil = None  # type: ignore
+
+# 默认拦截的资源类型：只需要时间线 HTML，图片、视频、字体与样式表都不必下载
+DEFAULT_BLOCKED_RESOURCES = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+
+@dataclass(frozen=True)
+class PageProfile:
+    """
+    精简抓取配置：
+    - blocked_resources: 通过路由拦截直接中止的资源类型
+    - block_third_party: 中止非实例域名的请求（统计、CDN 等）
+    - javascript: 是否启用 JS；需要 JS 验证页的实例必须保持开启
+    - viewport: 页面视口（宽, 高）
+    """
+    blocked_resources: frozenset[str] = DEFAULT_BLOCKED_RESOURCES
+    block_third_party: bool = True
+    javascript: bool = True
+    viewport: tuple[int, int] = (800, 600)
+
+    def override(self, section) -> 'PageProfile':
+        """用配置段中出现的键覆盖当前配置，解析失败的键保持原值。"""
+        changes: dict = {}
+        if 'block_resources' in section:
+            changes['blocked_resources'] = frozenset(
+                t.strip().lower() for t in section['block_resources'].split(',') if t.strip()
+            )
+        for key, attr in (('block_third_party', 'block_third_party'), ('javascript', 'javascript')):
+            if key in section:
+                changes[attr] = str(section[key]).strip().lower() not in ('0', 'false', 'no', 'off')
+        if 'viewport' in section:
+            try:
+                width, height = (int(v) for v in section['viewport'].lower().split('x'))
+                changes['viewport'] = (width, height)
+            except ValueError:
+                logging.warning(f"无效的 viewport 配置: {section['viewport']}，应为 宽x高。")
+        return replace(self, **changes)
+
+
+class _BrowserSlot:
+    """池中的单个浏览器及其常驻上下文（每种 JS/视口组合一个）。"""
+
+    def __init__(self, browser) -> None:
+        self.browser = browser
+        self.contexts: dict[tuple[bool, tuple[int, int]], object] = {}
+        self.pages_served = 0
+        self.active_pages = 0
+        self.retired = False
+        self.launched_at = time.time()
+
+    def healthy(self) -> bool:
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+    async def context_for(self, profile: PageProfile):
+        # JS 开关与视口属于上下文级设置，按组合懒创建
+        key = (profile.javascript, profile.viewport)
+        context = self.contexts.get(key)
+        if context is None:
+            width, height = profile.viewport
+            context = await self.browser.new_context(
+                user_agent=random.choice(USER_AGENTS),
+                java_script_enabled=profile.javascript,
+                viewport={'width': width, 'height': height},
+            )
+            self.contexts[key] = context
+        return context
+
+    async def close(self) -> None:
+        for context in self.contexts.values():
+            try:
+                await context.close()
+            except Exception:
+                pass
+        try:
+            if self.browser.is_connected():
+                await self.browser.close()
+        except Exception as e:
+            logging.debug(f"关闭浏览器时发生错误: {e}")
+
+
+class BrowserPool:
+    """
+    常驻 Chromium 浏览器池（async Playwright）：
+    - 跨轮询复用浏览器与上下文，避免每次抓取都冷启动 Chromium
+    - 借出页面前做健康检查，浏览器断连则自动重建
+    - 单个浏览器服务满 max_pages_per_browser 个页面，或 Chromium 进程总 RSS
+      超过 max_rss_mb 时退役：新页面改由新浏览器提供，旧浏览器在其在途页面
+      全部归还后关闭，防止长期运行时内存缓慢膨胀
+    - 页面按实例的 PageProfile 精简加载：路由拦截图片/媒体/字体/样式表与第三方请求，
+      可按实例关闭 JS、使用小视口
+    """
+
+    def __init__(
+        self,
+        playwright,
+        size: int = 1,
+        max_pages_per_browser: int = 200,
+        max_rss_mb: int = 800,
+        rss_check_interval_seconds: int = 60,
+        headless: bool = True,
+        default_profile: PageProfile | None = None,
+        instance_profiles: dict[str, PageProfile] | None = None,
+    ) -> None:
+        self.playwright = playwright
+        self.size = max(1, size)
+        self.max_pages_per_browser = max(1, max_pages_per_browser)
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_interval_seconds = rss_check_interval_seconds
+        self.headless = headless
+        self.default_profile = default_profile or PageProfile()
+        # {实例域名(小写): PageProfile}
+        self.instance_profiles = instance_profiles or {}
+
+        self._slots: list[Optional[_BrowserSlot]] = [None] * self.size
+        self._next = 0
+        self._last_rss_check = 0.0
+        self._launch_lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, playwright, config) -> 'BrowserPool':
+        """
+        从 [Browser] 配置段构造，缺省项使用默认值。
+        [Browser] 中的精简抓取项作为默认配置，[Instance:<域名>] 段可按实例覆盖。
+        """
+        cfg = config['Browser'] if 'Browser' in config else {}
+        try:
+            size = int(cfg.get('pool_size', 1))
+            max_pages = int(cfg.get('max_pages_per_browser', 200))
+            max_rss_mb = int(cfg.get('max_rss_mb', 800))
+        except Exception:
+            size, max_pages, max_rss_mb = 1, 200, 800
+
+        default_profile = PageProfile().override(cfg)
+        instance_profiles = {
+            name.split(':', 1)[1].strip().lower(): default_profile.override(config[name])
+            for name in config.sections()
+            if name.lower().startswith('instance:')
+        }
+        return cls(
+            playwright, size=size, max_pages_per_browser=max_pages, max_rss_mb=max_rss_mb,
+            default_profile=default_profile, instance_profiles=instance_profiles,
+        )
+
+    # ---------- public API ----------
+
+    def profile_for(self, url: str) -> PageProfile:
+        host = (urlsplit(url).hostname or '').lower()
+        return self.instance_profiles.get(host, self.default_profile)
+
+    @asynccontextmanager
+    async def page(self, url: str = '') -> AsyncIterator[object]:
+        """
+        借出一个按 url 所属实例精简配置的新页面，用完自动关闭；浏览器与上下文保持常驻。
+        """
+        await self._maybe_retire_by_rss()
+        index = self._next
+        self._next = (self._next + 1) % self.size
+        profile = self.profile_for(url)
+        slot, context = await self._acquire_slot(index, profile)
+
+        slot.active_pages += 1
+        slot.pages_served += 1
+        if slot.pages_served >= self.max_pages_per_browser:
+            logging.info(f"浏览器 #{index} 已服务 {slot.pages_served} 个页面，退役重建。")
+            self._retire(index)
+        try:
+            page = await context.new_page()
+            blocked = [0]
+            try:
+                if profile.blocked_resources or profile.block_third_party:
+                    await page.route('**/*', _blocking_handler(profile, urlsplit(url).hostname or '', blocked))
+                yield page
+            finally:
+                if blocked[0]:
+                    logging.debug(f"页面 {url} 拦截了 {blocked[0]} 个请求。")
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        finally:
+            slot.active_pages -= 1
+            if slot.retired and slot.active_pages == 0:
+                await slot.close()
+
+    async def close(self) -> None:
+        for index in range(self.size):
+            slot = self._slots[index]
+            self._slots[index] = None
+            if slot is not None:
+                await slot.close()
+
+    # ---------- internal ----------
+
+    async def _acquire_slot(self, index: int, profile: PageProfile) -> tuple[_BrowserSlot, object]:
+        async with self._launch_lock:
+            slot = self._slots[index]
+            if slot is not None and not slot.healthy():
+                logging.warning(f"浏览器 #{index} 已断开连接，正在重建。")
+                self._retire(index)
+                if slot.active_pages == 0:
+                    await slot.close()
+                slot = None
+            if slot is None:
+                slot = await self._launch()
+                self._slots[index] = slot
+                logging.info(f"浏览器 #{index} 已启动。")
+            return slot, await slot.context_for(profile)
+
+    async def _launch(self) -> _BrowserSlot:
+        browser = await self.playwright.chromium.launch(headless=self.headless)
+        return _BrowserSlot(browser)
+
+    def _retire(self, index: int) -> None:
+        """将浏览器移出池；无在途页面时由调用方或最后一个归还的页面关闭它。"""
+        slot = self._slots[index]
+        self._slots[index] = None
+        if slot is not None:
+            slot.retired = True
+
+    async def _maybe_retire_by_rss(self) -> None:
+        if psutil is None or self.max_rss_mb <= 0:
+            return
+        now = time.time()
+        if now - self._last_rss_check < self.rss_check_interval_seconds:
+            return
+        self._last_rss_check = now
+
+        rss_mb = _chromium_rss_mb()
+        if rss_mb <= self.max_rss_mb:
+            return
+        # 无法区分各浏览器的进程树，退役服务页面最多的那个
+        live = [(slot.pages_served, i) for i, slot in enumerate(self._slots) if slot is not None]
+        if not live:
+            return
+        _, index = max(live)
+        logging.warning(f"Chromium 总内存 {rss_mb:.0f}MB 超过阈值 {self.max_rss_mb}MB，回收浏览器 #{index}。")
+        slot = self._slots[index]
+        self._retire(index)
+        if slot is not None and slot.active_pages == 0:
+            await slot.close()
+
+
+def _blocking_handler(profile: PageProfile, host: str, blocked: list[int]):
+    """构造路由处理函数：中止被拦截的资源类型与第三方请求，其余放行。"""
+    host = host.lower()
+
+    async def handle(route, request) -> None:
+        request_host = (urlsplit(request.url).hostname or '').lower()
+        third_party = bool(host) and request_host != host and not request_host.endswith(f".{host}")
+        if request.resource_type in profile.blocked_resources or (
+            profile.block_third_party and third_party and not _is_main_navigation(request)
+        ):
+            blocked[0] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+    return handle
+
+
+def _is_main_navigation(request) -> bool:
+    # 主文档跳转（如实例重定向到其他域名）放行，第三方 iframe 仍然拦截
+    try:
+        return request.is_navigation_request() and request.frame.parent_frame is None
+    except Exception:
+        return False
+
+
+def _chromium_rss_mb() -> float:
+    """统计本进程派生的 Chromium 子进程常驻内存总和（MB）。"""
+    total = 0
+    try:
+        for child in psutil.Process(os.getpid()).children(recursive=True):
+            try:
+                name = child.name().lower()
+                if 'chrom' in name or 'headless_shell' in name:
+                    total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except Exception as e:
+        logging.debug(f"统计 Chromium 内存失败: {e}")
+    return total / (1024 * 1024)
@@ -20,9 +20,33 @@ def _get_persistent_config_path() -> str:
 CONFIG_FILE = _get_persistent_config_path()
 LOG_FILE = 'watcher.log'
 STATS_FILE = 'stats.json'
+METRICS_FILE = 'metrics.json'
+POSTING_MODEL_FILE = 'posting_model.json'
 DEDUP_STATE_FILE = 'dedup_state.json'
 
 
+def dedup_state_file_for(username: str) -> str:
+    return f"dedup_state.{username.lower()}.json"
+
+
+def adopt_legacy_dedup_state(username: str) -> None:
+    """
+    把旧版单账号部署的 dedup_state.json（连同 .journal 日志）重命名为 username 的状态文件。
+    只在该账号还没有自己的状态文件时执行一次；此后按用户名查找，调整 target_username 的顺序不会把它交给其他账号。
+    """
+    target = dedup_state_file_for(username)
+    legacy = [suffix for suffix in ('', '.journal') if os.path.exists(f"{DEDUP_STATE_FILE}{suffix}")]
+    if not legacy or any(os.path.exists(f"{target}{suffix}") for suffix in ('', '.journal')):
+        return
+    try:
+        for suffix in legacy:
+            os.replace(f"{DEDUP_STATE_FILE}{suffix}", f"{target}{suffix}")
+    except OSError as e:
+        logging.error(f"迁移旧去重状态 {DEDUP_STATE_FILE} 到 {target} 失败: {e}")
+        return
+    logging.info(f"旧去重状态 {DEDUP_STATE_FILE} 已归属 @{username}，重命名为 {target}。")
+
+
 def setup_logging() -> None:
     logging.basicConfig(
         level=logging.INFO,
@@ -55,23 +79,38 @@ def load_stats() -> dict[str, Any]:
         return {}
 
 
+def _write_json(path: str, data: Any) -> None:
+    # 先写临时文件再原子替换，进程中途退出也不会留下半截 JSON
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
 def save_stats(stats: dict[str, Any]) -> None:
     try:
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=4, ensure_ascii=False)
+        _write_json(STATS_FILE, stats)
     except IOError as e:
         logging.error(f"保存统计文件 {STATS_FILE} 时失败: {e}")
 
 
+def save_metrics(snapshot: dict[str, Any]) -> None:
+    try:
+        _write_json(METRICS_FILE, snapshot)
+    except IOError as e:
+        logging.error(f"保存指标文件 {METRICS_FILE} 时失败: {e}")
+
+
 def log_stats(stats: dict[str, Any]) -> None:
     logging.info("--- 数据源访问统计 ---")
     if not stats:
         logging.info("暂无统计数据。")
         return
 
+    sources = {name: data for name, data in stats.items() if name != 'notifications'}
     sorted_stats = sorted(
-        stats.items(),
-        key=lambda item: (item[1].get('successes', 0) / item[1].get('attempts', 1)) if isinstance(item[1], dict) else 0,
+        sources.items(),
+        key=lambda item: (item[1].get('successes', 0) / (item[1].get('attempts') or 1)) if isinstance(item[1], dict) else 0,
         reverse=True,
     )
 
@@ -82,5 +121,28 @@ def log_stats(stats: dict[str, Any]) -> None:
         attempts = data.get('attempts', 0)
         successes = data.get('successes', 0)
         success_rate = (successes / attempts * 100) if attempts > 0 else 0
-        logging.info(f"来源: {source} | 成功率: {success_rate:.2f}% (成功: {successes} / 尝试: {attempts})")
-    logging.info("--------------------") 
\ No newline at end of file
+        route = ''
+        if 'ewma_latency' in data:
+            route = f" | 平均延迟: {data['ewma_latency']:.2f}s | 熔断: {data.get('breaker', 'closed')}"
+        logging.info(f"来源: {source} | 成功率: {success_rate:.2f}% (成功: {successes} / 尝试: {attempts}){route}")
+    logging.info("--------------------") 
+
+    notifications = stats.get('notifications')
+    if isinstance(notifications, dict):
+        entries = [('通知渠道', k, v) for k, v in notifications.items() if k != 'targets']
+        targets = notifications.get('targets')
+        if isinstance(targets, dict):
+            # 统计键为地址哈希，显示时用保存的脱敏名称
+            entries += [('通知目标', v.get('name', k) if isinstance(v, dict) else k, v) for k, v in targets.items()]
+        for label, name, data in entries:
+            if not isinstance(data, dict):
+                continue
+            attempts = data.get('attempts', 0)
+            successes = data.get('successes', 0)
+            success_rate = (successes / attempts * 100) if attempts > 0 else 0
+            logging.info(
+                f"{label}: {name} | 成功率: {success_rate:.2f}% (成功: {successes} / 尝试: {attempts}) | "
+                f"重试: {data.get('retries', 0)} | 平均延迟: {data.get('ewma_latency', 0):.2f}s"
+            )
+        if notifications.get('dropped'):
+            logging.warning(f"通知队列已满累计丢弃 {notifications['dropped']} 条通知。")
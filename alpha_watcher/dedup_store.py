@@ -0,0 +1,366 @@
+import abc
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+# 条目种类：推文 ID / 内容指纹 / 近似去重 SimHash
+KIND_ID = 'id'
+KIND_FINGERPRINT = 'fp'
+KIND_SIMHASH = 'sh'
+
+_INT64_RANGE = 1 << 64
+_INT64_MAX = (1 << 63) - 1
+
+
+@dataclass
+class DedupState:
+    """去重器的完整状态快照，条目按登记顺序排列。"""
+    ids: list[tuple[int, float]] = field(default_factory=list)
+    fingerprints: list[tuple[int, float]] = field(default_factory=list)
+    simhashes: list[tuple[int, float]] = field(default_factory=list)
+    last_push_ts: float = 0.0
+    high_water_mark: int = 0
+
+
+class DedupStore(abc.ABC):
+    """
+    去重状态存储后端：
+    - append/set_meta 登记单条变更
+    - should_compact 为真时由去重器调用 compact 传入完整快照，后端据此重写或清理
+    - shared 为真的后端可被多个进程共享，去重器在本地未命中时会查询 contains
+    """
+
+    shared = False
+
+    @abc.abstractmethod
+    def load(self) -> DedupState:
+        ...
+
+    def append(self, kind: str, key: int, ts: float) -> None:
+        pass
+
+    def set_meta(self, name: str, value: float) -> None:
+        pass
+
+    def should_compact(self) -> bool:
+        return False
+
+    @staticmethod
+    def entries_of(state: DedupState, kind: str) -> list[tuple[int, float]]:
+        return {KIND_ID: state.ids, KIND_FINGERPRINT: state.fingerprints, KIND_SIMHASH: state.simhashes}[kind]
+
+    def compact(self, state: DedupState) -> None:
+        pass
+
+    def contains(self, kind: str, key: int, since: float) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class JsonStore(DedupStore):
+    """旧版行为：每次变更都把完整状态重写到 json 文件（临时文件 + os.replace）。"""
+
+    def __init__(self, state_file: str) -> None:
+        self.state_file = state_file
+
+    def load(self) -> DedupState:
+        if not os.path.exists(self.state_file):
+            return DedupState()
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return DedupState(
+            ids=_decode_entries(data.get('ids', []), _decode_id),
+            fingerprints=_decode_entries(data.get('fingerprints', []), _decode_fingerprint),
+            simhashes=_decode_entries(data.get('simhashes', []), int),
+            last_push_ts=float(data.get('last_push_ts', 0.0)),
+            high_water_mark=int(data.get('high_water_mark', 0)),
+        )
+
+    def should_compact(self) -> bool:
+        return True
+
+    def compact(self, state: DedupState) -> None:
+        # 条目按登记顺序保存为 [键, 时间戳] 列表，整数键无需转成字符串
+        data = {
+            'ids': [[k, ts] for k, ts in state.ids],
+            'fingerprints': [[k, ts] for k, ts in state.fingerprints],
+            'simhashes': [[k, ts] for k, ts in state.simhashes],
+            'last_push_ts': state.last_push_ts,
+            'high_water_mark': state.high_water_mark,
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, self.state_file)
+
+
+class JournalStore(JsonStore):
+    """
+    追加日志：
+    - 每次变更向 <state_file>.journal 追加一行，O(1) 落盘
+    - 启动时读取 json 快照再重放日志；崩溃导致的半行（含缺少换行符的末行）被截断
+    - 日志累计 compact_every 行后重写快照并清空日志
+    - fsync 为真时每行追加后 os.fsync，断电也不丢已推送的记录，但每次推送多一次磁盘同步；
+      为假时只 flush 到操作系统，进程崩溃不丢，断电可能丢最后几行（重复推送而非漏推）
+    """
+
+    def __init__(self, state_file: str, compact_every: int = 1000, fsync: bool = False) -> None:
+        super().__init__(state_file)
+        self.journal_file = f"{state_file}.journal"
+        self.compact_every = max(1, compact_every)
+        self.fsync = fsync
+        self._pending = 0
+        self._journal = None
+
+    def load(self) -> DedupState:
+        state = super().load()
+        if not os.path.exists(self.journal_file):
+            return state
+        valid_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    # 没有换行符的末行即使能解析也视为不完整，否则下一次追加会接在它后面
+                    if not line.endswith(b'\n'):
+                        raise ValueError
+                    kind, key, value = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半：截掉它，之后的追加才不会接在半行后面
+                    logging.warning(f"去重日志 {self.journal_file} 末尾不完整，已截断。")
+                    os.truncate(self.journal_file, valid_bytes)
+                    break
+                valid_bytes += len(line)
+                self._pending += 1
+                if kind in (KIND_ID, KIND_FINGERPRINT, KIND_SIMHASH):
+                    self.entries_of(state, kind).append((int(key), float(value)))
+                elif key == 'high_water_mark':
+                    state.high_water_mark = max(state.high_water_mark, int(value))
+                elif key == 'last_push_ts':
+                    state.last_push_ts = float(value)
+        return state
+
+    def append(self, kind: str, key: int, ts: float) -> None:
+        self._write([kind, key, ts])
+
+    def set_meta(self, name: str, value: float) -> None:
+        self._write(['meta', name, value])
+
+    def should_compact(self) -> bool:
+        return self._pending >= self.compact_every
+
+    def compact(self, state: DedupState) -> None:
+        # 先写快照再清空日志；两步之间崩溃时重放日志是幂等的
+        super().compact(state)
+        self.close()
+        with open(self.journal_file, 'w', encoding='utf-8'):
+            pass
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _write(self, record: list) -> None:
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._pending += 1
+
+
+class SqliteStore(DedupStore):
+    """
+    SQLite（WAL 模式）：
+    - 每次变更为一条独立的 UPSERT，O(1) 落盘；WAL 下崩溃恢复由 SQLite 保证
+    - 多个监控进程可共享同一数据库，各账号以 namespace 区分；
+      本地未命中时查询数据库，其他进程已推送的条目同样会被去重
+    - 每 compact_every 次写入清理一次过期与超出窗口的条目
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_history: int,
+        ttl_seconds: float,
+        compact_every: int = 1000,
+        legacy_state_file: str | None = None,
+    ) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.max_history = max_history
+        self.ttl_seconds = ttl_seconds
+        self.compact_every = max(1, compact_every)
+        self.legacy_state_file = legacy_state_file
+        self._pending = 0
+
+        # 自动提交模式：每条语句即一个事务
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dedup_entries ('
+            'namespace TEXT NOT NULL, kind TEXT NOT NULL, key INTEGER NOT NULL, ts REAL NOT NULL, '
+            'PRIMARY KEY (namespace, kind, key)) WITHOUT ROWID'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS dedup_entries_ts ON dedup_entries (namespace, kind, ts)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dedup_meta ('
+            'namespace TEXT NOT NULL, name TEXT NOT NULL, value, '
+            'PRIMARY KEY (namespace, name)) WITHOUT ROWID'
+        )
+
+    def load(self) -> DedupState:
+        self._migrate_legacy()
+        state = DedupState()
+        rows = self._conn.execute(
+            'SELECT kind, key, ts FROM dedup_entries WHERE namespace = ? ORDER BY ts', (self.namespace,)
+        )
+        for kind, key, ts in rows:
+            self.entries_of(state, kind).append((_from_int64(key), ts))
+        for name, value in self._conn.execute(
+            'SELECT name, value FROM dedup_meta WHERE namespace = ?', (self.namespace,)
+        ):
+            if name == 'high_water_mark':
+                state.high_water_mark = int(value)
+            elif name == 'last_push_ts':
+                state.last_push_ts = float(value)
+        return state
+
+    def append(self, kind: str, key: int, ts: float) -> None:
+        self._conn.execute(
+            'INSERT INTO dedup_entries (namespace, kind, key, ts) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (namespace, kind, key) DO UPDATE SET ts = excluded.ts',
+            (self.namespace, kind, _to_int64(key), ts),
+        )
+        self._pending += 1
+
+    def set_meta(self, name: str, value: float) -> None:
+        # 高水位只增不减，多个进程并发推进时取最大值
+        update = 'max(value, excluded.value)' if name == 'high_water_mark' else 'excluded.value'
+        self._conn.execute(
+            'INSERT INTO dedup_meta (namespace, name, value) VALUES (?, ?, ?) '
+            f'ON CONFLICT (namespace, name) DO UPDATE SET value = {update}',
+            (self.namespace, name, value),
+        )
+
+    def should_compact(self) -> bool:
+        return self._pending >= self.compact_every
+
+    def compact(self, state: DedupState) -> None:
+        expire_before = time.time() - self.ttl_seconds
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute(
+                'DELETE FROM dedup_entries WHERE namespace = ? AND ts < ?', (self.namespace, expire_before)
+            )
+            for kind in (KIND_ID, KIND_FINGERPRINT, KIND_SIMHASH):
+                self._conn.execute(
+                    'DELETE FROM dedup_entries WHERE namespace = ? AND kind = ? AND key IN ('
+                    'SELECT key FROM dedup_entries WHERE namespace = ? AND kind = ? '
+                    'ORDER BY ts DESC LIMIT -1 OFFSET ?)',
+                    (self.namespace, kind, self.namespace, kind, self.max_history),
+                )
+        self._pending = 0
+
+    def contains(self, kind: str, key: int, since: float) -> bool:
+        row = self._conn.execute(
+            'SELECT 1 FROM dedup_entries WHERE namespace = ? AND kind = ? AND key = ? AND ts >= ?',
+            (self.namespace, kind, _to_int64(key), since),
+        ).fetchone()
+        return row is not None
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _migrate_legacy(self) -> None:
+        """数据库中还没有该账号的数据时，导入旧的 json 状态文件。"""
+        if not self.legacy_state_file or not os.path.exists(self.legacy_state_file):
+            return
+        exists = self._conn.execute(
+            'SELECT 1 FROM dedup_meta WHERE namespace = ? UNION ALL '
+            'SELECT 1 FROM dedup_entries WHERE namespace = ? LIMIT 1',
+            (self.namespace, self.namespace),
+        ).fetchone()
+        if exists:
+            return
+        try:
+            legacy = JournalStore(self.legacy_state_file).load()
+        except Exception as e:
+            logging.warning(f"导入旧去重状态 {self.legacy_state_file} 失败: {e}")
+            return
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            for kind in (KIND_ID, KIND_FINGERPRINT, KIND_SIMHASH):
+                for key, ts in self.entries_of(legacy, kind):
+                    self.append(kind, key, ts)
+            self.set_meta('last_push_ts', legacy.last_push_ts)
+            if legacy.high_water_mark:
+                self.set_meta('high_water_mark', legacy.high_water_mark)
+        logging.info(f"已将 {self.legacy_state_file} 导入 {self.path}（{self.namespace}）。")
+
+
+def open_store(cfg, state_file: str, max_history: int, ttl_seconds: float) -> DedupStore:
+    """
+    按 [Dedup] store 选择后端：json（整文件重写）、journal（追加日志，默认）、sqlite（WAL，可多进程共享）。
+    sqlite 下各账号以状态文件名（去掉 .json）区分。
+    """
+    backend = str(cfg.get('store', 'journal')).strip().lower()
+    try:
+        compact_every = int(cfg.get('compact_every', 1000))
+    except ValueError:
+        compact_every = 1000
+    journal_fsync = str(cfg.get('journal_fsync', 'false')).strip().lower() in ('1', 'true', 'yes', 'on')
+
+    if backend == 'json':
+        return JsonStore(state_file)
+    if backend == 'sqlite':
+        namespace = os.path.basename(state_file)
+        if namespace.endswith('.json'):
+            namespace = namespace[:-len('.json')]
+        return SqliteStore(
+            cfg.get('sqlite_path', 'dedup_state.db'), namespace, max_history, ttl_seconds,
+            compact_every=compact_every, legacy_state_file=state_file,
+        )
+    if backend != 'journal':
+        logging.warning(f"未知的去重存储后端 {backend}，改用 journal。")
+    return JournalStore(state_file, compact_every=compact_every, fsync=journal_fsync)
+
+
+def _to_int64(key: int) -> int:
+    # SQLite INTEGER 为有符号 64 位，无符号指纹需折算
+    return key - _INT64_RANGE if key > _INT64_MAX else key
+
+
+def _from_int64(key: int) -> int:
+    return key + _INT64_RANGE if key < 0 else key
+
+
+def _decode_id(value) -> int:
+    # 旧版以字符串保存规范化后的推文 ID
+    return int(value)
+
+
+def _decode_fingerprint(value) -> int:
+    # 旧版保存 40 位十六进制 SHA1，取前 64 位即可与新指纹对应
+    if isinstance(value, str):
+        return int(value[:16], 16)
+    return int(value)
+
+
+def _decode_entries(raw, decode_key) -> list[tuple[int, float]]:
+    """兼容旧版 {键: 时间戳} 字典与新版 [[键, 时间戳], ...] 列表。"""
+    pairs = raw.items() if isinstance(raw, dict) else raw
+    return [(decode_key(k), float(ts)) for k, ts in pairs]
@@ -1,19 +1,178 @@
-import json
-import os
-import time
 import hashlib
-from typing import Optional
+import logging
+import time
+from collections import deque
+from itertools import combinations
+from math import comb
+from typing import Callable, Iterable, Iterator, Optional
+
+from .dedup_store import KIND_FINGERPRINT, KIND_ID, KIND_SIMHASH, DedupState, DedupStore, JsonStore, open_store
+from .utils import normalize_tweet_id, normalize_text_for_fingerprint, simhash64
+
+# 近似去重允许的最大汉明距离上限：分块数随之增加、每块变短，超过后候选桶过大
+_MAX_SIMHASH_DISTANCE = 7
+# 近似去重索引的哈希桶表数量上限（每条历史在每张表中各占一项）
+_MAX_SIMHASH_TABLES = 32
+
+
+class _ExpiringIndex:
+    """
+    按登记时间排序的定长 TTL 索引：
+    - 键为紧凑整数（推文 ID、64 位指纹），字典只存 键 -> 登记时间戳
+    - 登记顺序另存于 deque（每条目只多一个指针），队首始终是最早登记的条目
+    - 过期与超限淘汰都只从队首弹出，均摊 O(1)；查询 O(1)
+    """
+
+    def __init__(
+        self, max_size: int, ttl_seconds: float, on_evict: Callable[[int], None] | None = None
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._entries: dict[int, float] = {}
+        self._order: deque[int] = deque()
+        # 重复登记的键在队列中留有旧副本，弹出时跳过
+        self._stale: dict[int, int] = {}
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: int, ts: float) -> None:
+        if key in self._entries:
+            self._stale[key] = self._stale.get(key, 0) + 1
+        self._entries[key] = ts
+        self._order.append(key)
+        while len(self._entries) > self.max_size:
+            self._pop_oldest()
+
+    def expire(self, now: float) -> None:
+        expire_before = now - self.ttl_seconds
+        while self._order:
+            key = self._order[0]
+            if not self._stale.get(key) and self._entries[key] >= expire_before:
+                break
+            self._pop_oldest()
+
+    def items(self) -> Iterator[tuple[int, float]]:
+        """按登记顺序返回 (键, 时间戳)。"""
+        stale = dict(self._stale)
+        for key in self._order:
+            if stale.get(key):
+                stale[key] -= 1
+                continue
+            yield key, self._entries[key]
+
+    def load(self, pairs: Iterable[tuple[int, float]]) -> None:
+        """按时间顺序恢复条目（旧格式的字典无序，需先排序）。"""
+        self._entries.clear()
+        self._order.clear()
+        self._stale.clear()
+        for key, ts in sorted(pairs, key=lambda kv: kv[1]):
+            self.add(key, ts)
+
+    def _pop_oldest(self) -> None:
+        key = self._order.popleft()
+        count = self._stale.get(key)
+        if count:
+            # 旧副本：该键之后又被登记过，保留字典中的最新时间戳
+            if count == 1:
+                del self._stale[key]
+            else:
+                self._stale[key] = count - 1
+            return
+        del self._entries[key]
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+
+class _NearDuplicateIndex:
+    """
+    SimHash 近似去重索引（分块 LSH）：
+    - 64 位指纹均分为 max_distance + 1 + r 块，每 r + 1 块的组合对应一张哈希桶表；
+      由抽屉原理，汉明距离不超过 max_distance 的两个指纹至少有 r + 1 块完全相同，必然同桶
+    - r 按历史规模选取，使桶键位数超过 log2(max_size)，每桶候选数保持常数级；
+      查询代价与表数量成正比，而表数量随 max_size 增长（汉明距离 4 时 300 条 5 张、3000 条起 15 张），
+      因此查询是亚线性而非常数：这是以少量表换取内存的有意取舍
+    - 表数量以 _MAX_SIMHASH_TABLES 为上限（每张表都存一份全部指纹）；达到上限后桶键无法再加长，
+      距离上限较大（如 7）且历史达数万条时每桶候选数随历史线性增长
+    - 过期与淘汰复用 _ExpiringIndex
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, max_distance: int) -> None:
+        self.max_distance = max_distance
+        extra = 0
+        while True:
+            blocks = max_distance + 1 + extra
+            key_bits = (extra + 1) * 64 // blocks
+            if key_bits >= max_size.bit_length() + 2:
+                break
+            if comb(blocks + 1, extra + 2) > _MAX_SIMHASH_TABLES:
+                break
+            extra += 1
+
+        block_masks = []
+        shift = 0
+        for i in range(blocks):
+            width = 64 // blocks + (1 if i < 64 % blocks else 0)
+            block_masks.append(((1 << width) - 1) << shift)
+            shift += width
+        self._table_masks = [sum(combo) for combo in combinations(block_masks, extra + 1)]
+        self._buckets: list[dict[int, set[int]]] = [{} for _ in self._table_masks]
+        self._index = _ExpiringIndex(max_size, ttl_seconds, on_evict=self._unbucket)
+
+    def __len__(self) -> int:
+        return len(self._index)
 
-from .utils import normalize_tweet_id, normalize_text_for_fingerprint
+    def find(self, simhash: int) -> Optional[int]:
+        """返回最近的已登记指纹的汉明距离；没有足够相近的指纹时返回 None。"""
+        best: Optional[int] = None
+        for buckets, mask in zip(self._buckets, self._table_masks):
+            for candidate in buckets.get(simhash & mask, ()):
+                distance = (candidate ^ simhash).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best):
+                    best = distance
+        return best
+
+    def add(self, simhash: int, ts: float) -> None:
+        if simhash not in self._index:
+            for buckets, mask in zip(self._buckets, self._table_masks):
+                buckets.setdefault(simhash & mask, set()).add(simhash)
+        self._index.add(simhash, ts)
+
+    def expire(self, now: float) -> None:
+        self._index.expire(now)
+
+    def items(self) -> Iterator[tuple[int, float]]:
+        return self._index.items()
+
+    def load(self, pairs: Iterable[tuple[int, float]]) -> None:
+        self._buckets = [{} for _ in self._table_masks]
+        self._index.load([])
+        for simhash, ts in sorted(pairs, key=lambda kv: kv[1]):
+            self.add(simhash, ts)
+
+    def _unbucket(self, simhash: int) -> None:
+        for buckets, mask in zip(self._buckets, self._table_masks):
+            key = simhash & mask
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(simhash)
+                if not bucket:
+                    del buckets[key]
 
 
 class Deduper:
     """
     稳健的去重器：
-    - 基于 tweet_id（规范化）和内容指纹（规范化文本 + SHA1）
-    - 维护固定大小的近期窗口 + TTL 自动清理
+    - 基于 tweet_id（规范化为整数）和内容指纹（规范化文本 SHA1 的前 64 位）
+    - 可选近似去重：SimHash + 分块 LSH，换了表情、链接或时间的重发公告也视为已见
+    - 维护固定大小的近期窗口 + TTL 自动清理，过期与淘汰均摊 O(1)，可支撑数十万条历史
     - 支持最小推送间隔，避免短时重复推送
-    - 以 json 文件持久化，程序重启后保持上下文
+    - 记录已处理推文的最高 ID（高水位），下次只抓取比它更新的推文
+    - 状态由可插拔的存储后端持久化（见 dedup_store），程序重启后保持上下文
     """
 
     def __init__(
@@ -22,105 +181,180 @@ class Deduper:
         max_history: int = 200,
         ttl_seconds: int = 7 * 24 * 3600,
         min_push_interval_seconds: int = 60,
+        store: DedupStore | None = None,
+        near_duplicate_threshold: Optional[float] = None,
     ) -> None:
         self.state_file = state_file
         self.max_history = max_history
         self.ttl_seconds = ttl_seconds
         self.min_push_interval_seconds = min_push_interval_seconds
+        self.store = store or JsonStore(state_file)
 
-        self._ids: dict[str, float] = {}
-        self._fingerprints: dict[str, float] = {}
+        self._ids = _ExpiringIndex(max_history, ttl_seconds)
+        self._fingerprints = _ExpiringIndex(max_history, ttl_seconds)
+        # 相似度阈值换算为 64 位 SimHash 的最大汉明距离
+        self._near: Optional[_NearDuplicateIndex] = None
+        if near_duplicate_threshold is not None:
+            max_distance = int((1 - near_duplicate_threshold) * 64 + 1e-9)
+            if max_distance > _MAX_SIMHASH_DISTANCE:
+                logging.warning(
+                    f"近似去重阈值 {near_duplicate_threshold} 过低，"
+                    f"已按最大汉明距离 {_MAX_SIMHASH_DISTANCE} 处理。"
+                )
+                max_distance = _MAX_SIMHASH_DISTANCE
+            self._near = _NearDuplicateIndex(max_history, ttl_seconds, max(0, max_distance))
         self._last_push_ts: float = 0.0
+        self._high_water_mark: int = 0
         self._load()
         self._cleanup()
 
+    @classmethod
+    def from_config(cls, config, state_file: str) -> 'Deduper':
+        """从 [Dedup] 配置段构造，缺省项使用默认值。"""
+        cfg = config['Dedup'] if 'Dedup' in config else {}
+        try:
+            max_history = int(cfg.get('max_history', 300))
+            ttl_seconds = int(float(cfg.get('ttl_days', 7)) * 24 * 3600)
+            min_push_interval = int(cfg.get('min_push_interval', 90))
+        except ValueError:
+            max_history, ttl_seconds, min_push_interval = 300, 7 * 24 * 3600, 90
+
+        near_threshold: Optional[float] = None
+        if str(cfg.get('near_duplicate', 'false')).strip().lower() in ('1', 'true', 'yes', 'on'):
+            try:
+                near_threshold = min(1.0, max(0.0, float(cfg.get('near_duplicate_threshold', 0.93))))
+            except ValueError:
+                near_threshold = 0.93
+        return cls(
+            state_file, max_history=max_history, ttl_seconds=ttl_seconds,
+            min_push_interval_seconds=min_push_interval,
+            store=open_store(cfg, state_file, max_history, ttl_seconds),
+            near_duplicate_threshold=near_threshold,
+        )
+
     # ---------- public API ----------
 
     def seen(self, tweet_id_or_url: Optional[str], text: Optional[str]) -> bool:
-        """判断是否已见。若未知则会登记到内存，但不会写盘。"""
-        now = time.time()
-        norm_id = normalize_tweet_id(tweet_id_or_url) if tweet_id_or_url else None
+        """判断是否已见。只查询，不登记。"""
+        norm_id = self._id_key(tweet_id_or_url)
         fp = self._fingerprint(text) if text else None
 
-        # 先做 TTL 清理（轻量）
-        self._cleanup(now)
+        # 先做 TTL 清理（均摊 O(1)）
+        self._cleanup()
 
-        if norm_id and norm_id in self._ids:
+        if norm_id is not None and norm_id in self._ids:
+            return True
+        if fp is not None and fp in self._fingerprints:
             return True
-        if fp and fp in self._fingerprints:
+        if self.store.shared and self._seen_in_store(norm_id, fp):
             return True
+        if self._near is not None and text:
+            simhash = simhash64(text)
+            distance = self._near.find(simhash) if simhash is not None else None
+            if distance is not None:
+                logging.info(f"内容与近期推送近似重复（SimHash 汉明距离 {distance}）。")
+                return True
         return False
 
     def should_push(self, tweet_id_or_url: Optional[str], text: Optional[str]) -> bool:
         """是否应该推送：未见过 且 距上次推送超过最小间隔。"""
         if self.seen(tweet_id_or_url, text):
             return False
-        now = time.time()
-        if now - self._last_push_ts < self.min_push_interval_seconds:
-            return False
-        return True
+        return self.push_interval_elapsed()
+
+    def push_interval_elapsed(self) -> bool:
+        """距上次推送是否已超过最小间隔。调用方已用 seen() 判断过未见时用它，避免重复查询索引。"""
+        return time.time() - self._last_push_ts >= self.min_push_interval_seconds
 
     def mark_pushed(self, tweet_id_or_url: Optional[str], text: Optional[str]) -> None:
         """将该条目标记为已推送，并持久化到文件。"""
         now = time.time()
-        norm_id = normalize_tweet_id(tweet_id_or_url) if tweet_id_or_url else None
+        norm_id = self._id_key(tweet_id_or_url)
         fp = self._fingerprint(text) if text else None
 
-        if norm_id:
-            self._ids[norm_id] = now
-        if fp:
-            self._fingerprints[fp] = now
+        if norm_id is not None:
+            self._ids.add(norm_id, now)
+            self.store.append(KIND_ID, norm_id, now)
+        if fp is not None:
+            self._fingerprints.add(fp, now)
+            self.store.append(KIND_FINGERPRINT, fp, now)
+        simhash = simhash64(text) if self._near is not None and text else None
+        if simhash is not None:
+            self._near.add(simhash, now)
+            self.store.append(KIND_SIMHASH, simhash, now)
 
         self._last_push_ts = now
-        self._enforce_bound()
+        self.store.set_meta('last_push_ts', now)
         self._cleanup(now)
-        self._save()
+        self._persist()
+
+    @property
+    def high_water_mark(self) -> Optional[int]:
+        """已处理推文的最高 ID；尚未建立基准时为 None。"""
+        return self._high_water_mark or None
+
+    def advance_high_water_mark(self, tweet_id: int) -> None:
+        """推进高水位（只增不减），变化时持久化。"""
+        if tweet_id > self._high_water_mark:
+            self._high_water_mark = tweet_id
+            self.store.set_meta('high_water_mark', tweet_id)
+            self._persist()
+
+    def close(self) -> None:
+        self.store.close()
 
     # ---------- internal ----------
 
-    def _fingerprint(self, text: str) -> str:
+    @staticmethod
+    def _id_key(tweet_id_or_url: Optional[str]) -> Optional[int]:
+        norm_id = normalize_tweet_id(tweet_id_or_url) if tweet_id_or_url else None
+        return int(norm_id) if norm_id else None
+
+    @staticmethod
+    def _fingerprint(text: str) -> int:
+        # 取 SHA1 前 8 字节作为 64 位整数指纹，与旧版十六进制指纹的前 16 位一致
         base = normalize_text_for_fingerprint(text)
-        return hashlib.sha1(base.encode('utf-8')).hexdigest()
-
-    def _enforce_bound(self) -> None:
-        # 如果超过窗口大小，按时间淘汰
-        if len(self._ids) > self.max_history:
-            sorted_ids = sorted(self._ids.items(), key=lambda kv: kv[1])
-            for k, _ in sorted_ids[: len(self._ids) - self.max_history]:
-                self._ids.pop(k, None)
-        if len(self._fingerprints) > self.max_history:
-            sorted_fp = sorted(self._fingerprints.items(), key=lambda kv: kv[1])
-            for k, _ in sorted_fp[: len(self._fingerprints) - self.max_history]:
-                self._fingerprints.pop(k, None)
+        return int.from_bytes(hashlib.sha1(base.encode('utf-8')).digest()[:8], 'big')
+
+    def _seen_in_store(self, norm_id: Optional[int], fp: Optional[int]) -> bool:
+        """共享存储中查询其他进程登记的条目，命中后同步到本地索引。"""
+        since = time.time() - self.ttl_seconds
+        for index, kind, key in ((self._ids, KIND_ID, norm_id), (self._fingerprints, KIND_FINGERPRINT, fp)):
+            if key is not None and self.store.contains(kind, key, since):
+                index.add(key, time.time())
+                return True
+        return False
 
     def _cleanup(self, now: Optional[float] = None) -> None:
         now = now or time.time()
-        expire_before = now - self.ttl_seconds
-        self._ids = {k: ts for k, ts in self._ids.items() if ts >= expire_before}
-        self._fingerprints = {k: ts for k, ts in self._fingerprints.items() if ts >= expire_before}
+        self._ids.expire(now)
+        self._fingerprints.expire(now)
+        if self._near is not None:
+            self._near.expire(now)
+
+    def _state(self) -> DedupState:
+        return DedupState(
+            ids=list(self._ids.items()),
+            fingerprints=list(self._fingerprints.items()),
+            simhashes=list(self._near.items()) if self._near is not None else [],
+            last_push_ts=self._last_push_ts,
+            high_water_mark=self._high_water_mark,
+        )
 
     def _load(self) -> None:
-        if not os.path.exists(self.state_file):
-            return
         try:
-            with open(self.state_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self._ids = {str(k): float(v) for k, v in data.get('ids', {}).items()}
-            self._fingerprints = {str(k): float(v) for k, v in data.get('fingerprints', {}).items()}
-            self._last_push_ts = float(data.get('last_push_ts', 0.0))
-        except Exception:
+            state = self.store.load()
+        except Exception as e:
             # 读取失败时尽量不影响主流程
-            self._ids = {}
-            self._fingerprints = {}
-            self._last_push_ts = 0.0
-
-    def _save(self) -> None:
-        data = {
-            'ids': self._ids,
-            'fingerprints': self._fingerprints,
-            'last_push_ts': self._last_push_ts,
-        }
-        tmp_file = f"{self.state_file}.tmp"
-        with open(tmp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_file, self.state_file) 
\ No newline at end of file
+            logging.warning(f"读取去重状态失败，将从空状态开始: {e}")
+            state = DedupState()
+        self._ids.load(state.ids)
+        self._fingerprints.load(state.fingerprints)
+        if self._near is not None:
+            self._near.load(state.simhashes)
+        self._last_push_ts = state.last_push_ts
+        self._high_water_mark = state.high_water_mark
+
+    def _persist(self) -> None:
+        if self.store.should_compact():
+            self.store.compact(self._state())
@@ -0,0 +1,425 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from .metrics import REGISTRY
+from .notifier import WECOM_MAX_BYTES, NotifyError, SmtpMailer, WeComSender, email_configured, webhook_id, webhook_name, wecom_webhook_urls
+
+
+class Notification(NamedTuple):
+    """一条待推送的通知；channels 为空集合时不推送到任何渠道。"""
+    subject: str
+    text: str
+    channels: frozenset[str]
+    enqueued_at: float = 0.0  # time.monotonic()，用于统计排队时间
+    trace_ids: tuple[int, ...] = ()  # 对应的推文 ID，合并摘要时为多条
+
+
+class _Target(NamedTuple):
+    """一个具体的推送目标：所属渠道、统计中的键、日志中的名称与发送协程。"""
+    channel: str
+    key: str
+    name: str
+    send: Callable[[Notification], Awaitable[None]]
+
+
+class _ChannelStats:
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.ewma_latency = 0.0
+        self.last_error = ''
+
+    def record(self, ok: bool, latency: float, alpha: float = 0.3) -> None:
+        self.attempts += 1
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.ewma_latency = latency if self.attempts == 1 else (1 - alpha) * self.ewma_latency + alpha * latency
+
+    def restore(self, data: dict[str, Any]) -> None:
+        try:
+            self.attempts = int(data.get('attempts', 0))
+            self.successes = int(data.get('successes', 0))
+            self.failures = int(data.get('failures', 0))
+            self.retries = int(data.get('retries', 0))
+            self.ewma_latency = float(data.get('ewma_latency', 0.0))
+            self.last_error = str(data.get('last_error', ''))
+        except (TypeError, ValueError):
+            pass
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'failures': self.failures,
+            'retries': self.retries,
+            'ewma_latency': round(self.ewma_latency, 3),
+            'last_error': self.last_error,
+        }
+
+
+# 各渠道单条消息的字节上限，合并摘要超过时提前发送，避免被截断
+_DIGEST_BYTE_LIMITS = {'wecom': WECOM_MAX_BYTES}
+
+_SEND_SECONDS = 'watcher_notify_send_seconds'
+_SEND_HELP = '单次通知发送耗时（秒），按渠道与结果区分'
+
+
+class _DigestBuffer:
+    """某个渠道正在合并的通知。"""
+
+    def __init__(self) -> None:
+        self.items: list[Notification] = []
+        self.first_at = 0.0
+        self.last_at = 0.0
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class _Lane:
+    """一个推送目标的独立队列：目标之间互不阻塞，同一目标内按入队顺序发送。"""
+
+    def __init__(self, target: _Target, queue_size: int) -> None:
+        self.target = target
+        self.queue: asyncio.Queue[Notification] = asyncio.Queue(maxsize=max(1, queue_size))
+
+
+class NotificationDispatcher:
+    """
+    后台通知派发：
+    - 抓取循环只调用 submit() 入队即返回，由后台 worker 发送
+    - 每个推送目标（邮件、每个企业微信 webhook）各有一个有界队列与 worker，
+      一条通知同时进入所有目标的队列并发推送；某个目标限速排队或重试时不会拖住其他目标
+    - 同一目标只在 workers = 1 时按入队顺序送达；workers > 1 时该目标的多个 worker 并发发送，
+      正在退避重试的通知会被后入队的通知超过
+    - 每个目标独立重试，指数退避（retry_backoff × 2^n，上限 retry_backoff_max），
+      不可重试的错误（认证失败、webhook 失效）直接放弃
+    - 队列满时丢弃该目标的新通知并记入统计，避免下游长期故障时无限堆积
+    - 突发合并（coalesce_window > 0）：渠道空闲时第一条通知立即发送；此后陆续命中的通知按渠道收集，
+      在 coalesce_window 秒内无新通知或距第一条已达 coalesce_max_delay 秒时合并为一条摘要发送，
+      条数或长度达到上限时提前发送
+    - 按渠道与按目标的发送次数、失败、重试与 EWMA 延迟随 stats.json 保存
+    """
+
+    def __init__(
+        self,
+        targets: list[_Target],
+        mailer: SmtpMailer | None = None,
+        wecom: WeComSender | None = None,
+        queue_size: int = 100,
+        workers: int = 1,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+        retry_backoff_max: float = 60.0,
+        coalesce_window: float = 0.0,
+        coalesce_max_delay: float = 30.0,
+        coalesce_max_items: int = 20,
+    ) -> None:
+        self.targets = targets
+        self.mailer = mailer
+        self.wecom = wecom
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.coalesce_window = max(0.0, coalesce_window)
+        self.coalesce_max_delay = max(self.coalesce_window, coalesce_max_delay)
+        self.coalesce_max_items = max(1, coalesce_max_items)
+        self._lanes = [_Lane(target, queue_size) for target in targets]
+        self._buffers: dict[str, _DigestBuffer] = {}
+        self._last_sent: dict[str, float] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._keepalive_task: asyncio.Task | None = None
+        self._stats: dict[str, _ChannelStats] = {}
+        self._target_stats: dict[str, _ChannelStats] = {}
+        self.dropped = 0
+        # 每个推送目标对一条通知给出最终结果（送达或放弃）时回调 (通知, 渠道, 是否送达)
+        self.on_result: Callable[[Notification, str, bool], None] | None = None
+
+    @classmethod
+    def from_config(cls, config, stats: dict[str, Any] | None = None) -> 'NotificationDispatcher':
+        """从 [Notify] 配置段构造，推送目标取自 [Email] 与 [WeCom]，并从 stats 恢复历史统计。"""
+        targets: list[_Target] = []
+        mailer = None
+        if email_configured(config):
+            mailer = SmtpMailer.from_config(config)
+
+            # smtplib 为阻塞调用，放到线程中执行；会话常驻，连续多封邮件共用一次握手
+            async def email(n: Notification, p_mailer: SmtpMailer = mailer) -> None:
+                await asyncio.to_thread(p_mailer.send, n.subject, n.text)
+            targets.append(_Target('email', 'email', 'email', email))
+
+        urls = wecom_webhook_urls(config)
+        wecom = WeComSender.from_config(config, len(urls)) if urls else None
+        for url in urls:
+            async def post(n: Notification, p_url: str = url, p_sender: WeComSender = wecom) -> None:
+                await p_sender.send(p_url, f"{n.subject}\n{n.text}")
+            targets.append(_Target('wecom', webhook_id(url), webhook_name(url), post))
+
+        cfg = config['Notify'] if 'Notify' in config else {}
+        try:
+            dispatcher = cls(
+                targets,
+                mailer,
+                wecom,
+                queue_size=int(cfg.get('queue_size', 100)),
+                workers=int(cfg.get('workers', 1)),
+                max_attempts=int(cfg.get('max_attempts', 3)),
+                retry_backoff=float(cfg.get('retry_backoff', 2)),
+                retry_backoff_max=float(cfg.get('retry_backoff_max', 60)),
+                coalesce_window=float(cfg.get('coalesce_window', 10)),
+                coalesce_max_delay=float(cfg.get('coalesce_max_delay', 30)),
+                coalesce_max_items=int(cfg.get('coalesce_max_items', 20)),
+            )
+        except ValueError:
+            logging.warning("[Notify] 配置无效，使用默认派发参数。")
+            dispatcher = cls(targets, mailer, wecom)
+        if stats:
+            dispatcher.restore(stats)
+        return dispatcher
+
+    # ---------- public API ----------
+
+    def start(self) -> None:
+        if not self.targets:
+            logging.warning("未配置任何通知渠道（邮件或企业微信），命中的推文只会记录在日志中。")
+        elif self.workers > 1:
+            logging.info(f"[Notify] workers = {self.workers}：同一目标的通知并发发送，不保证按入队顺序送达。")
+        for lane in self._lanes:
+            for i in range(self.workers):
+                self._tasks.append(asyncio.create_task(self._worker(lane), name=f"notify-{lane.target.name}-{i}"))
+        if self.mailer is not None and self.mailer.keepalive_interval > 0:
+            self._keepalive_task = asyncio.create_task(self._keepalive(self.mailer), name="smtp-keepalive")
+
+    @property
+    def coalescing(self) -> bool:
+        return self.coalesce_window > 0
+
+    def target_channels(self, channels: frozenset[str]) -> list[str]:
+        """一条发往 channels 的通知会进入哪些目标：每个目标给出其渠道。"""
+        return [target.channel for target in self.targets if target.channel in channels]
+
+    def submit(self, subject: str, text: str, channels: frozenset[str], trace_ids: tuple[int, ...] = ()) -> bool:
+        """放入合并缓冲或相应目标的队列后立即返回；有目标队列已满而丢弃时返回 False。"""
+        notification = Notification(subject, text, channels, time.monotonic(), trace_ids)
+        if not self.coalescing:
+            return self._enqueue(notification)
+        accepted = True
+        for channel in sorted(channels):
+            accepted = self._coalesce(channel, notification._replace(channels=frozenset((channel,)))) and accepted
+        return accepted
+
+    def flush(self) -> None:
+        """立即发送所有渠道正在合并的通知。"""
+        for channel in list(self._buffers):
+            self._flush(channel)
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """发出合并中的通知并等待队列发送完毕（最多 timeout 秒），然后停止 worker 并关闭连接。"""
+        self.flush()
+        if self._tasks:
+            pending = sum(lane.queue.qsize() for lane in self._lanes)
+            if pending:
+                logging.info(f"等待 {pending} 条通知发送完成...")
+            try:
+                await asyncio.wait_for(asyncio.gather(*(lane.queue.join() for lane in self._lanes)), timeout)
+            except asyncio.TimeoutError:
+                remaining = sum(lane.queue.qsize() for lane in self._lanes)
+                logging.warning(f"通知队列 {timeout:.0f} 秒内未清空，放弃剩余 {remaining} 条。")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks.clear()
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            await asyncio.gather(self._keepalive_task, return_exceptions=True)
+            self._keepalive_task = None
+        if self.mailer is not None:
+            await asyncio.to_thread(self.mailer.close)
+        if self.wecom is not None:
+            await self.wecom.close()
+
+    def restore(self, stats: dict[str, Any]) -> None:
+        section = stats.get('notifications')
+        if not isinstance(section, dict):
+            return
+        for channel, data in section.items():
+            if channel != 'targets' and isinstance(data, dict):
+                self._stats.setdefault(channel, _ChannelStats()).restore(data)
+        targets = section.get('targets')
+        if isinstance(targets, dict):
+            # 旧版以 key 末 6 位（日志名称）为键，迁移到当前目标的统计键
+            legacy = {target.name: target.key for target in self.targets}
+            for key, data in targets.items():
+                if isinstance(data, dict):
+                    self._target_stats.setdefault(legacy.get(key, key), _ChannelStats()).restore(data)
+        try:
+            self.dropped = int(section.get('dropped', 0))
+        except (TypeError, ValueError):
+            self.dropped = 0
+
+    def export(self, stats: dict[str, Any]) -> None:
+        """把按渠道与按目标的统计写入 stats['notifications']，随 stats.json 一起保存。"""
+        section = stats.setdefault('notifications', {})
+        for channel, channel_stats in self._stats.items():
+            section[channel] = channel_stats.to_dict()
+        # 已不在配置中的目标沿用上次保存的名称
+        previous = section.get('targets') if isinstance(section.get('targets'), dict) else {}
+        names = {key: data.get('name', key) for key, data in previous.items() if isinstance(data, dict)}
+        names.update((target.key, target.name) for target in self.targets)
+        section['targets'] = {
+            key: {'name': names.get(key, key), **target_stats.to_dict()}
+            for key, target_stats in self._target_stats.items()
+        }
+        section['dropped'] = self.dropped
+
+    # ---------- internal ----------
+
+    def _enqueue(self, notification: Notification) -> bool:
+        accepted = True
+        for lane in self._lanes:
+            if lane.target.channel not in notification.channels:
+                continue
+            try:
+                lane.queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                REGISTRY.counter('watcher_notify_dropped_total', '队列已满被丢弃的通知数', channel=lane.target.channel).inc()
+                self._report(notification, lane.target.channel, False)
+                accepted = False
+                logging.error(f"通知目标 {lane.target.name} 的队列已满（{lane.queue.maxsize} 条），丢弃通知: {notification.subject}")
+        return accepted
+
+    def _coalesce(self, channel: str, notification: Notification) -> bool:
+        now = notification.enqueued_at
+        buffer = self._buffers.setdefault(channel, _DigestBuffer())
+        if not buffer.items and now - self._last_sent.get(channel, float('-inf')) >= self.coalesce_window:
+            # 渠道空闲：第一条立即发送，不为合并付出任何延迟
+            self._last_sent[channel] = now
+            return self._enqueue(notification)
+
+        accepted = True
+        if buffer.items:
+            limit = _DIGEST_BYTE_LIMITS.get(channel)
+            too_long = limit is not None and len(_render_digest(buffer.items + [notification]).encode('utf-8')) > limit
+            if too_long or len(buffer.items) >= self.coalesce_max_items:
+                accepted = self._flush(channel)
+        if not buffer.items:
+            buffer.first_at = now
+        buffer.items.append(notification)
+        buffer.last_at = now
+
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        flush_at = min(buffer.last_at + self.coalesce_window, buffer.first_at + self.coalesce_max_delay)
+        buffer.timer = asyncio.get_running_loop().call_later(max(0.0, flush_at - time.monotonic()), self._flush, channel)
+        return accepted
+
+    def _flush(self, channel: str) -> bool:
+        buffer = self._buffers.get(channel)
+        if buffer is None or not buffer.items:
+            return True
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+            buffer.timer = None
+        items, buffer.items = buffer.items, []
+        self._last_sent[channel] = time.monotonic()
+        if len(items) > 1:
+            logging.info(f"合并 {len(items)} 条通知为一条 {channel} 摘要，首条已等待 {time.monotonic() - items[0].enqueued_at:.1f} 秒。")
+        return self._enqueue(_digest(items))
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            notification = await lane.queue.get()
+            try:
+                waited = time.monotonic() - notification.enqueued_at
+                if waited > 1:
+                    logging.info(f"通知在 {lane.target.name} 队列中等待 {waited:.1f} 秒后开始发送: {notification.subject}")
+                await self._deliver(lane.target, notification)
+            except Exception as e:
+                logging.error(f"通知派发发生未处理错误: {e}")
+            finally:
+                lane.queue.task_done()
+
+    def _report(self, notification: Notification, channel: str, ok: bool) -> None:
+        if self.on_result is None or not notification.trace_ids:
+            return
+        try:
+            self.on_result(notification, channel, ok)
+        except Exception as e:
+            logging.error(f"通知结果回调出错: {e}")
+
+    async def _keepalive(self, mailer: SmtpMailer) -> None:
+        """启动时预先登录 SMTP，此后每隔 keepalive_interval 秒保活一次。"""
+        while True:
+            await asyncio.to_thread(mailer.keepalive)
+            await asyncio.sleep(mailer.keepalive_interval)
+
+    async def _deliver(self, target: _Target, notification: Notification) -> None:
+        stats = (
+            self._stats.setdefault(target.channel, _ChannelStats()),
+            self._target_stats.setdefault(target.key, _ChannelStats()),
+        )
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.monotonic()
+            try:
+                await target.send(notification)
+            except NotifyError as e:
+                elapsed = time.monotonic() - started
+                REGISTRY.histogram(_SEND_SECONDS, _SEND_HELP, channel=target.channel, outcome='error').observe(elapsed)
+                for s in stats:
+                    s.record(False, elapsed)
+                    s.last_error = str(e)[:200]
+                if not e.retryable or attempt == self.max_attempts:
+                    logging.error(f"通知目标 {target.name} 发送失败（第 {attempt} 次，放弃）: {e}")
+                    self._report(notification, target.channel, False)
+                    return
+                delay = min(self.retry_backoff_max, self.retry_backoff * 2 ** (attempt - 1))
+                logging.warning(f"通知目标 {target.name} 发送失败（第 {attempt} 次），{delay:.1f} 秒后重试: {e}")
+                for s in stats:
+                    s.retries += 1
+                await asyncio.sleep(delay)
+            else:
+                now = time.monotonic()
+                REGISTRY.histogram(_SEND_SECONDS, _SEND_HELP, channel=target.channel, outcome='ok').observe(now - started)
+                # 从入队（合并摘要为首条入队）到送达的端到端耗时，包含排队、合并等待与重试
+                REGISTRY.histogram(
+                    'watcher_notify_delivery_seconds', '通知从入队到送达的耗时（秒）', channel=target.channel
+                ).observe(now - notification.enqueued_at)
+                for s in stats:
+                    s.record(True, now - started)
+                self._report(notification, target.channel, True)
+                return
+
+
+def _render_digest(items: list[Notification]) -> str:
+    """摘要正文：按命中顺序编号；主题不同（多账号）时每条附上主题。"""
+    if len(items) == 1:
+        return f"{items[0].subject}\n{items[0].text}"
+    same_subject = len({n.subject for n in items}) == 1
+    body = "\n\n".join(
+        f"[{i}] {n.text}" if same_subject else f"[{i}] {n.subject}\n{n.text}"
+        for i, n in enumerate(items, 1)
+    )
+    return f"{_digest_subject(items)}\n{body}"
+
+
+def _digest_subject(items: list[Notification]) -> str:
+    subjects = list(dict.fromkeys(n.subject for n in items))
+    if len(subjects) == 1:
+        return f"{subjects[0]}（{len(items)} 条合并）"
+    return f"【重要提醒】{len(items)} 条新动态合并推送"
+
+
+def _digest(items: list[Notification]) -> Notification:
+    """把同一渠道的多条通知合并为一条；排队时间从第一条算起。"""
+    if len(items) == 1:
+        return items[0]
+    first = items[0]
+    body = _render_digest(items).split("\n", 1)[1]
+    trace_ids = tuple(tweet_id for n in items for tweet_id in n.trace_ids)
+    return Notification(_digest_subject(items), body, first.channels, first.enqueued_at, trace_ids)
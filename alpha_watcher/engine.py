@@ -0,0 +1,389 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from playwright.async_api import async_playwright
+
+from .accounts import Account, load_accounts, load_nitter_instances
+from .browser_pool import BrowserPool
+from .config_loader import POSTING_MODEL_FILE, adopt_legacy_dedup_state, dedup_state_file_for, load_stats, log_stats, save_metrics, save_stats
+from .deduper import Deduper
+from .dispatcher import Notification, NotificationDispatcher
+from .fetchers import TimelineFetch, Tweet, get_latest_tweets_from_api, get_latest_tweets_from_nitter
+from .freshness import FreshnessTracker
+from .hedge import HedgedFetcher
+from .metrics import INTERVAL_BUCKETS, REGISTRY, MetricsServer, metrics_server_from_config
+from .nitter_http import NitterHttpClient
+from .posting_model import PostingHistogram
+from .router import InstanceRouter
+from .rules import RuleEngine, channels_for
+from .scheduler import AdaptiveSchedule, PollTimer, get_sleep_duration, schedule_window
+from .tracing import DetectionTracer
+from .utils import BJT
+
+
+class _AccountState:
+    """单个账号的去重器；去重状态中同时保存该账号的高水位 ID。"""
+
+    def __init__(self, config, account: Account) -> None:
+        self.account = account
+        # 初始化去重器
+        self.deduper = Deduper.from_config(config, dedup_state_file_for(account.username))
+
+
+class AsyncWatcher:
+    """
+    基于 asyncio 的监控引擎：
+    - 抓取（async Playwright + httpx）、解析、去重与通知在同一个事件循环内交错执行
+    - 通知只入队即返回，由 NotificationDispatcher 的后台 worker 并发推送、失败重试，不阻塞下一轮抓取
+    - 来源顺序由 InstanceRouter 按实测延迟与成功率决定，熔断来源在后台探测恢复
+    - 一个进程监控多个账号：每个来源一次批量抓取全部账号，去重、基准与关键词按账号独立
+    - 每轮抓取比高水位更新的全部推文并按时间顺序处理，两次检查之间连发多条也不会漏掉
+    """
+
+    def __init__(self, config) -> None:
+        self.config = config
+        self.all_nitter_instances = load_nitter_instances(config)
+        self.accounts = load_accounts(config)
+        self.usernames = [a.username for a in self.accounts]
+        # 旧版单账号的去重状态归首个账号（即升级前唯一的 target_username），重命名后按用户名查找
+        adopt_legacy_dedup_state(self.accounts[0].username)
+        self.states = {a.username.lower(): _AccountState(config, a) for a in self.accounts}
+        # 关键词与 [Rule:*] 规则启动时编译一次，每条推文单次扫描得到全部命中规则
+        self.rules = RuleEngine.from_config(config, self.accounts)
+        try:
+            self.batch_size = max(1, int(config['Scraper'].get('batch_size', 10)))
+        except ValueError:
+            self.batch_size = 10
+
+        self.stats = load_stats()
+        self.router = InstanceRouter.from_config(config, self.stats)
+        self.hedger = HedgedFetcher.from_config(config)
+        # 按 Snowflake ID 比较各镜像的新鲜度，缓存滞后计入路由代价
+        self.freshness = FreshnessTracker()
+        self.freshness.seed(self._since_ids())
+        metrics = config['Metrics'] if 'Metrics' in config else {}
+        try:
+            # 统计与指标按固定间隔落盘，而不是每轮检查都重写文件；0 表示每轮都落盘
+            self.flush_interval = max(0.0, float(metrics.get('flush_interval', 60)))
+        except ValueError:
+            self.flush_interval = 60.0
+        self._last_flush = time.monotonic()
+        # 追踪每条新推文从发布到送达的各阶段，按发布时刻所处的调度时段归类
+        self.tracer = DetectionTracer.from_config(
+            config, lambda created: schedule_window(config, datetime.fromtimestamp(created, BJT))
+        )
+        # 发帖时间直方图始终累积；[Schedule] mode = adaptive 时据此分配检查次数
+        self.posting = PostingHistogram.load(POSTING_MODEL_FILE)
+        self.schedule = AdaptiveSchedule.from_config(config, self.posting)
+        self.timer = PollTimer.from_config(config)
+
+        self.pool: BrowserPool | None = None
+        self.http: NitterHttpClient | None = None
+        self.dispatcher: NotificationDispatcher | None = None
+        self.metrics_server: MetricsServer | None = None
+        self._probe_tasks: set[asyncio.Task] = set()
+
+    # ---------- public API ----------
+
+    async def run(self) -> None:
+        if not len(self.rules):
+            logging.error("配置文件中缺少关键词或匹配规则。")
+            return
+        if not self.all_nitter_instances and not self._api_ready():
+            logging.error("配置文件中既没有 Nitter 实例，也没有配置 Twitter API。")
+            return
+
+        logging.info(f"Nitter实例: {self.all_nitter_instances}")
+        for account in self.accounts:
+            logging.info(f"监控账号 @{account.username}，关键词: {account.keywords}")
+        logging.info(f"已编译 {len(self.rules)} 条匹配规则: {[r.name for r in self.rules.rules]}")
+
+        async with async_playwright() as playwright:
+            self._start(playwright)
+            try:
+                await self._start_metrics_server()
+                await self._init_baseline()
+                await self._loop()
+            finally:
+                await self._shutdown()
+
+    # ---------- internal ----------
+
+    def _start(self, playwright) -> None:
+        """创建抓取与派发所需的长生命周期对象；与 _shutdown 成对使用。"""
+        # 浏览器池在初始化与主循环之间共享，避免每次抓取都冷启动 Chromium
+        self.pool = BrowserPool.from_config(playwright, self.config)
+        # 静态 HTML 快速通道，仅在遇到验证页面时才升级到浏览器
+        self.http = NitterHttpClient.from_config(self.config)
+        self.dispatcher = NotificationDispatcher.from_config(self.config, self.stats)
+        if self.tracer is not None:
+            self.dispatcher.on_result = self._on_notify_result
+        self.dispatcher.start()
+
+    def _api_ready(self) -> bool:
+        """API 需要 bearer_token，且每个账号都配置了 user_id 才能覆盖全部账号。"""
+        twitter = self.config['TWITTER'] if 'TWITTER' in self.config else {}
+        return bool(twitter.get('bearer_token', '').strip()) and all(a.user_id for a in self.accounts)
+
+    def _since_ids(self) -> dict[str, int]:
+        """各账号已持久化的高水位；尚未建立基准的账号不在其中。"""
+        return {
+            username: state.deduper.high_water_mark
+            for username, state in self.states.items()
+            if state.deduper.high_water_mark is not None
+        }
+
+    def _source_factories(self) -> dict:
+        since_ids = self._since_ids()
+        factories = {}
+        for instance in self.all_nitter_instances:
+            factories[instance] = lambda p_instance=instance: get_latest_tweets_from_nitter(
+                self.pool, p_instance, self.usernames, self.stats, self.http, self.batch_size, since_ids
+            )
+        if self._api_ready():
+            factories["Twitter API"] = lambda: get_latest_tweets_from_api(self.config, self.accounts, self.stats, since_ids)
+        return factories
+
+    def _build_sources(self):
+        """按路由器给出的顺序构造本轮来源，并在后台探测半开的熔断来源。"""
+        factories = self._source_factories()
+        for name in self.router.due_probes(list(factories)):
+            logging.info(f"后台探测熔断来源: {name}")
+            task = asyncio.create_task(self._timed(name, factories[name])())
+            self._probe_tasks.add(task)
+            task.add_done_callback(self._probe_tasks.discard)
+        return [(name, self._timed(name, factories[name])) for name in self.router.order(list(factories))]
+
+    def _timed(self, name: str, factory):
+        """包装抓取函数，把延迟与成败记入路由器和指标。"""
+        def observe(outcome: str, elapsed: float) -> None:
+            REGISTRY.histogram(
+                'watcher_fetch_seconds', '单个来源一次抓取的耗时（秒），按来源与结果区分', source=name, outcome=outcome
+            ).observe(elapsed)
+
+        async def run():
+            started = time.monotonic()
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                elapsed = time.monotonic() - started
+                self.router.record_cancelled(name, elapsed)
+                observe('cancelled', elapsed)
+                raise
+            except Exception:
+                elapsed = time.monotonic() - started
+                self.router.record(name, False, elapsed)
+                observe('error', elapsed)
+                raise
+            elapsed = time.monotonic() - started
+            self.router.record(name, result is not None, elapsed)
+            observe('ok' if result is not None else 'empty', elapsed)
+            if isinstance(result, TimelineFetch):
+                self._record_freshness(name, result)
+            return result
+        return run
+
+    def _record_freshness(self, name: str, result: TimelineFetch) -> None:
+        cache_lag = self.freshness.observe(result)
+        if cache_lag is None:
+            return
+        self.router.record_freshness(name, cache_lag)
+        REGISTRY.gauge('watcher_cache_lag_seconds', '来源最近一次抓取相对已知最新推文的缓存滞后（秒）', source=name).set(cache_lag)
+        if cache_lag > 0:
+            logging.info(f"来源 {name} 的缓存落后已知最新推文约 {cache_lag:.0f} 秒。")
+
+    async def _init_baseline(self) -> None:
+        # 已有高水位的账号沿用持久化的基准，并补处理停机期间的新推文；
+        # 其余账号获取一次最新 ID 作为基准，以避免首次重复
+        for username, since_id in self._since_ids().items():
+            logging.info(f"@{username} 沿用已保存的高水位推文ID: {since_id}")
+        logging.info("正在进行初始化，获取最新的推文ID作为基准...")
+        result: TimelineFetch | None = None
+        winner = None
+        deferred = False
+        try:
+            result, winner = await self.hedger.fetch(self._build_sources(), self.freshness.select)
+        except Exception as e:
+            logging.error(f"初始化获取器执行失败: {e}")
+        fetched_at = time.time()
+
+        for username, batch in (result.tweets if result else {}).items():
+            state = self.states.get(username)
+            if state is None:
+                continue
+            if state.deduper.high_water_mark is None:
+                state.deduper.advance_high_water_mark(batch[-1].tweet_id)
+                logging.info(f"@{username} 初始化成功，基准推文ID为: {batch[-1].tweet_id}")
+            elif not self._process_batch(state, batch, winner, fetched_at):
+                deferred = True
+        if result is not None and not deferred:
+            self._commit(result)
+
+        missing = [s.account.username for s in self.states.values() if s.deduper.high_water_mark is None]
+        if missing:
+            logging.warning(f"账号 {missing} 初始化失败，无法获取任何推文ID。将从头开始检查，首次运行可能产生重复通知。")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # 间隔在本轮开始时确定，下次检查从本轮开始时刻起算，抓取耗时不累加为漂移
+                self.timer.begin()
+                sleep_duration = self.schedule.sleep_duration() if self.schedule else get_sleep_duration(self.config)
+                REGISTRY.gauge('watcher_poll_interval_seconds', '调度器给出的当前检查间隔（秒）').set(sleep_duration)
+                REGISTRY.histogram(
+                    'watcher_poll_interval_distribution_seconds', '调度器给出的检查间隔分布（秒）', INTERVAL_BUCKETS
+                ).observe(sleep_duration)
+                with REGISTRY.timer('watcher_poll_seconds', '一轮检查（抓取、去重、匹配、入队）的耗时（秒）'):
+                    await self._poll_once()
+                self.timer.schedule(sleep_duration)
+                await self.timer.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"主循环发生未捕获的异常: {e}")
+                logging.info("将在一分钟后重试...")
+                await asyncio.sleep(60)
+
+    async def _poll_once(self) -> None:
+        # 对冲抓取：按路由顺序错峰并发，首个有效结果胜出
+        result, winner = await self.hedger.fetch(self._build_sources(), self.freshness.select)
+        fetched_at = time.time()
+        if winner:
+            logging.info(f"本轮结果来自: {winner}")
+
+        if result is not None:
+            deferred = False
+            for username, batch in result.tweets.items():
+                state = self.states.get(username)
+                if state is not None and not self._process_batch(state, batch, winner, fetched_at):
+                    deferred = True
+            # 有推文被推迟时不提交校验值，保证下一轮 RSS 不会因"未变化"而跳过它
+            if not deferred:
+                self._commit(result)
+        else:
+            REGISTRY.counter('watcher_poll_failures_total', '所有来源均失败的检查轮数').inc()
+            logging.error("所有获取方法均失败，本次检查跳过。")
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def _process_batch(self, state: _AccountState, batch: list[Tweet], source: str | None, fetched_at: float) -> bool:
+        """
+        按 ID 升序逐条处理，高水位推进到最后一条已处理的推文。
+        有推文被推迟时返回 False。
+        """
+        processed: int | None = None
+        completed = True
+        for tweet in batch:
+            if not self._process(state, tweet, source, fetched_at):
+                completed = False
+                break
+            processed = tweet.tweet_id
+        if processed is not None:
+            state.deduper.advance_high_water_mark(processed)
+        return completed
+
+    def _process(self, state: _AccountState, tweet: Tweet, source: str | None, fetched_at: float) -> bool:
+        """处理单条推文；返回 False 表示需留到下一轮重试（高水位不越过它）。fetched_at 为本轮抓到的时刻（Unix 秒）。"""
+        username = state.account.username
+        tweet_id, tweet_text = str(tweet.tweet_id), tweet.text
+        seen = state.deduper.seen(tweet_id, tweet_text)
+        REGISTRY.counter(
+            'watcher_dedup_checks_total', '去重检查次数，result=duplicate 为命中（被过滤）', account=username,
+            result='duplicate' if seen else 'new',
+        ).inc()
+        if seen:
+            logging.info(f"@{username} 的推文已被去重策略过滤 (ID: {tweet_id})。")
+            return True
+
+        logging.info(f"@{username} 发现新推文 (ID: {tweet_id}): {tweet_text[:80]}...")
+        self.posting.record(username, tweet.tweet_id)
+        if self.tracer is not None:
+            self.tracer.fetched(username, tweet.tweet_id, source or 'unknown', fetched_at)
+        rules = self.rules.match(username, tweet_text)
+        if not rules:
+            logging.info("新推文内容不符合任何匹配规则，已忽略。")
+            if self.tracer is not None:
+                self.tracer.ignored(tweet.tweet_id)
+            return True
+
+        # 启用突发合并时由派发器收集连发的推文，不再按最小推送间隔推迟
+        coalescing = self.dispatcher is not None and self.dispatcher.coalescing
+        # 上面已确认未见过，这里只需检查推送间隔
+        if not coalescing and not state.deduper.push_interval_elapsed():
+            logging.info(f"@{username} 距上次推送不足最小间隔，推文 {tweet_id} 留到下一轮推送。")
+            return False
+
+        logging.warning(f"检测到 @{username} 命中规则 {[r.name for r in rules]} 的推文！-> {tweet_text}")
+        if self.tracer is not None:
+            self.tracer.matched(tweet.tweet_id, [r.name for r in rules])
+        # 先登记再派发，避免通知尚未完成时下一轮重复命中
+        state.deduper.mark_pushed(tweet_id, tweet_text)
+        subject = "【重要提醒】币安Alpha新动态" if len(self.accounts) == 1 else f"【重要提醒】@{username} 新动态"
+        self._notify(subject, tweet_text, channels_for(rules), tweet.tweet_id)
+        return True
+
+    def _commit(self, result: TimelineFetch) -> None:
+        """结果处理完毕后才提交 RSS 校验值，被丢弃的结果不会让下一次请求误判为未变化。"""
+        if self.http is not None and result.validators:
+            self.http.commit_validators(result.validators)
+
+    def _notify(self, subject: str, tweet_text: str, channels: frozenset[str], tweet_id: int | None = None) -> None:
+        """只入队，不等待发送结果。"""
+        if self.dispatcher is None:
+            logging.error(f"通知派发器尚未启动，无法推送: {subject}")
+            return
+        if self.tracer is not None and tweet_id is not None:
+            # 先登记待送达的目标，合并摘要立即发出时回调也能找到这条追踪
+            self.tracer.queued(tweet_id, self.dispatcher.target_channels(channels))
+        self.dispatcher.submit(subject, tweet_text, channels, (tweet_id,) if tweet_id is not None else ())
+
+    def _on_notify_result(self, notification: Notification, channel: str, ok: bool) -> None:
+        if self.tracer is not None:
+            self.tracer.delivered(notification.trace_ids, channel, ok)
+
+    def _export_stats(self) -> None:
+        self.router.export(self.stats)
+        if self.dispatcher is not None:
+            self.dispatcher.export(self.stats)
+
+    def _flush(self) -> None:
+        """汇总统计写入日志并落盘 stats.json 与 metrics.json。"""
+        self._last_flush = time.monotonic()
+        self._export_stats()
+        log_stats(self.stats)
+        save_stats(self.stats)
+        save_metrics(REGISTRY.to_dict())
+        self.posting.save(POSTING_MODEL_FILE)
+
+    async def _start_metrics_server(self) -> None:
+        server = metrics_server_from_config(self.config)
+        if server is None:
+            return
+        try:
+            await server.start()
+        except OSError as e:
+            logging.error(f"指标端点启动失败（{server.host}:{server.port}）: {e}")
+            return
+        self.metrics_server = server
+
+    async def _shutdown(self) -> None:
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        if self.dispatcher is not None:
+            await self.dispatcher.close()
+        for task in self._probe_tasks:
+            task.cancel()
+        await asyncio.gather(*self._probe_tasks, return_exceptions=True)
+        await self.hedger.shutdown()
+        if self.http is not None:
+            await self.http.close()
+        if self.pool is not None:
+            await self.pool.close()
+        for state in self.states.values():
+            state.deduper.close()
+        if self.tracer is not None:
+            self.tracer.close()
+        self._flush()
@@ -1,100 +1,319 @@
+import asyncio
+import html
 import logging
-import random
-from typing import cast, Tuple
+import re
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import NamedTuple
+from urllib.parse import urlsplit
 
+import httpx
+import requests
 import tweepy
-from bs4 import BeautifulSoup
-from bs4.element import Tag, ResultSet
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-from .utils import USER_AGENTS
+from .accounts import Account
+from .browser_pool import BrowserPool
+from .extract import EXTRACT_JS, TimelineItem, extract_timeline_items, items_from_js
+from .metrics import REGISTRY
+from .nitter_http import NitterChallengeError, NitterHttpClient, RssUnsupportedError, Validator
 
+_STATUS_HREF_RE = re.compile(r'^/([^/]+)/status/(\d+)')
+_TAG_RE = re.compile(r'<[^>]+>')
 
-def get_latest_tweet_from_api(config, stats) -> Tuple[str | None, str | None]:
+_TWITTER_API_HOST = 'https://api.twitter.com'
+# 按 since_id 补齐积压推文时每页条数（API 上限 100）与最多翻页数
+_API_PAGE_SIZE = 100
+_API_MAX_PAGES = 5
+
+_PARSE_SECONDS = 'watcher_parse_seconds'
+_PARSE_HELP = '时间线解析耗时（秒），按解析方式 html/browser/rss 区分'
+
+
+class Tweet(NamedTuple):
+    """紧凑的推文记录。"""
+    tweet_id: int
+    account: str  # 小写用户名
+    text: str
+    url: str
+    created_at: str = ''
+
+
+# 每个账号比高水位更新的推文：{用户名(小写): [Tweet, ...]}，按 ID 升序
+AccountTweets = dict[str, list[Tweet]]
+
+
+@dataclass
+class TimelineFetch:
+    """
+    一次来源抓取的结果：
+    - tweets: 各账号比高水位更新的推文（按 ID 升序）；没有新推文或 RSS 未变化的账号不会出现
+    - validators: 待提交的 RSS 条件请求校验值，结果被处理后再提交
+    - newest: 各账号在该来源上能看到的最新推文 ID（不论是否超过高水位），用于比较镜像缓存的新鲜度；
+      RSS 未变化的分组不提供该信息
+    """
+    tweets: AccountTweets = field(default_factory=dict)
+    validators: dict[str, Validator] = field(default_factory=dict)
+    newest: dict[str, int] = field(default_factory=dict)
+
+
+def _collect(candidates: list[Tweet], usernames: list[str], since_ids: dict[str, int]) -> AccountTweets:
+    """
+    按账号筛出 ID 大于高水位的推文，去重后按 ID 升序排列。
+    没有高水位的账号（首次运行）只保留最新一条，作为基准。
+    """
+    wanted = {u.lower() for u in usernames}
+    grouped: dict[str, dict[int, Tweet]] = {}
+    for tweet in candidates:
+        if tweet.account not in wanted:
+            continue
+        since_id = since_ids.get(tweet.account)
+        if since_id is not None and tweet.tweet_id <= since_id:
+            continue
+        # 同一条推文可能在页面中出现多次（如对话串），按 ID 去重
+        grouped.setdefault(tweet.account, {}).setdefault(tweet.tweet_id, tweet)
+
+    batches: AccountTweets = {}
+    for account, by_id in grouped.items():
+        batch = [by_id[tweet_id] for tweet_id in sorted(by_id)]
+        batches[account] = batch if account in since_ids else batch[-1:]
+    return batches
+
+
+def _newest(candidates: list[Tweet], usernames: list[str]) -> dict[str, int]:
+    """各账号在候选推文中的最大 ID，不按高水位过滤。"""
+    wanted = {u.lower() for u in usernames}
+    newest: dict[str, int] = {}
+    for tweet in candidates:
+        if tweet.account in wanted and tweet.tweet_id > newest.get(tweet.account, 0):
+            newest[tweet.account] = tweet.tweet_id
+    return newest
+
+
+class _RebasedAdapter(requests.adapters.HTTPAdapter):
+    """把发往官方 API 的请求改写到 [TWITTER] api_base（自建网关、代理或本地模拟服务）。"""
+
+    def __init__(self, api_base: str) -> None:
+        super().__init__()
+        self.api_base = api_base
+
+    def send(self, request, *args, **kwargs):
+        request.url = self.api_base + request.url[len(_TWITTER_API_HOST):]
+        return super().send(request, *args, **kwargs)
+
+
+def _twitter_client(config) -> tweepy.Client:
+    twitter = config['TWITTER']
+    client = tweepy.Client(bearer_token=twitter['bearer_token'])
+    api_base = twitter.get('api_base', '').strip().rstrip('/')
+    if api_base:
+        client.session.mount(_TWITTER_API_HOST, _RebasedAdapter(api_base))
+    return client
+
+
+async def _tweets_for_account(client: tweepy.Client, account: Account, since_id: int | None) -> list[Tweet]:
+    """
+    有 since_id 时按 next_token 翻页，直到取完高水位之后的全部推文（最多 _API_MAX_PAGES 页），
+    停机或限流后积压的推文不会因为一页装不下而被跳过；首次查询没有高水位，只取最新一页作为基线。
+    """
+    logging.info(f"正在尝试从 Twitter API 获取 @{account.username} 的推文...")
+    data = []
+    pagination_token = None
+    for _ in range(_API_MAX_PAGES if since_id else 1):
+        # tweepy 为同步客户端，放到线程中执行以免阻塞事件循环
+        response = await asyncio.to_thread(
+            client.get_users_tweets,
+            account.user_id,
+            exclude=['retweets', 'replies'],
+            max_results=_API_PAGE_SIZE if since_id else 5,
+            since_id=since_id,
+            pagination_token=pagination_token,
+        )
+        data.extend(response.data or [])  # type: ignore[attr-defined]
+        pagination_token = (response.meta or {}).get('next_token')  # type: ignore[attr-defined]
+        if not since_id or not pagination_token:
+            break
+    else:
+        logging.warning(
+            f"@{account.username} 自上次检查以来的新推文超过 {_API_MAX_PAGES} 页，更早的部分未获取。"
+        )
+    if not data:
+        if since_id is None:
+            logging.warning(f"通过API未能获取到 @{account.username} 的任何推文。")
+        return []
+
+    username = account.username.lower()
+    return [
+        Tweet(int(t.id), username, t.text, f"https://twitter.com/{account.username}/status/{t.id}")
+        for t in data
+    ]
+
+
+async def get_latest_tweets_from_api(
+    config, accounts: list[Account], stats, since_ids: dict[str, int] | None = None
+) -> TimelineFetch | None:
+    """并发查询每个账号比高水位更新的推文（since_id）；任一账号失败则本来源视为失败。"""
     source = "Twitter API"
     stats.setdefault(source, {'attempts': 0, 'successes': 0})
     stats[source]['attempts'] += 1
+    since_ids = since_ids or {}
 
     try:
-        cfg_twitter = config['TWITTER']
-        client = tweepy.Client(bearer_token=cfg_twitter['bearer_token'])
-        user_id = cfg_twitter['user_id']
-        username = cfg_twitter['target_username']
-
-        logging.info(f"正在尝试从 {source} 获取 @{username} 的推文...")
-        response = client.get_users_tweets(user_id, exclude=['retweets', 'replies'], max_results=5)
-        if not response.data:  # type: ignore[attr-defined]
-            logging.warning(f"通过API未能获取到 @{username} 的任何推文。")
-            return None, None
-
-        latest_tweet = response.data[0]  # type: ignore[index]
-        tweet_text = latest_tweet.text
-        tweet_id = f"https://twitter.com/{username}/status/{latest_tweet.id}"
-        logging.info(f"成功通过 API 获取到最新推文 ID: {latest_tweet.id}")
-        stats[source]['successes'] += 1
-        return tweet_text, tweet_id
+        client = _twitter_client(config)
+        results = await asyncio.gather(
+            *(_tweets_for_account(client, a, since_ids.get(a.username.lower())) for a in accounts)
+        )
     except Exception as e:
         logging.error(f"使用 Twitter API 时发生错误: {e}")
-        return None, None
+        return None
+
+    stats[source]['successes'] += 1
+    candidates = [t for batch in results for t in batch]
+    usernames = [a.username for a in accounts]
+    result = TimelineFetch(tweets=_collect(candidates, usernames, since_ids), newest=_newest(candidates, usernames))
+    # API 按 since_id 查询，没有返回更新推文即说明其最新推文就是高水位
+    for username in usernames:
+        since_id = since_ids.get(username.lower())
+        if since_id is not None:
+            result.newest.setdefault(username.lower(), since_id)
+    for username, batch in result.tweets.items():
+        logging.info(f"成功通过 API 获取到 @{username} 的 {len(batch)} 条新推文，最新 ID: {batch[-1].tweet_id}")
+    return result
+
+
+def _tweets_from_items(items: list[TimelineItem], instance: str) -> list[Tweet] | None:
+    """
+    把提取出的时间线条目转换为 Tweet。作者由推文链接 /<username>/status/<id> 判定；
+    置顶推文会同时出现在时间线的原位置，这里直接跳过。页面上没有任何推文时返回 None。
+    """
+    if not items:
+        logging.warning(f"在 {instance} 上未找到任何推文。")
+        return None
+
+    tweets: list[Tweet] = []
+    for item in items:
+        match = _STATUS_HREF_RE.match(item.href)
+        if item.pinned or not match or not item.text:
+            continue
+        tweets.append(Tweet(int(match.group(2)), match.group(1).lower(), item.text, item.href, item.timestamp))
+    return tweets
+
 
+def _parse_rss(rss_content: str, instance: str) -> list[Tweet]:
+    """从 Nitter RSS 中解析全部推文，作者同样由状态链接判定。"""
+    root = ET.fromstring(rss_content)
+    tweets: list[Tweet] = []
+    for item in root.iter('item'):
+        link = (item.findtext('link') or item.findtext('guid') or '').strip()
+        path = urlsplit(link).path
+        match = _STATUS_HREF_RE.match(path)
+        if not match:
+            continue
 
-def get_latest_tweet_from_nitter(p, nitter_instances, stats) -> Tuple[str | None, str | None]:
-    random.shuffle(nitter_instances)
-    browser = None
+        tweet_text = (item.findtext('title') or '').strip()
+        if not tweet_text:
+            tweet_text = html.unescape(_TAG_RE.sub('', item.findtext('description') or '')).strip()
+        if tweet_text:
+            pub_date = (item.findtext('pubDate') or '').strip()
+            tweets.append(Tweet(int(match.group(2)), match.group(1).lower(), tweet_text, f"{path}#m", pub_date))
+    if not tweets:
+        logging.warning(f"在 {instance} 的 RSS 中未找到任何推文。")
+    return tweets
+
+
+async def _extract_with_browser(pool: BrowserPool, url: str) -> list[TimelineItem]:
+    # 页面按实例的精简配置加载，只下载时间线 HTML 与必要脚本
+    async with pool.page(url) as page:
+        logging.info(f"正在尝试从 {url} 获取推文 (使用Playwright)...")
+        started = time.monotonic()
+        await page.goto(url, timeout=30000)
+        await page.wait_for_selector('div.timeline-item', timeout=30000)
+        logging.info(f"{url} 页面就绪耗时 {time.monotonic() - started:.2f}s")
+        # 在页面内只提取所需字段，不再序列化整个 DOM
+        with REGISTRY.timer(_PARSE_SECONDS, _PARSE_HELP, method='browser'):
+            return items_from_js(await page.evaluate(EXTRACT_JS))
+
+
+async def _fetch_timeline_items(
+    pool: BrowserPool, http: NitterHttpClient | None, instance: str, url: str
+) -> list[TimelineItem]:
+    """默认先走 HTTP 快速通道，遇到验证码/JS 墙时升级到 Playwright 并记住该实例。"""
+    if http is not None and not http.needs_browser(instance):
+        try:
+            logging.info(f"正在尝试从 {url} 获取推文 (HTTP)...")
+            html_content = await http.fetch(url)
+            # 解析为纯 CPU 工作，放到线程中以免阻塞其他来源的抓取
+            with REGISTRY.timer(_PARSE_SECONDS, _PARSE_HELP, method='html'):
+                return await asyncio.to_thread(extract_timeline_items, html_content)
+        except NitterChallengeError as e:
+            logging.info(f"{instance} 返回验证页面 ({e})，改用浏览器抓取。")
+            http.mark_needs_browser(instance)
+    return await _extract_with_browser(pool, url)
+
+
+async def get_latest_tweets_from_nitter(
+    pool: BrowserPool,
+    instance: str,
+    usernames: list[str],
+    stats,
+    http: NitterHttpClient | None = None,
+    batch_size: int = 10,
+    since_ids: dict[str, int] | None = None,
+) -> TimelineFetch | None:
+    """
+    从单个 Nitter 实例抓取所有账号比高水位（since_ids）更新的推文。
+    账号按 batch_size 分组，使用 Nitter 多用户时间线（/<user1>,<user2>）一次请求一组，
+    每轮请求数随账号数次线性增长。任一分组失败则本来源视为失败。
+    开启 RSS 时优先条件请求 /rss：未变化的分组直接跳过，不解析也不进入去重。
+    """
+    stats.setdefault(instance, {'attempts': 0, 'successes': 0})
+    stats[instance]['attempts'] += 1
+    since_ids = since_ids or {}
+
+    result = TimelineFetch()
+    unchanged = 0
     try:
-        browser = p.chromium.launch(headless=True)
-        for instance in nitter_instances:
-            stats.setdefault(instance, {'attempts': 0, 'successes': 0})
-            stats[instance]['attempts'] += 1
-
-            page = None
-            try:
-                page = browser.new_page(user_agent=random.choice(USER_AGENTS))
-                logging.info(f"正在尝试从 {instance} 获取推文 (使用Playwright)...")
-                page.goto(instance, timeout=30000)
-                page.wait_for_selector('div.timeline-item', timeout=30000)
-
-                html_content = page.content()
-                soup = BeautifulSoup(html_content, 'html.parser')
-                tweet_divs = cast(ResultSet[Tag], soup.find_all('div', class_='timeline-item', limit=5))
-                if not tweet_divs:
-                    logging.warning(f"在 {instance} 上未找到任何推文。")
-                    continue
-
-                latest_tweet_div: Tag | None = None
-                for tweet_div in tweet_divs:
-                    if not tweet_div.find('div', class_='pinned'):
-                        latest_tweet_div = tweet_div
-                        break
-                    logging.info(f"在 {instance} 检测到并跳过一条置顶推文。")
-
-                if not latest_tweet_div:
-                    logging.warning(f"在 {instance} 上找到的推文均为置顶或无法解析，本次跳过。")
-                    continue
-
-                content_div = latest_tweet_div.find('div', class_='tweet-content')
-                tweet_text = content_div.text.strip() if content_div else ""
-                link_tag = cast(Tag | None, latest_tweet_div.find('a', class_='tweet-link'))
-                tweet_id = link_tag['href'] if link_tag and link_tag.has_attr('href') else ""
-
-                if tweet_text and tweet_id:
-                    logging.info(f"成功从 {instance} 获取到最新推文 ID: {tweet_id}")
-                    stats[instance]['successes'] += 1
-                    return tweet_text, tweet_id
-                else:
-                    logging.warning(f"在 {instance} 上解析推文内容或ID失败。")
-            except PlaywrightTimeoutError:
-                logging.error(f"访问 {instance} 超时，可能被验证码卡住或网络问题。")
-            except Exception as e:
-                logging.error(f"使用Playwright处理 {instance} 时发生未知错误: {e}")
-            finally:
-                if page:
-                    page.close()
+        for start in range(0, len(usernames), max(1, batch_size)):
+            chunk = usernames[start:start + batch_size]
+            url = f"{instance}/{','.join(chunk)}"
+
+            parsed: list[Tweet] | None = None
+            if http is not None and http.use_rss and not http.rss_unsupported(instance):
+                rss_url = f"{url}/rss"
+                try:
+                    rss_content, validator = await http.fetch_rss(rss_url)
+                    result.validators[rss_url] = validator
+                    if rss_content is None:
+                        unchanged += 1
+                        continue
+                    with REGISTRY.timer(_PARSE_SECONDS, _PARSE_HELP, method='rss'):
+                        parsed = await asyncio.to_thread(_parse_rss, rss_content, instance)
+                except RssUnsupportedError:
+                    http.mark_rss_unsupported(instance)
+                except (NitterChallengeError, ET.ParseError) as e:
+                    logging.info(f"{instance} 的 RSS 不可用 ({e})，改为抓取时间线页面。")
+
+            if parsed is None:
+                items = await _fetch_timeline_items(pool, http, instance, url)
+                parsed = _tweets_from_items(items, instance)
+                if parsed is None:
+                    return None
+            result.tweets.update(_collect(parsed, chunk, since_ids))
+            result.newest.update(_newest(parsed, chunk))
+    except PlaywrightTimeoutError:
+        logging.error(f"访问 {instance} 超时，可能被验证码卡住或网络问题。")
+        return None
+    except httpx.HTTPError as e:
+        logging.error(f"HTTP 访问 {instance} 失败: {e}")
+        return None
     except Exception as e:
-        logging.error(f"Playwright 浏览器启动失败或发生严重错误: {e}")
-    finally:
-        if browser and browser.is_connected():
-            browser.close()
+        logging.error(f"处理 {instance} 时发生未知错误: {e}")
+        return None
 
-    logging.error(f"尝试了 {len(nitter_instances)} 个Nitter实例，均无法访问。")
-    return None, None 
\ No newline at end of file
+    if unchanged:
+        logging.info(f"{instance} 有 {unchanged} 组时间线未变化（RSS 条件请求命中）。")
+    for username, batch in result.tweets.items():
+        logging.info(f"成功从 {instance} 获取到 @{username} 的 {len(batch)} 条新推文，最新 ID: {batch[-1].tweet_id}")
+    stats[instance]['successes'] += 1
+    return result
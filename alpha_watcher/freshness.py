@@ -0,0 +1,79 @@
+import time
+from bisect import bisect_right, insort
+from typing import Any, Iterable
+
+from .fetchers import TimelineFetch
+from .utils import snowflake_timestamp
+
+
+class FreshnessTracker:
+    """
+    按 Snowflake ID 比较各镜像的新鲜度：
+    - 推文 ID 随发布时间单调递增，镜像页面上的最新 ID 越小，缓存越旧
+    - 记录各账号最近在任意来源上见过的推文 ID；某来源的最新 ID 落后于它们时，
+      其缓存滞后至少为"抓取时刻 − 最早缺失推文的发布时间"，否则视为 0
+    - 发布早于 max_age 秒的推文不再参与比较，被删除的推文不会让所有镜像的滞后无限增长
+    - select() 在同一轮有多个来源返回时保留最新的那份结果
+    """
+
+    def __init__(self, history: int = 50, max_age: float = 3600.0) -> None:
+        self.history = max(1, history)
+        self.max_age = max_age
+        self._known: dict[str, list[int]] = {}
+
+    # ---------- public API ----------
+
+    def seed(self, since_ids: dict[str, int]) -> None:
+        """启动时登记已持久化的高水位，作为各账号已知的最新推文。"""
+        for account, tweet_id in since_ids.items():
+            self._remember(account, [tweet_id])
+
+    def observe(self, fetch: TimelineFetch, fetched_at: float | None = None) -> float | None:
+        """
+        计算该结果相对已知最新推文的缓存滞后（秒，取各账号最大值），随后登记其中的推文。
+        结果未携带任何账号的最新 ID（如 RSS 全部未变化）时返回 None。
+        """
+        if not fetch.newest:
+            return None
+        now = time.time() if fetched_at is None else fetched_at
+        lag = 0.0
+        for account, newest in fetch.newest.items():
+            known = self._known.get(account, [])
+            missing = known[bisect_right(known, newest):]
+            for tweet_id in missing:
+                created = snowflake_timestamp(tweet_id)
+                if created is not None and now - created <= self.max_age:
+                    lag = max(lag, now - created)
+                    break
+        for account, newest in fetch.newest.items():
+            self._remember(account, [newest, *(t.tweet_id for t in fetch.tweets.get(account, ()))])
+        return lag
+
+    def select(self, results: list[tuple[str, Any]]) -> tuple[Any, str]:
+        """
+        在同一轮返回的多个结果中选出最新的一份：按"在多少个账号上拥有最新 ID"比较，
+        相同时保留先返回的。整份保留而非逐账号拼接，保证 RSS 校验值只随被处理的结果提交。
+        """
+        freshest: dict[str, int] = {}
+        for _, fetch in results:
+            for account, newest in getattr(fetch, 'newest', {}).items():
+                freshest[account] = max(freshest.get(account, 0), newest)
+
+        def score(item: tuple[int, tuple[str, Any]]) -> tuple[int, int]:
+            position, (_, fetch) = item
+            newest = getattr(fetch, 'newest', {})
+            return sum(1 for account, tweet_id in newest.items() if tweet_id >= freshest[account]), -position
+
+        _, (name, fetch) = max(enumerate(results), key=score)
+        return fetch, name
+
+    # ---------- internal ----------
+
+    def _remember(self, account: str, tweet_ids: Iterable[int]) -> None:
+        known = self._known.setdefault(account, [])
+        for tweet_id in tweet_ids:
+            index = bisect_right(known, tweet_id)
+            if index and known[index - 1] == tweet_id:
+                continue
+            insort(known, tweet_id)
+        del known[:-self.history]
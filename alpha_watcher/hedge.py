@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+# 来源名 + 返回抓取结果的协程工厂；返回 None 视为失败
+Source = Tuple[str, Callable[[], Awaitable[Any]]]
+# 从同一轮的多个 (来源名, 结果) 中选出采用的一个，返回 (结果, 来源名)
+Selector = Callable[[list[Tuple[str, Any]]], Tuple[Any, str]]
+
+
+class HedgedFetcher:
+    """
+    对冲并发抓取：
+    - 按 hedge_delay_seconds 错峰启动各来源（0 表示同时启动，None 表示严格顺序）；
+      前一个来源失败时立即启动下一个
+    - 第一个有效结果出现后不再启动新来源；若仍有在途请求，再等待至多 freshness_wait_seconds 秒收集它们的结果，
+      由 select 选出最新的一份（镜像缓存时长不同，先返回的未必最新），其余在途任务被取消
+    - 统计由各抓取函数自行记入对应来源；被取消的来源只记尝试、不记成功
+    """
+
+    def __init__(
+        self, hedge_delay_seconds: Optional[float] = 2.0, timeout_seconds: float = 70.0, freshness_wait_seconds: float = 1.0
+    ) -> None:
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.timeout_seconds = timeout_seconds
+        self.freshness_wait_seconds = max(0.0, freshness_wait_seconds)
+        self._cancelled: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_config(cls, config) -> 'HedgedFetcher':
+        """读取 [Scraper] hedge_mode / hedge_delay / freshness_wait；关闭对冲时退化为顺序尝试。"""
+        scraper = config['Scraper'] if 'Scraper' in config else {}
+        enabled = str(scraper.get('hedge_mode', 'true')).strip().lower() not in ('0', 'false', 'no', 'off')
+        try:
+            delay = max(0.0, float(scraper.get('hedge_delay', 2)))
+        except ValueError:
+            delay = 2.0
+        try:
+            freshness_wait = float(scraper.get('freshness_wait', 1))
+        except ValueError:
+            freshness_wait = 1.0
+        return cls(hedge_delay_seconds=delay if enabled else None, freshness_wait_seconds=freshness_wait)
+
+    # ---------- public API ----------
+
+    async def fetch(self, sources: list[Source], select: Optional[Selector] = None) -> Tuple[Any, Optional[str]]:
+        """返回 (抓取结果, 胜出来源)，全部失败时返回 (None, None)。未提供 select 时首个有效结果直接胜出。"""
+        pending = list(sources)
+        running: dict[asyncio.Task, str] = {}
+        deadline = time.monotonic() + self.timeout_seconds
+        next_launch_at = time.monotonic()
+        results: list[Tuple[str, Any]] = []
+
+        try:
+            while pending or running:
+                now = time.monotonic()
+                if results:
+                    # 已有结果：只等在途请求到收集截止时间
+                    if not running or now >= deadline:
+                        break
+                elif now >= deadline:
+                    logging.error(f"对冲抓取超过 {self.timeout_seconds:.0f} 秒仍无结果，本轮放弃。")
+                    break
+
+                # 到达错峰时间点，或当前没有任何在途请求时，启动下一个来源
+                if pending and not results and (not running or (self.hedge_delay_seconds is not None and now >= next_launch_at)):
+                    name, factory = pending.pop(0)
+                    running[asyncio.create_task(factory(), name=f"fetch:{name}")] = name
+                    if self.hedge_delay_seconds is not None:
+                        next_launch_at = now + self.hedge_delay_seconds
+                    continue
+
+                timeout = deadline - now
+                if pending and not results and self.hedge_delay_seconds is not None:
+                    timeout = min(timeout, max(0.0, next_launch_at - now))
+                done, _ = await asyncio.wait(list(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                first_result = not results
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logging.error(f"执行获取方法 {name} 时发生错误: {e}")
+                        result = None
+                    if result is None:
+                        # 失败的来源不再占用错峰时间，立即补发下一个
+                        next_launch_at = time.monotonic()
+                        continue
+                    results.append((name, result))
+                if first_result and results:
+                    if select is None or not running or self.freshness_wait_seconds <= 0:
+                        break
+                    deadline = min(deadline, time.monotonic() + self.freshness_wait_seconds)
+                    logging.info(
+                        f"来源 {results[0][0]} 率先返回结果，再等待在途的 {len(running)} 个请求"
+                        f"至多 {self.freshness_wait_seconds:.1f} 秒以比较新鲜度。"
+                    )
+
+            if not results:
+                return None, None
+            if running:
+                logging.info(f"来源 {results[0][0]} 率先返回结果，取消其余 {len(running)} 个在途请求。")
+            if len(results) == 1 or select is None:
+                return results[0][1], results[0][0]
+            result, name = select(results)
+            if name != results[0][0]:
+                logging.info(f"来源 {name} 的结果比先返回的 {results[0][0]} 更新，采用 {name}。")
+            return result, name
+        finally:
+            for task in running:
+                self._cancel(task)
+
+    async def shutdown(self) -> None:
+        """等待被取消的任务完成清理（关闭页面等）。"""
+        if self._cancelled:
+            await asyncio.gather(*self._cancelled, return_exceptions=True)
+
+    # ---------- internal ----------
+
+    def _cancel(self, task: asyncio.Task) -> None:
+        # 不等待取消完成，避免胜出结果被拖慢；保留引用直到任务真正结束
+        task.cancel()
+        self._cancelled.add(task)
+        task.add_done_callback(self._cancelled.discard)
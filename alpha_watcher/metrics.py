@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Iterator, Optional
+
+# 延迟类直方图的默认分桶（秒），覆盖从毫秒级解析到分钟级通知重试
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 检查间隔直方图的分桶（秒），对应调度器的关键/高峰/普通/安静时段
+INTERVAL_BUCKETS = (5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """固定分桶直方图：observe 只做一次二分查找与三次加法。"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[tuple[float, int]]:
+        total = 0
+        for bound, count in zip((*self.bounds, math.inf), self.counts):
+            total += count
+            yield bound, total
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_started')
+
+    def __init__(self, histogram: Histogram) -> None:
+        self._histogram = histogram
+        self._started = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, help_text: str, buckets: tuple[float, ...] = ()) -> None:
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.buckets = buckets
+        self.series: dict[Labels, Any] = {}
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表：
+    - 计数器、仪表与固定分桶直方图，按 (指标名, 标签) 区分序列，首次使用时自动创建
+    - 记录只是内存中的加法，开销在微秒以下；导出时才格式化为 Prometheus 文本或 JSON
+    - 同一指标名的类型与分桶在首次注册时确定
+    """
+
+    def __init__(self) -> None:
+        self._families: dict[str, _Family] = {}
+
+    # ---------- public API ----------
+
+    def counter(self, name: str, help_text: str = '', **labels: str) -> Counter:
+        return self._series(name, COUNTER, help_text, (), labels)
+
+    def gauge(self, name: str, help_text: str = '', **labels: str) -> Gauge:
+        return self._series(name, GAUGE, help_text, (), labels)
+
+    def histogram(self, name: str, help_text: str = '', buckets: tuple[float, ...] = LATENCY_BUCKETS, **labels: str) -> Histogram:
+        return self._series(name, HISTOGRAM, help_text, buckets, labels)
+
+    def timer(self, name: str, help_text: str = '', buckets: tuple[float, ...] = LATENCY_BUCKETS, **labels: str) -> _Timer:
+        """with registry.timer(...) 记录代码块耗时（秒）。"""
+        return _Timer(self.histogram(name, help_text, buckets, **labels))
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式（0.0.4）。"""
+        lines: list[str] = []
+        for family in self._families.values():
+            if family.help:
+                lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, metric in family.series.items():
+                if family.kind == HISTOGRAM:
+                    for bound, total in metric.cumulative():
+                        le = '+Inf' if bound == math.inf else _format_number(bound)
+                        lines.append(f"{family.name}_bucket{_format_labels(labels + (('le', le),))} {total}")
+                    lines.append(f"{family.name}_sum{_format_labels(labels)} {_format_number(metric.sum)}")
+                    lines.append(f"{family.name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_number(metric.value)}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON 友好的快照；直方图附带由分桶估算的 p50/p90/p99。"""
+        snapshot: dict[str, Any] = {}
+        for family in self._families.values():
+            series = []
+            for labels, metric in family.series.items():
+                entry: dict[str, Any] = {'labels': dict(labels)}
+                if family.kind == HISTOGRAM:
+                    entry.update(
+                        count=metric.count,
+                        sum=round(metric.sum, 6),
+                        buckets={('+Inf' if b == math.inf else _format_number(b)): c for b, c in metric.cumulative()},
+                        p50=_quantile(metric, 0.5),
+                        p90=_quantile(metric, 0.9),
+                        p99=_quantile(metric, 0.99),
+                    )
+                else:
+                    entry['value'] = metric.value
+                series.append(entry)
+            snapshot[family.name] = {'type': family.kind, 'help': family.help, 'series': series}
+        return snapshot
+
+    # ---------- internal ----------
+
+    def _series(self, name: str, kind: str, help_text: str, buckets: tuple[float, ...], labels: dict[str, str]):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = _Family(name, kind, help_text, buckets)
+        elif family.kind != kind:
+            raise ValueError(f"指标 {name} 已注册为 {family.kind}，不能再作为 {kind} 使用")
+        key: Labels = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        metric = family.series.get(key)
+        if metric is None:
+            if kind == COUNTER:
+                metric = Counter()
+            elif kind == GAUGE:
+                metric = Gauge()
+            else:
+                metric = Histogram(family.buckets)
+            family.series[key] = metric
+        return metric
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels) + '}'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _quantile(histogram: Histogram, q: float) -> Optional[float]:
+    """按分桶线性插值估算分位数；落在 +Inf 桶时返回最大有限边界。"""
+    if histogram.count == 0:
+        return None
+    rank = q * histogram.count
+    lower, previous = 0.0, 0
+    for bound, total in histogram.cumulative():
+        if total >= rank:
+            if bound == math.inf:
+                return histogram.bounds[-1] if histogram.bounds else None
+            in_bucket = total - previous
+            fraction = (rank - previous) / in_bucket if in_bucket else 1.0
+            return round(lower + (bound - lower) * fraction, 6)
+        lower, previous = bound, total
+    return None
+
+
+# 进程内默认注册表，各模块直接记录
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """
+    本地只读 HTTP 端点（asyncio 实现，不依赖第三方库）：
+    - GET /metrics       Prometheus 文本格式
+    - GET /metrics.json  JSON 快照
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9464) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logging.info(f"指标端点已启动: http://{self.host}:{self.port}/metrics (JSON: /metrics.json)")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # 读完请求头，忽略内容
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?', 1)[0] if len(parts) >= 2 else ''
+            if len(parts) < 2 or parts[0] not in ('GET', 'HEAD'):
+                status, content_type, body = '405 Method Not Allowed', 'text/plain; charset=utf-8', b'method not allowed\n'
+            elif path == '/metrics':
+                status, content_type = '200 OK', 'text/plain; version=0.0.4; charset=utf-8'
+                body = self.registry.to_prometheus().encode('utf-8')
+            elif path == '/metrics.json':
+                status, content_type = '200 OK', 'application/json; charset=utf-8'
+                body = json.dumps(self.registry.to_dict(), ensure_ascii=False).encode('utf-8')
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', b'not found\n'
+            head = (
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            ).encode('latin-1')
+            writer.write(head if parts and parts[0] == 'HEAD' else head + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.debug(f"指标端点处理请求失败: {e}")
+        finally:
+            writer.close()
+
+
+def metrics_server_from_config(config, registry: MetricsRegistry = REGISTRY) -> Optional[MetricsServer]:
+    """读取 [Metrics] http_port（默认 0，即不开启）与 http_host（默认仅本机）。"""
+    cfg = config['Metrics'] if 'Metrics' in config else {}
+    try:
+        port = int(cfg.get('http_port', 0))
+    except ValueError:
+        logging.warning("[Metrics] http_port 无效，不开启指标端点。")
+        return None
+    if port <= 0:
+        return None
+    return MetricsServer(registry, cfg.get('http_host', '127.0.0.1').strip() or '127.0.0.1', port)
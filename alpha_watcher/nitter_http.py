@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import random
+import time
+from typing import NamedTuple, Optional
+
+import httpx
+
+from .utils import USER_AGENTS
+
+# 常见的人机验证/JS 墙特征（Cloudflare、Anubis、自建挑战页等）
+_CHALLENGE_MARKERS = (
+    'cf-challenge',
+    'challenge-platform',
+    'just a moment',
+    'checking your browser',
+    'enable javascript',
+    'anubis',
+    "making sure you're not a bot",
+    'verifying you are human',
+)
+
+
+class NitterChallengeError(Exception):
+    """实例返回了验证码或 JS 墙，需要使用浏览器抓取。"""
+
+
+class RssUnsupportedError(Exception):
+    """实例未开放 RSS（404 或返回的不是 RSS 文档）。"""
+
+
+class Validator(NamedTuple):
+    """条件请求的校验值：ETag、Last-Modified 与条目内容哈希。"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+
+
+class NitterHttpClient:
+    """
+    Nitter 抓取快速通道：
+    - 复用 keep-alive 连接池（httpx.AsyncClient），直接拉取静态时间线 HTML
+    - 识别验证码/JS 墙响应并抛出 NitterChallengeError，由调用方升级到 Playwright
+    - 记住需要浏览器的实例，reprobe_seconds 后再尝试 HTTP
+    - RSS 条件请求（If-None-Match / If-Modified-Since），按 URL 缓存校验值；
+      校验值由调用方在结果被真正处理后 commit，避免被丢弃的结果吞掉新推文
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 10.0,
+        pool_maxsize: int = 10,
+        reprobe_seconds: int = 3600,
+        use_rss: bool = True,
+    ) -> None:
+        self.reprobe_seconds = reprobe_seconds
+        self.use_rss = use_rss
+        self._browser_only: dict[str, float] = {}
+        self._rss_unsupported: dict[str, float] = {}
+        self._validators: dict[str, Validator] = {}
+
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            follow_redirects=True,
+            headers={
+                'User-Agent': random.choice(USER_AGENTS),
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            },
+        )
+
+    @classmethod
+    def from_config(cls, config) -> Optional['NitterHttpClient']:
+        """读取 [Scraper] http_fast_path（默认开启），关闭时返回 None。"""
+        scraper = config['Scraper'] if 'Scraper' in config else {}
+        enabled = str(scraper.get('http_fast_path', 'true')).strip().lower() not in ('0', 'false', 'no', 'off')
+        if not enabled:
+            return None
+        use_rss = str(scraper.get('use_rss', 'true')).strip().lower() not in ('0', 'false', 'no', 'off')
+        return cls(use_rss=use_rss)
+
+    # ---------- public API ----------
+
+    def needs_browser(self, instance: str) -> bool:
+        marked_at = self._browser_only.get(instance)
+        if marked_at is None:
+            return False
+        if time.time() - marked_at >= self.reprobe_seconds:
+            # 到期后重新尝试 HTTP，实例可能已撤掉验证
+            self._browser_only.pop(instance, None)
+            return False
+        return True
+
+    def mark_needs_browser(self, instance: str) -> None:
+        if instance not in self._browser_only:
+            logging.info(f"实例 {instance} 需要浏览器渲染，后续将直接使用 Playwright。")
+        self._browser_only[instance] = time.time()
+
+    def rss_unsupported(self, instance: str) -> bool:
+        marked_at = self._rss_unsupported.get(instance)
+        if marked_at is None:
+            return False
+        if time.time() - marked_at >= self.reprobe_seconds:
+            self._rss_unsupported.pop(instance, None)
+            return False
+        return True
+
+    def mark_rss_unsupported(self, instance: str) -> None:
+        if instance not in self._rss_unsupported:
+            logging.info(f"实例 {instance} 未开放 RSS，改为抓取时间线页面。")
+        self._rss_unsupported[instance] = time.time()
+
+    async def fetch_rss(self, url: str) -> tuple[Optional[str], Validator]:
+        """
+        条件请求 RSS。时间线未变化（304 或条目内容哈希相同）时返回 (None, 校验值)，
+        否则返回 (RSS 文本, 新校验值)。校验值需调用 commit_validators 才会生效。
+        """
+        cached = self._validators.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        resp = await self.client.get(url, headers=headers)
+        if resp.status_code == 304 and cached is not None:
+            return None, cached
+        body = resp.text
+        if resp.status_code == 404:
+            raise RssUnsupportedError("HTTP 404")
+        if _is_challenge(resp.status_code, body, rss=True):
+            raise NitterChallengeError(f"HTTP {resp.status_code}")
+        resp.raise_for_status()
+        if '<rss' not in body[:2000]:
+            raise RssUnsupportedError("响应不是 RSS 文档")
+
+        # 只对条目部分取哈希，忽略频道头部可能变化的构建时间等字段
+        items_start = body.find('<item')
+        digest = hashlib.sha1(body[items_start if items_start >= 0 else 0:].encode('utf-8')).hexdigest()
+        validator = Validator(resp.headers.get('ETag'), resp.headers.get('Last-Modified'), digest)
+        if cached is not None and cached.digest == digest:
+            return None, validator
+        return body, validator
+
+    def commit_validators(self, validators: dict[str, Validator]) -> None:
+        self._validators.update(validators)
+
+    async def fetch(self, url: str) -> str:
+        """拉取页面 HTML；遇到验证码/JS 墙时抛出 NitterChallengeError。"""
+        resp = await self.client.get(url)
+        body = resp.text
+        if _is_challenge(resp.status_code, body):
+            raise NitterChallengeError(f"HTTP {resp.status_code}")
+        resp.raise_for_status()
+        return body
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def _is_challenge(status_code: int, body: str, rss: bool = False) -> bool:
+    if status_code in (403, 429, 503):
+        return True
+    if rss and '<rss' in body[:2000]:
+        return False
+    if 'timeline-item' in body:
+        return False
+    head = body[:20000].lower()
+    if any(marker in head for marker in _CHALLENGE_MARKERS):
+        return True
+    # 既没有时间线也没有 Nitter 页面骨架，多半是 JS 渲染的壳页面
+    return status_code == 200 and not rss and 'timeline' not in head
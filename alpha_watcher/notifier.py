@@ -1,83 +1,361 @@
+import asyncio
+import hashlib
+import ipaddress
 import logging
 import smtplib
 import ssl
+import threading
+import time
+from collections import deque
 from email.message import EmailMessage
+from urllib.parse import parse_qs, urlsplit
 
-import requests
+import httpx
 
+# 企业微信 webhook 地址无效或已失效，重试没有意义
+_WECOM_PERMANENT_ERRCODES = {93000}
+# 企业微信接口调用超过频率限制
+_WECOM_RATE_LIMITED = 45009
+# 企业微信文本消息内容上限（UTF-8 字节）
+WECOM_MAX_BYTES = 2048
+# [Email] smtp_security 为 auto 时按端口推断加密方式
+_SMTP_PORT_SECURITY = {465: 'ssl', 587: 'starttls'}
 
-def send_email(subject: str, content: str, config) -> None:
-    cfg_email = config['Email']
-    smtp_port = int(cfg_email['smtp_port'])
-    server = None
-    try:
+
+class NotifyError(Exception):
+    """通知发送失败；retryable 为 False 时重试也不会成功（如认证失败、配置错误）。"""
+
+    def __init__(self, message: str, retryable: bool = True) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def email_configured(config) -> bool:
+    cfg = config['Email'] if 'Email' in config else None
+    return bool(cfg and cfg.get('sender_email') and cfg.get('sender_password') and cfg.get('receiver_email'))
+
+
+def wecom_webhook_urls(config) -> list[str]:
+    """读取 [WeCom] 配置段的 webhook_urls（支持多行或逗号分隔多个 URL）。"""
+    if 'WeCom' not in config:
+        return []
+    raw = config['WeCom'].get('webhook_urls', '').strip()
+    urls = [u.strip() for u in raw.replace(',', '\n').splitlines() if u.strip()]
+    return list(dict.fromkeys(urls))
+
+
+class SmtpMailer:
+    """
+    SMTP 连接管理：
+    - 登录后的会话常驻复用，连续多封邮件只需一次 TLS 握手与登录
+    - keepalive() 在空闲时发送 NOOP 保活，会话断开后在后台重新登录；
+      发送时若复用的会话已被服务器关闭，自动重连并重试一次
+    - 收件人支持多个（逗号分隔），一封邮件一次投递给全部收件人
+    - security 为 auto 时 465 端口用 SSL、587 端口用 STARTTLS；plain 为不加密（仅用于本机中继或测试服务）
+    - 方法均为阻塞调用，由调用方放到线程中执行；内部加锁，可被多个线程共享
+    """
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        sender: str,
+        password: str,
+        receivers: list[str],
+        keepalive_interval: float = 60.0,
+        timeout: float = 20.0,
+        security: str = 'auto',
+    ) -> None:
+        self.server = server
+        self.port = port
+        self.security = security
+        self.sender = sender
+        self.password = password
+        self.receivers = receivers
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self._smtp: smtplib.SMTP | None = None
+        self._lock = threading.Lock()
+        # 认证失败后不再在后台反复登录
+        self._auth_failed = False
+        if security == 'plain' and not _is_loopback(server):
+            logging.warning(f"smtp_security = plain：与 {server} 的连接不加密，邮箱密码将以明文发送！")
+
+    @classmethod
+    def from_config(cls, config) -> 'SmtpMailer':
+        """从 [Email] 配置段构造；keepalive_interval = 0 时每次发送后立即断开（旧行为）。"""
+        cfg = config['Email']
+        try:
+            keepalive_interval = max(0.0, float(cfg.get('keepalive_interval', 60)))
+        except ValueError:
+            keepalive_interval = 60.0
+        try:
+            port = int(cfg.get('smtp_port', 465))
+        except ValueError:
+            port = 0  # 发送时报告"不支持的SMTP端口"
+        return cls(
+            server=cfg.get('smtp_server', 'smtp.qq.com'),
+            port=port,
+            sender=cfg['sender_email'],
+            password=cfg['sender_password'],
+            receivers=[r.strip() for r in cfg['receiver_email'].replace(';', ',').split(',') if r.strip()],
+            keepalive_interval=keepalive_interval,
+            security=cfg.get('smtp_security', 'auto').strip().lower() or 'auto',
+        )
+
+    # ---------- public API ----------
+
+    def send(self, subject: str, content: str) -> None:
+        """发送一封邮件；失败时抛出 NotifyError。"""
         msg = EmailMessage()
         msg.set_content(content)
         msg['Subject'] = subject
-        msg['From'] = f"币安Alpha监控 <{cfg_email['sender_email']}>"
-        msg['To'] = cfg_email['receiver_email']
+        msg['From'] = f"币安Alpha监控 <{self.sender}>"
+        msg['To'] = ', '.join(self.receivers)
+
+        with self._lock:
+            try:
+                for attempt in (1, 2):
+                    reused = self._smtp is not None
+                    try:
+                        smtp = self._session()
+                        smtp.send_message(msg, to_addrs=self.receivers)
+                        break
+                    except (NotifyError, smtplib.SMTPRecipientsRefused):
+                        raise
+                    except Exception as e:
+                        self._quit()
+                        if not reused or attempt == 2:
+                            raise NotifyError(f"发送邮件时发生错误: {e}") from e
+                        logging.info(f"SMTP 会话已失效（{e}），重新连接后重试。")
+                logging.info(f"邮件已成功发送（{len(self.receivers)} 位收件人）。")
+            except smtplib.SMTPRecipientsRefused as e:
+                raise NotifyError(f"收件人被拒绝: {e.recipients}", retryable=False) from e
+            finally:
+                if self.keepalive_interval <= 0:
+                    self._quit()
+
+    def keepalive(self) -> None:
+        """空闲保活：已连接时发送 NOOP，未连接时预先登录；正在发送时跳过。"""
+        if self.keepalive_interval <= 0 or self._auth_failed:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._smtp is not None:
+                try:
+                    code, _ = self._smtp.noop()
+                    if code == 250:
+                        return
+                except Exception:
+                    pass
+                logging.info("SMTP 会话保活失败，重新连接。")
+                self._quit()
+            self._session()
+        except Exception as e:
+            logging.warning(f"SMTP 预连接失败，将在下次发送或保活时重试: {e}")
+        finally:
+            self._lock.release()
 
+    def close(self) -> None:
+        with self._lock:
+            self._quit()
+
+    # ---------- internal ----------
+
+    def _session(self) -> smtplib.SMTP:
+        """返回已登录的会话，必要时新建。调用方需持有锁。"""
+        if self._smtp is not None:
+            return self._smtp
         context = ssl.create_default_context()
-        if smtp_port == 465:
-            server = smtplib.SMTP_SSL(cfg_email['smtp_server'], smtp_port, context=context)
-        elif smtp_port == 587:
-            server = smtplib.SMTP(cfg_email['smtp_server'], smtp_port)
-            server.starttls(context=context)
+        security = _SMTP_PORT_SECURITY.get(self.port, '') if self.security == 'auto' else self.security
+        if security == 'ssl':
+            smtp: smtplib.SMTP = smtplib.SMTP_SSL(self.server, self.port, context=context, timeout=self.timeout)
+        elif security == 'starttls':
+            smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            smtp.starttls(context=context)
+        elif security == 'plain':
+            smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        elif self.security == 'auto':
+            raise NotifyError(f"不支持的SMTP端口: {self.port}，邮件无法发送。", retryable=False)
         else:
-            logging.warning(f"不支持的SMTP端口: {smtp_port}，邮件可能无法发送。")
+            raise NotifyError(f"不支持的 smtp_security: {self.security}（可选 auto/ssl/starttls/plain）。", retryable=False)
+        try:
+            smtp.login(self.sender, self.password)
+        except smtplib.SMTPAuthenticationError as e:
+            self._auth_failed = True
+            _close_quietly(smtp)
+            raise NotifyError("SMTP认证失败！请检查您的发件人邮箱和密码（授权码）是否正确。", retryable=False) from e
+        except Exception:
+            _close_quietly(smtp)
+            raise
+        self._auth_failed = False
+        self._smtp = smtp
+        logging.info(f"已建立 SMTP 会话: {self.server}:{self.port}")
+        return smtp
+
+    def _quit(self) -> None:
+        if self._smtp is None:
             return
+        smtp, self._smtp = self._smtp, None
+        try:
+            smtp.quit()
+        except smtplib.SMTPServerDisconnected:
+            logging.info("与邮件服务器的连接已关闭。")
+        except Exception as e:
+            logging.debug(f"关闭 SMTP 连接时发生错误: {e}")
+            _close_quietly(smtp)
 
-        server.login(cfg_email['sender_email'], cfg_email['sender_password'])
-        server.send_message(msg)
-        logging.info("邮件已成功发送。")
-    except smtplib.SMTPAuthenticationError:
-        logging.error("SMTP认证失败！请检查您的发件人邮箱和密码（授权码）是否正确。")
-    except Exception as e:
-        logging.error(f"发送邮件时发生错误: {e}")
-    finally:
-        if server:
-            try:
-                server.quit()
-            except smtplib.SMTPServerDisconnected:
-                logging.info("与邮件服务器的连接已关闭。")
-            except Exception as e:
-                logging.error(f"关闭服务器连接时发生错误: {e}")
+
+def _is_loopback(host: str) -> bool:
+    if host.strip().lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
 
 
-def send_wecom(text: str, config) -> None:
+def _close_quietly(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.close()
+    except Exception:
+        pass
+
+
+class _WebhookBucket:
     """
-    将文本通过企业微信群机器人推送。
-    读取 [WeCom] 配置段的 webhook_urls（支持多行或逗号分隔多个 URL）。
+    单个 webhook 的令牌桶：容量为 window 秒内允许的消息数，每个令牌在被使用 window 秒后归还，
+    因此任意 window 秒内的发送数都不会超过容量（等价于企业微信按分钟计数的限制）。
+    归还时另加 margin 秒余量，抵消网络传输与服务端计时的偏差。等待令牌的协程按到达顺序排队。
     """
-    try:
-        if 'WeCom' not in config:
-            logging.debug("未配置 WeCom 段，跳过企业微信推送。")
-            return
-        cfg = config['WeCom']
-        raw = cfg.get('webhook_urls', '').strip()
-        if not raw:
-            logging.debug("WeCom.webhook_urls 为空，跳过企业微信推送。")
-            return
-        # 支持多行或逗号分隔
-        urls: list[str] = [u.strip() for u in raw.replace(',', '\n').splitlines() if u.strip()]
-        if not urls:
-            logging.debug("未解析到有效的企业微信 webhook URL，跳过推送。")
-            return
 
-        payload = {"msgtype": "text", "text": {"content": text[:2048]}}
-        headers = {"Content-Type": "application/json"}
-        for url in urls:
-            try:
-                resp = requests.post(url, json=payload, headers=headers, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json() if resp.headers.get('Content-Type', '').startswith('application/json') else {}
-                    if isinstance(data, dict) and data.get('errcode') == 0:
-                        logging.info("企业微信机器人推送成功。")
-                    else:
-                        logging.warning(f"企业微信推送返回异常: {data}")
-                else:
-                    logging.error(f"企业微信推送失败，HTTP {resp.status_code}: {resp.text[:200]}")
-            except Exception as e:
-                logging.error(f"企业微信推送请求异常: {e}")
-    except Exception as e:
-        logging.error(f"企业微信推送发生未处理错误: {e}") 
\ No newline at end of file
+    def __init__(self, capacity: int, window: float, margin: float = 1.0) -> None:
+        self.capacity = max(1, capacity)
+        self.window = window + margin
+        self._spent: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """取得一个令牌，返回为此等待的秒数。"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._spent and self._spent[0] <= now - self.window:
+                    self._spent.popleft()
+                if len(self._spent) < self.capacity:
+                    self._spent.append(now)
+                    return waited
+                delay = self._spent[0] + self.window - now
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def exhaust(self) -> None:
+        """服务端已判定超限（如机器人被其他程序共用）：视为令牌已全部用尽，从现在起重新计时。"""
+        now = time.monotonic()
+        self._spent = deque([now] * self.capacity)
+
+
+class WeComSender:
+    """
+    企业微信群机器人推送：
+    - 所有 webhook 共用一个连接池化的 httpx.AsyncClient，长连接复用，不必每条消息重新握手
+    - 每个 webhook 一个令牌桶（默认每 60 秒 20 条，即企业微信的单机器人限制），
+      超出时排队等待令牌，而不是发出去再被 errcode 45009 拒绝
+    - 仍收到 45009 时清空该桶，等下一个窗口后重发，最多 rate_limit_retries 次
+    """
+
+    def __init__(
+        self,
+        rate_limit: int = 20,
+        rate_window: float = 60.0,
+        rate_limit_retries: int = 3,
+        pool_maxsize: int = 10,
+        keepalive_expiry: float = 60.0,
+    ) -> None:
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.rate_limit_retries = max(0, rate_limit_retries)
+        self._buckets: dict[str, _WebhookBucket] = {}
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+
+    @classmethod
+    def from_config(cls, config, webhook_count: int = 1) -> 'WeComSender':
+        """读取 [WeCom] rate_limit / rate_window / rate_limit_retries；连接池大小随 webhook 数量调整。"""
+        cfg = config['WeCom'] if 'WeCom' in config else {}
+        pool_maxsize = max(10, webhook_count)
+        try:
+            return cls(
+                rate_limit=int(cfg.get('rate_limit', 20)),
+                rate_window=float(cfg.get('rate_window', 60)),
+                rate_limit_retries=int(cfg.get('rate_limit_retries', 3)),
+                pool_maxsize=pool_maxsize,
+            )
+        except ValueError:
+            logging.warning("[WeCom] 限速配置无效，使用默认值（每 60 秒 20 条）。")
+            return cls(pool_maxsize=pool_maxsize)
+
+    async def send(self, url: str, text: str) -> None:
+        """通过单个 webhook 推送文本；失败时抛出 NotifyError。"""
+        bucket = self._buckets.get(url)
+        if bucket is None:
+            bucket = self._buckets[url] = _WebhookBucket(self.rate_limit, self.rate_window)
+        payload = {"msgtype": "text", "text": {"content": _truncate_utf8(text, WECOM_MAX_BYTES)}}
+
+        for attempt in range(self.rate_limit_retries + 1):
+            waited = await bucket.acquire()
+            if waited >= 1:
+                logging.info(f"企业微信 {webhook_name(url)} 达到限速，排队 {waited:.1f} 秒后发送。")
+            data = await self._post(url, payload)
+            errcode = data.get('errcode')
+            if errcode == 0:
+                logging.info("企业微信机器人推送成功。")
+                return
+            if errcode == _WECOM_RATE_LIMITED and attempt < self.rate_limit_retries:
+                logging.warning(f"企业微信 {webhook_name(url)} 返回 45009（超出频率限制），等待下一个限速窗口后重发。")
+                bucket.exhaust()
+                continue
+            raise NotifyError(f"企业微信推送返回异常: {data}", retryable=errcode not in _WECOM_PERMANENT_ERRCODES)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _post(self, url: str, payload: dict) -> dict:
+        try:
+            resp = await self.client.post(url, json=payload)
+        except httpx.HTTPError as e:
+            raise NotifyError(f"企业微信推送请求异常: {e!r}") from e
+        if resp.status_code != 200:
+            raise NotifyError(f"企业微信推送失败，HTTP {resp.status_code}: {resp.text[:200]}")
+        try:
+            data = resp.json() if resp.headers.get('Content-Type', '').startswith('application/json') else {}
+        except ValueError:
+            data = {}
+        return data if isinstance(data, dict) else {}
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode('utf-8', errors='ignore')
+
+
+def webhook_name(url: str) -> str:
+    """日志中显示的 webhook 名称，只保留 key 的末尾几位，避免泄露完整地址。"""
+    key = parse_qs(urlsplit(url).query).get('key', [''])[0] or url
+    return f"wecom:…{key[-6:]}"
+
+
+def webhook_id(url: str) -> str:
+    """统计中区分 webhook 的键：完整地址 SHA1 的前 8 位，key 末尾相同的两个 webhook 也不会混在一起。"""
+    return f"wecom:{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
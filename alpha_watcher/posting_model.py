@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any
+
+from .utils import BJT, snowflake_timestamp
+
+DAYS_PER_WEEK = 7
+MINUTES_PER_DAY = 24 * 60
+
+
+class PostingHistogram:
+    """
+    账号历史发帖时间的直方图：
+    - 发帖时间由推文 ID（Snowflake）解出，按北京时间的星期与当天分钟（bin_minutes 一格）计数
+    - 每个账号一份计数，随 posting_model.json 持久化，重启后继续累积；
+      只登记 ID 大于该账号上次登记的推文，推迟到下一轮再处理的推文不会重复计数
+    - density() 给出一周内各格的发帖概率：按星期的计数向全周同一时刻的计数收缩，再与相邻格平滑，
+      数据稀疏时也不会把从未发过帖的时刻判为零概率
+    """
+
+    def __init__(self, bin_minutes: int = 5) -> None:
+        if bin_minutes <= 0 or MINUTES_PER_DAY % bin_minutes:
+            raise ValueError(f"bin_minutes 必须整除 1440，当前为 {bin_minutes}")
+        self.bin_minutes = bin_minutes
+        self.bins_per_day = MINUTES_PER_DAY // bin_minutes
+        self._counts: dict[str, list[int]] = {}
+        self._last_ids: dict[str, int] = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str, bin_minutes: int = 5) -> 'PostingHistogram':
+        histogram = cls(bin_minutes)
+        if not os.path.exists(path):
+            return histogram
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"读取发帖时间模型 {path} 时失败: {e}")
+            return histogram
+        if data.get('bin_minutes') != bin_minutes:
+            # 分格变化后旧计数无法直接对应，按新分格重新累积
+            logging.warning(f"发帖时间模型的分格（{data.get('bin_minutes')} 分钟）与配置不同，重新开始统计。")
+            return histogram
+        size = DAYS_PER_WEEK * histogram.bins_per_day
+        for account, counts in (data.get('accounts') or {}).items():
+            if isinstance(counts, list) and len(counts) == size:
+                histogram._counts[account] = [int(c) for c in counts]
+        for account, tweet_id in (data.get('last_ids') or {}).items():
+            histogram._last_ids[account] = int(tweet_id)
+        return histogram
+
+    # ---------- public API ----------
+
+    @property
+    def size(self) -> int:
+        return DAYS_PER_WEEK * self.bins_per_day
+
+    @property
+    def total(self) -> int:
+        return sum(sum(counts) for counts in self._counts.values())
+
+    def bin_of(self, moment: datetime) -> int:
+        local = moment.astimezone(BJT)
+        return local.weekday() * self.bins_per_day + (local.hour * 60 + local.minute) // self.bin_minutes
+
+    def record(self, account: str, tweet_id: int) -> bool:
+        """登记一条推文的发帖时间；已登记过或 ID 不含时间信息时返回 False。"""
+        account = account.lower()
+        created = snowflake_timestamp(tweet_id)
+        if created is None or tweet_id <= self._last_ids.get(account, 0):
+            return False
+        self._last_ids[account] = tweet_id
+        counts = self._counts.setdefault(account, [0] * self.size)
+        counts[self.bin_of(datetime.fromtimestamp(created, BJT))] += 1
+        self.dirty = True
+        return True
+
+    def density(self, shrinkage: float = 3.0, prior: float = 0.05) -> list[float]:
+        """
+        全部账号合并后一周各格的发帖概率（和为 1）：
+        p[星期, 格] ∝ (n[星期, 格] + shrinkage × 全周同格均值 + prior)，再做 [1/4, 1/2, 1/4] 环形平滑。
+        """
+        size, per_day = self.size, self.bins_per_day
+        merged = [0] * size
+        for counts in self._counts.values():
+            for i, c in enumerate(counts):
+                merged[i] += c
+        by_time = [sum(merged[d * per_day + b] for d in range(DAYS_PER_WEEK)) / DAYS_PER_WEEK for b in range(per_day)]
+        raw = [merged[i] + shrinkage * by_time[i % per_day] + prior for i in range(size)]
+        smoothed = [0.25 * raw[i - 1] + 0.5 * raw[i] + 0.25 * raw[(i + 1) % size] for i in range(size)]
+        total = sum(smoothed)
+        return [v / total for v in smoothed]
+
+    def save(self, path: str) -> None:
+        if not self.dirty:
+            return
+        data: dict[str, Any] = {'bin_minutes': self.bin_minutes, 'last_ids': self._last_ids, 'accounts': self._counts}
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            self.dirty = False
+        except IOError as e:
+            logging.error(f"保存发帖时间模型 {path} 时失败: {e}")
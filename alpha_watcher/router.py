@@ -0,0 +1,192 @@
+import logging
+import time
+from typing import Any, Iterable
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _SourceHealth:
+    def __init__(self, ewma_latency: float, ewma_success: float) -> None:
+        self.ewma_latency = ewma_latency
+        self.ewma_success = ewma_success
+        self.ewma_cache_lag = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.probing = False
+        # 尚未测到真实延迟时 ewma_latency 为先验值，第一次测量直接替换它
+        self.measured = False
+
+
+class InstanceRouter:
+    """
+    延迟感知的自适应来源路由：
+    - 每个来源维护 EWMA 延迟、EWMA 成功率与连续失败次数
+    - 连续失败达到 failure_threshold 时熔断（open），冷却后进入半开（half_open），
+      只放行一次探测；探测成功恢复，失败则冷却时间翻倍（上限 max_cooldown_seconds）
+    - 每个来源另有 EWMA 缓存滞后（镜像页面比已知最新推文落后的秒数），
+      有效检测延迟 = 抓取延迟 + 缓存滞后，缓存陈旧的镜像即使响应快也会被降级
+    - order() 按期望代价（(延迟 + 缓存滞后) / 成功率）升序排列健康来源，熔断中的来源不参与
+    - 从未测量过的来源（如新加入的实例或 Twitter API）以 initial_latency 为先验延迟，默认 0 即排在最前；
+      否则已测得低延迟的 Nitter 实例总会在对冲错峰之前返回，后面的来源永远不会被启动和测量
+    - 状态随 stats.json 持久化，重启后沿用历史表现
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 60.0,
+        max_cooldown_seconds: float = 900.0,
+        initial_latency: float = 0.0,
+    ) -> None:
+        self.alpha = alpha
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.initial_latency = max(0.0, initial_latency)
+        self._health: dict[str, _SourceHealth] = {}
+
+    @classmethod
+    def from_config(cls, config, stats: dict[str, Any] | None = None) -> 'InstanceRouter':
+        """从 [Router] 配置段构造，并从 stats 恢复历史 EWMA。"""
+        cfg = config['Router'] if 'Router' in config else {}
+        try:
+            router = cls(
+                alpha=float(cfg.get('ewma_alpha', 0.3)),
+                failure_threshold=int(cfg.get('failure_threshold', 3)),
+                cooldown_seconds=float(cfg.get('cooldown_seconds', 60)),
+                max_cooldown_seconds=float(cfg.get('max_cooldown_seconds', 900)),
+                initial_latency=float(cfg.get('initial_latency', 0)),
+            )
+        except ValueError:
+            router = cls()
+        if stats:
+            router.restore(stats)
+        return router
+
+    # ---------- public API ----------
+
+    def order(self, names: list[str]) -> list[str]:
+        """返回本轮应尝试的来源（按期望代价升序），熔断/半开中的来源被剔除。"""
+        now = time.time()
+        candidates = []
+        for position, name in enumerate(names):
+            health = self._get(name)
+            self._refresh_state(name, health, now)
+            if health.state != CLOSED:
+                continue
+            # 同代价时保持配置顺序
+            candidates.append((self._cost(health), position, name))
+        if not candidates:
+            # 全部熔断时不能停止检查，退化为按历史表现全部尝试
+            logging.warning("所有来源均处于熔断状态，本轮忽略熔断按历史表现尝试。")
+            for position, name in enumerate(names):
+                candidates.append((self._cost(self._get(name)), position, name))
+        candidates.sort()
+        return [name for _, _, name in candidates]
+
+    def due_probes(self, names: Iterable[str]) -> list[str]:
+        """返回已进入半开状态、应发起一次探测的来源，并标记为探测中。"""
+        now = time.time()
+        probes = []
+        for name in names:
+            health = self._get(name)
+            self._refresh_state(name, health, now)
+            if health.state == HALF_OPEN and not health.probing:
+                health.probing = True
+                probes.append(name)
+        return probes
+
+    def record(self, name: str, ok: bool, latency: float) -> None:
+        health = self._get(name)
+        a = self.alpha
+        health.ewma_latency = (1 - a) * health.ewma_latency + a * latency if health.measured else latency
+        health.measured = True
+        health.ewma_success = (1 - a) * health.ewma_success + a * (1.0 if ok else 0.0)
+        health.probing = False
+
+        if ok:
+            if health.state != CLOSED:
+                logging.info(f"来源 {name} 探测成功，解除熔断。")
+            health.consecutive_failures = 0
+            health.state = CLOSED
+            health.cooldown = 0.0
+            return
+
+        health.consecutive_failures += 1
+        if health.state == HALF_OPEN:
+            health.cooldown = min(self.max_cooldown_seconds, max(self.cooldown_seconds, health.cooldown * 2))
+            self._open(name, health)
+        elif health.consecutive_failures >= self.failure_threshold:
+            health.cooldown = self.cooldown_seconds
+            self._open(name, health)
+
+    def record_cancelled(self, name: str, elapsed: float) -> None:
+        """被对冲取消的请求：只知道延迟至少为 elapsed，仅在其更慢时修正延迟估计。"""
+        health = self._get(name)
+        if not health.measured:
+            # 先验不可信，改用已知的下限
+            health.ewma_latency = elapsed
+            health.measured = True
+        elif elapsed > health.ewma_latency:
+            health.ewma_latency = (1 - self.alpha) * health.ewma_latency + self.alpha * elapsed
+
+    def record_freshness(self, name: str, cache_lag: float) -> None:
+        """记录一次成功抓取测得的缓存滞后（秒）。"""
+        health = self._get(name)
+        health.ewma_cache_lag = (1 - self.alpha) * health.ewma_cache_lag + self.alpha * max(0.0, cache_lag)
+
+    def restore(self, stats: dict[str, Any]) -> None:
+        for name, data in stats.items():
+            if isinstance(data, dict) and 'ewma_latency' in data:
+                health = self._get(name)
+                try:
+                    health.ewma_latency = float(data['ewma_latency'])
+                    health.measured = True
+                    health.ewma_success = float(data.get('ewma_success', 1.0))
+                    health.ewma_cache_lag = float(data.get('ewma_cache_lag', 0.0))
+                except (TypeError, ValueError):
+                    continue
+
+    def export(self, stats: dict[str, Any]) -> None:
+        """把 EWMA 与熔断状态写回 stats，随 stats.json 一起保存。"""
+        for name, health in self._health.items():
+            if not health.measured:
+                # 先验不是测量值，保存后重启会被当作真实延迟
+                continue
+            entry = stats.setdefault(name, {'attempts': 0, 'successes': 0})
+            entry['ewma_latency'] = round(health.ewma_latency, 3)
+            entry['ewma_success'] = round(health.ewma_success, 4)
+            entry['ewma_cache_lag'] = round(health.ewma_cache_lag, 1)
+            entry['breaker'] = health.state
+
+    # ---------- internal ----------
+
+    def _get(self, name: str) -> _SourceHealth:
+        health = self._health.get(name)
+        if health is None:
+            # 新来源使用乐观先验，保证会被尝试
+            health = _SourceHealth(self.initial_latency, 1.0)
+            self._health[name] = health
+        return health
+
+    @staticmethod
+    def _cost(health: _SourceHealth) -> float:
+        return (health.ewma_latency + health.ewma_cache_lag) / max(health.ewma_success, 0.05)
+
+    def _open(self, name: str, health: _SourceHealth) -> None:
+        health.state = OPEN
+        health.open_until = time.time() + health.cooldown
+        logging.warning(f"来源 {name} 连续失败 {health.consecutive_failures} 次，熔断 {health.cooldown:.0f} 秒。")
+
+    @staticmethod
+    def _refresh_state(name: str, health: _SourceHealth, now: float) -> None:
+        if health.state == OPEN and now >= health.open_until:
+            health.state = HALF_OPEN
+            health.probing = False
+            logging.info(f"来源 {name} 冷却结束，进入半开状态等待探测。")
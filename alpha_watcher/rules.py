@@ -0,0 +1,402 @@
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+try:
+    import ahocorasick  # type: ignore
+except ImportError:  # 可选依赖，缺失时使用纯 Python 自动机
+    ahocorasick = None  # type: ignore
+
+# 推送渠道名称，规则的 channels 只能取这些值
+CHANNELS = ('email', 'wecom')
+
+# 表达式语法树节点：
+#   ('lit', 文本, 忽略大小写) / ('re', 模式, 忽略大小写) / ('and', [子节点]) / ('or', [子节点]) / ('not', 子节点) / ('true',)
+Node = tuple
+# 编译后的求值函数：参数为命中的字面量 ID 集合与按需计算的正则结果
+Evaluator = Callable[[set[int], Callable[[int], bool]], bool]
+
+# 正则字面量的结束 / 与可选的 i 之后必须是分隔符，/abc/index 这类路径仍是普通词
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|(,)|"((?:[^"\\]|\\.)*)"|/((?:[^/\\]|\\.)+)/(i?)(?=[\s(),]|$)|([^\s(),"]+))')
+_OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+@dataclass
+class Rule:
+    """一条匹配规则：表达式、适用账号（空为全部）与推送渠道（空为全部）。"""
+    name: str
+    expression: str
+    accounts: frozenset[str] = field(default_factory=frozenset)
+    channels: frozenset[str] = field(default_factory=frozenset)
+    ignore_case: bool = False
+
+
+class RuleSyntaxError(ValueError):
+    """规则表达式语法错误。"""
+
+
+class _AhoCorasick:
+    """纯 Python Aho-Corasick 自动机：一次扫描找出文本中出现的全部字面量。"""
+
+    def __init__(self, patterns: dict[str, int]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        outputs: list[set[int]] = [set()]
+        for pattern, pattern_id in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(pattern_id)
+
+        # 按层次遍历建立失败指针，并把后缀状态的输出合并进来
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                outputs[nxt] |= outputs[self._fail[nxt]]
+        self._out: list[Optional[frozenset[int]]] = [frozenset(o) if o else None for o in outputs]
+
+    def scan(self, text: str, hits: set[int]) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = out[state]
+            if found is not None:
+                hits |= found
+
+
+class _NativeAhoCorasick:
+    """pyahocorasick（C 实现）封装，接口与 _AhoCorasick 相同。"""
+
+    def __init__(self, patterns: dict[str, int]) -> None:
+        self._automaton = ahocorasick.Automaton()
+        for pattern, pattern_id in patterns.items():
+            self._automaton.add_word(pattern, pattern_id)
+        self._automaton.make_automaton()
+
+    def scan(self, text: str, hits: set[int]) -> None:
+        for _, pattern_id in self._automaton.iter(text):
+            hits.add(pattern_id)
+
+
+def _build_automaton(patterns: dict[str, int]):
+    if not patterns:
+        return None
+    if ahocorasick is not None:
+        return _NativeAhoCorasick(patterns)
+    return _AhoCorasick(patterns)
+
+
+def parse_expression(expression: str, ignore_case: bool = False) -> Node:
+    """
+    解析规则表达式：
+    - 普通词为子串匹配，含空格或运算符的词用双引号包裹；/模式/ 为正则，/模式/i 忽略大小写
+    - 运算符 AND、OR、NOT（大写）与括号，优先级 NOT > AND > OR
+    - 相邻的词与逗号均视为 AND，因此旧的 `币安,Alpha,积分` 写法可直接使用
+    """
+    tokens: list[tuple[str, object]] = []
+    pos = 0
+    text = expression.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            raise RuleSyntaxError(f"无法解析的位置 {pos}: {text[pos:pos + 20]!r}")
+        pos = m.end()
+        lparen, rparen, comma, quoted, regex, regex_flag, word = m.groups()
+        if lparen:
+            tokens.append(('(', None))
+        elif rparen:
+            tokens.append((')', None))
+        elif comma:
+            tokens.append(('AND', None))
+        elif quoted is not None:
+            tokens.append(('lit', re.sub(r'\\(.)', r'\1', quoted)))
+        elif regex is not None:
+            pattern = regex.replace('\\/', '/')
+            flags = re.IGNORECASE if ignore_case or regex_flag else 0
+            try:
+                re.compile(pattern, flags)
+            except re.error as e:
+                raise RuleSyntaxError(f"正则 /{pattern}/ 无效: {e}") from e
+            tokens.append(('re', (pattern, bool(flags))))
+        elif word in _OPERATORS:
+            tokens.append((word, None))
+        else:
+            tokens.append(('lit', word))
+
+    parser = _Parser(tokens, ignore_case)
+    if not tokens:
+        return ('true',)
+    node = parser.parse_or()
+    if parser.pos != len(tokens):
+        raise RuleSyntaxError(f"多余的符号: {tokens[parser.pos][0]}")
+    return node
+
+
+class _Parser:
+    """递归下降解析器。"""
+
+    def __init__(self, tokens: list[tuple[str, object]], ignore_case: bool) -> None:
+        self.tokens = tokens
+        self.pos = 0
+        self.ignore_case = ignore_case
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self._peek() == 'OR':
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and(self) -> Node:
+        children = [self.parse_not()]
+        while self._peek() not in (None, 'OR', ')'):
+            if self._peek() == 'AND':
+                self.pos += 1
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_not(self) -> Node:
+        if self._peek() == 'NOT':
+            self.pos += 1
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self) -> Node:
+        kind = self._peek()
+        if kind is None:
+            raise RuleSyntaxError("表达式意外结束")
+        token, value = self.tokens[self.pos]
+        self.pos += 1
+        if token == '(':
+            node = self.parse_or()
+            if self._peek() != ')':
+                raise RuleSyntaxError("缺少右括号")
+            self.pos += 1
+            return node
+        if token == 'lit':
+            return ('lit', value, self.ignore_case)
+        if token == 're':
+            pattern, flag = value  # type: ignore[misc]
+            return ('re', pattern, flag)
+        raise RuleSyntaxError(f"此处不应出现 {token}")
+
+
+class _Compiler:
+    """把语法树编译为求值闭包，并为所有规则分配共享的字面量与正则 ID。"""
+
+    def __init__(self) -> None:
+        self.literals: dict[str, int] = {}
+        self.folded_literals: dict[str, int] = {}
+        self.regexes: list[re.Pattern] = []
+        self._regex_ids: dict[tuple[str, bool], int] = {}
+        self._next_literal = 0
+
+    def _literal_id(self, text: str, ignore_case: bool) -> int:
+        table = self.folded_literals if ignore_case else self.literals
+        key = text.lower() if ignore_case else text
+        if key not in table:
+            table[key] = self._next_literal
+            self._next_literal += 1
+        return table[key]
+
+    def compile(self, node: Node) -> tuple[Evaluator, Optional[frozenset[int]]]:
+        """
+        返回 (求值函数, 触发集合)。
+        触发集合中至少一个字面量命中是规则成立的必要条件；为 None 时无法据此预筛，每条推文都需求值。
+        """
+        kind = node[0]
+        if kind == 'true':
+            return (lambda hits, regex: True), None
+        if kind == 'lit':
+            lit = self._literal_id(node[1], node[2])
+            return (lambda hits, regex: lit in hits), frozenset((lit,))
+        if kind == 're':
+            key = (node[1], node[2])
+            if key not in self._regex_ids:
+                self._regex_ids[key] = len(self.regexes)
+                self.regexes.append(re.compile(node[1], re.IGNORECASE if node[2] else 0))
+            rid = self._regex_ids[key]
+            return (lambda hits, regex: regex(rid)), None
+        if kind == 'not':
+            inner, _ = self.compile(node[1])
+            return (lambda hits, regex: not inner(hits, regex)), None
+
+        compiled = [self.compile(child) for child in node[1]]
+        evaluators = tuple(e for e, _ in compiled)
+        triggers = [t for _, t in compiled]
+        if kind == 'and':
+            # 任一子条件的触发集合都是整体的必要条件，取最小的一个
+            known = [t for t in triggers if t is not None]
+            trigger = min(known, key=len) if known else None
+            # 先求值字面量条件，正则与取反放在后面，尽量短路
+            ordered = tuple(e for e, t in sorted(zip(evaluators, triggers), key=lambda p: p[1] is None))
+            return (lambda hits, regex: all(e(hits, regex) for e in ordered)), trigger
+        # or：每个子条件都有触发集合时，其并集才是必要条件
+        trigger = None if any(t is None for t in triggers) else frozenset().union(*triggers)
+        return (lambda hits, regex: any(e(hits, regex) for e in evaluators)), trigger
+
+
+class RuleEngine:
+    """
+    多规则关键词引擎：
+    - 启动时把全部规则中的字面量编译进一个 Aho-Corasick 自动机（区分/忽略大小写各一个），
+      每条推文只扫描一遍即得到命中的全部字面量
+    - 每条规则预先计算触发集合，只有触发字面量命中的规则才需要求值布尔表达式，
+      规则数增长到数千条时单条推文的开销仍只与命中数相关
+    - 正则只在被候选规则用到时才执行，且同一推文内结果缓存
+    - 安装 pyahocorasick 时使用 C 实现的自动机，否则回退到纯 Python 实现
+    """
+
+    def __init__(self, rules: Iterable[tuple[Rule, Node]]) -> None:
+        compiler = _Compiler()
+        self.rules: list[Rule] = []
+        self._evaluators: list[Evaluator] = []
+        self._always: list[int] = []
+        self._by_literal: dict[int, list[int]] = {}
+        for rule, node in rules:
+            evaluator, trigger = compiler.compile(node)
+            index = len(self.rules)
+            self.rules.append(rule)
+            self._evaluators.append(evaluator)
+            if trigger is None:
+                self._always.append(index)
+            else:
+                for lit in trigger:
+                    self._by_literal.setdefault(lit, []).append(index)
+        self._regexes = compiler.regexes
+        self._automaton = _build_automaton(compiler.literals)
+        self._folded_automaton = _build_automaton(compiler.folded_literals)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @classmethod
+    def from_config(cls, config, accounts) -> 'RuleEngine':
+        """
+        由配置构造规则集：
+        - [Rule:<名称>] 段：match 为表达式，accounts 限定账号，channels 限定推送渠道，ignore_case 忽略大小写
+        - [Scraper]/[Account:<用户名>] 的 keywords 编译为"全部命中"规则，与新规则同时生效
+        - 未配置任何 [Rule:*] 时，没有关键词的账号推送其全部新推文（旧行为）
+        """
+        compiled: list[tuple[Rule, Node]] = []
+        for section_name in config.sections():
+            if not section_name.lower().startswith('rule:'):
+                continue
+            rule = _rule_from_section(section_name.split(':', 1)[1].strip(), config[section_name])
+            if rule is None:
+                continue
+            try:
+                compiled.append((rule, parse_expression(rule.expression, rule.ignore_case)))
+            except RuleSyntaxError as e:
+                logging.error(f"规则 {rule.name} 的表达式无效，已忽略: {e}")
+        has_rules = bool(compiled)
+
+        # 旧的关键词列表：同一组关键词的账号合并为一条规则
+        groups: dict[tuple[str, ...], list[str]] = {}
+        for account in accounts:
+            groups.setdefault(tuple(account.keywords), []).append(account.username.lower())
+        if has_rules:
+            # 配置了新规则时，没有关键词的账号只受新规则约束
+            groups.pop((), None)
+        elif list(groups) == [()]:
+            # 既无规则也无关键词：视为未配置
+            groups.clear()
+        for keywords, usernames in groups.items():
+            name = 'keywords' if len(groups) == 1 else f"keywords:@{usernames[0]}"
+            if not keywords:
+                logging.warning(f"账号 {['@' + u for u in usernames]} 未配置关键词，将推送其全部新推文。")
+            node: Node = ('and', [('lit', k, False) for k in keywords]) if keywords else ('true',)
+            compiled.append((Rule(name, ','.join(keywords), accounts=frozenset(usernames)), node))
+
+        engine = cls(compiled)
+        for rule in engine.rules:
+            logging.debug(f"已编译规则 {rule.name}: {rule.expression or '(全部推文)'}")
+        return engine
+
+    def match(self, account: str, text: str) -> list[Rule]:
+        """返回该账号的推文命中的全部规则（按配置顺序）。"""
+        hits: set[int] = set()
+        if self._automaton is not None:
+            self._automaton.scan(text, hits)
+        if self._folded_automaton is not None:
+            self._folded_automaton.scan(text.lower(), hits)
+
+        candidates = set(self._always)
+        for lit in hits:
+            candidates.update(self._by_literal.get(lit, ()))
+        if not candidates:
+            return []
+
+        cache: dict[int, bool] = {}
+
+        def regex(rid: int) -> bool:
+            if rid not in cache:
+                cache[rid] = self._regexes[rid].search(text) is not None
+            return cache[rid]
+
+        account = account.lower()
+        matched: list[Rule] = []
+        for index in sorted(candidates):
+            rule = self.rules[index]
+            if rule.accounts and account not in rule.accounts:
+                continue
+            if self._evaluators[index](hits, regex):
+                matched.append(rule)
+        return matched
+
+
+def channels_for(rules: Iterable[Rule]) -> frozenset[str]:
+    """命中规则的推送渠道并集；任一规则未限定渠道时推送到全部渠道。"""
+    channels: set[str] = set()
+    for rule in rules:
+        if not rule.channels:
+            return frozenset(CHANNELS)
+        channels |= rule.channels
+    return frozenset(channels)
+
+
+def _split(raw: str) -> list[str]:
+    return [item.strip() for item in raw.replace('\n', ',').split(',') if item.strip()]
+
+
+def _rule_from_section(name: str, section) -> Optional[Rule]:
+    expression = section.get('match', '').strip()
+    if not expression:
+        logging.error(f"规则 {name} 缺少 match 表达式，已忽略。")
+        return None
+    channels = {c.lower() for c in _split(section.get('channels', ''))}
+    unknown = channels - set(CHANNELS)
+    if unknown:
+        logging.warning(f"规则 {name} 包含未知推送渠道 {sorted(unknown)}，已忽略这些渠道。")
+        channels -= unknown
+        if not channels:
+            logging.error(f"规则 {name} 没有可用的推送渠道，已忽略。")
+            return None
+    ignore_case = section.get('ignore_case', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+    return Rule(
+        name=name,
+        expression=expression,
+        accounts=frozenset(a.lstrip('@').lower() for a in _split(section.get('accounts', ''))),
+        channels=frozenset(channels),
+        ignore_case=ignore_case,
+    )
@@ -0,0 +1,250 @@
+"""
+[Schedule] 离线模拟器：用虚拟时钟把历史推文时间回放到调度逻辑上，评估每种配置的
+每日检查次数、平均 / p95 检测延迟、非安静时段推文的平均延迟与发布在安静时段的推文数。
+
+用法：
+    python -m alpha_watcher.schedule_sim tweets.csv
+    python -m alpha_watcher.schedule_sim traces.jsonl --config config.ini \\
+        --set critical_interval=15,30,60 --set high_interval=45,60,120 --set normal_interval=180,300,600
+
+输入每行一条推文：Snowflake 推文 ID、Unix 时间戳（秒或毫秒）或 ISO 时间（无时区按北京时间），
+CSV 取第一列；JSON 行（如 traces.jsonl）取 created 或 id 字段。
+"""
+import argparse
+import configparser
+import itertools
+import json
+import re
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Iterable, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # 仅离线模拟需要
+    np = None
+
+from .posting_model import MINUTES_PER_DAY
+from .scheduler import CRITICAL, QUIET, _interval, _load_schedule, _Schedule, _window
+from .utils import BJT, snowflake_timestamp
+
+SECONDS_PER_DAY = MINUTES_PER_DAY * 60
+# 北京时间无夏令时，固定偏移即可把 Unix 时间换算为当天秒数
+_BJT_OFFSET = int(BJT.utcoffset(datetime(2020, 1, 1)).total_seconds())
+_SCHEDULE_KEYS = (
+    'quiet_start', 'quiet_end', 'high_start', 'high_end',
+    'critical_minutes', 'critical_interval', 'high_interval', 'normal_interval',
+)
+
+
+class SimResult(NamedTuple):
+    polls_per_day: float
+    mean_lag: float
+    p50_lag: float
+    p95_lag: float
+    active_mean_lag: float
+    quiet_tweets: int
+    tweets: int
+
+
+class _DayPlan:
+    """
+    一天内的检查时刻。调度与星期无关，只取决于当天第一次检查的时刻，
+    因此按"首次检查偏移"缓存整天的轨迹，一年的模拟只是若干条缓存轨迹的拼接。
+    与引擎一致：下次检查从本轮开始时刻起算（PollTimer），计划区间内的关键整点提前到整点检查。
+    """
+
+    def __init__(self, schedule: _Schedule, align: bool = True) -> None:
+        windows = [_window(schedule, m // 60, m % 60) for m in range(MINUTES_PER_DAY)]
+        self.quiet = [w == QUIET for w in windows]
+        self.intervals = [0 if w == QUIET else _interval(schedule, w) for w in windows]
+        quiet_start_h, quiet_start_m, quiet_end_h, quiet_end_m = schedule.quiet
+        self.quiet_end_minute = quiet_end_h * 60 + quiet_end_m
+        self._roll_over = (quiet_start_h, quiet_start_m) != (quiet_end_h, quiet_end_m)
+        boundaries = [h * 3600 for h in range(24) if align and windows[h * 60] == CRITICAL]
+        self.boundaries = boundaries + [b + SECONDS_PER_DAY for b in boundaries]
+        self._days: dict[int, tuple[Any, int]] = {}
+
+    def next_poll(self, t: int) -> int:
+        minute = (t // 60) % MINUTES_PER_DAY
+        if self.quiet[minute]:
+            # 与 get_sleep_duration 相同：暂停到 quiet_end，已过当天 quiet_end 则顺延到次日，至少 30 秒
+            day_start = t - t % SECONDS_PER_DAY
+            wake = day_start + self.quiet_end_minute * 60
+            if minute >= self.quiet_end_minute and self._roll_over:
+                wake += SECONDS_PER_DAY
+            return t + max(30, wake - t)
+        nxt = t + self.intervals[minute]
+        day_start = t - t % SECONDS_PER_DAY
+        i = bisect_right(self.boundaries, t - day_start)
+        if i < len(self.boundaries) and day_start + self.boundaries[i] < nxt:
+            nxt = day_start + self.boundaries[i]
+        return nxt
+
+    def day(self, entry: int) -> tuple[Any, int]:
+        """从当天 entry 秒开始的全部检查时刻（当天秒数），以及次日首次检查的偏移。"""
+        cached = self._days.get(entry)
+        if cached is None:
+            polls = []
+            t = entry
+            while t < SECONDS_PER_DAY:
+                polls.append(t)
+                t = self.next_poll(t)
+            cached = self._days[entry] = (np.asarray(polls, dtype=np.int64), t - SECONDS_PER_DAY)
+        return cached
+
+
+def simulate(schedule: _Schedule, created: 'np.ndarray', align: bool = True, visibility_delay: float = 0.0) -> SimResult:
+    """
+    created: 推文发布时间（Unix 秒）。从第一条推文当天北京时间 0 点起模拟到最后一条的次日，
+    推文在发布 visibility_delay 秒后（镜像缓存等）才能被看到，之后的第一次检查即检测时刻。
+    """
+    if np is None:
+        raise RuntimeError("离线模拟需要 numpy：pip install numpy")
+    local = np.sort(np.asarray(created, dtype=np.float64)) + _BJT_OFFSET
+    first_day = int(local[0] // SECONDS_PER_DAY)
+    days = int(local[-1] // SECONDS_PER_DAY) - first_day + 2
+    seconds = local - first_day * SECONDS_PER_DAY
+
+    plan = _DayPlan(schedule, align)
+    segments = []
+    entry = 0
+    for day in range(days):
+        polls, entry = plan.day(entry)
+        segments.append(polls + day * SECONDS_PER_DAY)
+        while entry >= SECONDS_PER_DAY:
+            # 安静时段跨过整天的极端配置
+            entry -= SECONDS_PER_DAY
+    polls = np.concatenate(segments)
+
+    index = np.searchsorted(polls, seconds + visibility_delay, side='left')
+    seen = index < len(polls)
+    lags = polls[index[seen]] - seconds[seen]
+    minutes = (seconds // 60).astype(np.int64) % MINUTES_PER_DAY
+    in_quiet = np.asarray(plan.quiet, dtype=bool)[minutes]
+    # 安静时段发布的推文要等到 quiet_end，单独计数，另给出其余推文的平均延迟
+    active = lags[~in_quiet[seen]]
+    return SimResult(
+        polls_per_day=len(polls) / days,
+        mean_lag=float(lags.mean()) if len(lags) else 0.0,
+        p50_lag=float(np.percentile(lags, 50)) if len(lags) else 0.0,
+        p95_lag=float(np.percentile(lags, 95)) if len(lags) else 0.0,
+        active_mean_lag=float(active.mean()) if len(active) else 0.0,
+        quiet_tweets=int(in_quiet.sum()),
+        tweets=len(seconds),
+    )
+
+
+# ---------- 输入与配置 ----------
+
+def _parse_timestamp(value: str) -> float | None:
+    value = value.strip().strip('"')
+    if not value:
+        return None
+    if value.isdigit():
+        number = int(value)
+        created = snowflake_timestamp(number) if number > 10 ** 15 else None
+        if created is not None:
+            return created
+        return number / 1000 if number > 10 ** 11 else float(number)
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = BJT.localize(moment)
+    return moment.timestamp()
+
+
+def load_timestamps(path: str) -> list[float]:
+    """读取推文发布时间（Unix 秒）；无法识别的行（如 CSV 表头）跳过。"""
+    created = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                value = record.get('created') or snowflake_timestamp(record.get('id', ''))
+                if value:
+                    created.append(float(value))
+                continue
+            value = _parse_timestamp(re.split(r'[,\t]', line, maxsplit=1)[0])
+            if value is not None:
+                created.append(value)
+    return created
+
+
+def sweep_configs(base: configparser.ConfigParser, grid: dict[str, list[str]]) -> Iterable[tuple[dict[str, str], _Schedule]]:
+    """base 的 [Schedule] 与 grid 中各取值的笛卡尔积。"""
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        overrides = dict(zip(keys, values))
+        config = configparser.ConfigParser(interpolation=None)
+        config['Schedule'] = dict(base['Schedule']) if 'Schedule' in base else {}
+        config['Schedule'].update(overrides)
+        yield overrides, _load_schedule(config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="[Schedule] 离线模拟器")
+    parser.add_argument('file', help="历史推文时间（CSV / 文本 / traces.jsonl）")
+    parser.add_argument('--config', help="基准配置文件，默认使用内置默认值")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=V1,V2',
+                        help=f"扫描的 [Schedule] 取值，可重复；可用键：{', '.join(_SCHEDULE_KEYS)}")
+    parser.add_argument('--max-polls', type=float, default=0, help="只列出每日检查次数不超过该值的配置")
+    parser.add_argument('--visibility-delay', type=float, default=0, help="推文发布后多少秒才会出现在来源上（镜像缓存）")
+    parser.add_argument('--no-align', action='store_true', help="不模拟关键整点对齐")
+    parser.add_argument('--top', type=int, default=20, help="输出前多少个配置（按非安静时段平均延迟）")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出")
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit("离线模拟需要 numpy：pip install numpy")
+
+    base = configparser.ConfigParser(interpolation=None)
+    if args.config:
+        base.read(args.config, encoding='utf-8')
+    grid: dict[str, list[str]] = {}
+    for item in args.set:
+        key, _, values = item.partition('=')
+        key = key.strip()
+        if key not in _SCHEDULE_KEYS or not values:
+            raise SystemExit(f"无效的 --set {item!r}，可用键：{', '.join(_SCHEDULE_KEYS)}")
+        grid[key] = [v.strip() for v in values.split(',') if v.strip()]
+
+    created = load_timestamps(args.file)
+    if not created:
+        raise SystemExit(f"{args.file} 中没有可识别的推文时间。")
+    created_array = np.asarray(created, dtype=np.float64)
+
+    started = time.perf_counter()
+    rows = []
+    for overrides, schedule in sweep_configs(base, grid):
+        result = simulate(schedule, created_array, not args.no_align, args.visibility_delay)
+        if args.max_polls and result.polls_per_day > args.max_polls:
+            continue
+        rows.append((overrides, result))
+    elapsed = time.perf_counter() - started
+    rows.sort(key=lambda row: (row[1].active_mean_lag, row[1].polls_per_day))
+
+    if args.json:
+        print(json.dumps([{**overrides, **result._asdict()} for overrides, result in rows[:args.top]], ensure_ascii=False, indent=2))
+        return
+    total = 1
+    for values in grid.values():
+        total *= len(values)
+    print(f"{len(created)} 条推文，模拟 {total} 种配置，耗时 {elapsed:.2f} 秒")
+    print(f"  {'每日检查':>8} {'平均延迟':>8} {'p50':>8} {'p95':>8} {'非安静平均':>8} {'安静时段':>6}  配置")
+    for overrides, r in rows[:args.top]:
+        desc = ' '.join(f"{k}={v}" for k, v in overrides.items()) or '(基准配置)'
+        print(f"  {r.polls_per_day:>12.0f} {r.mean_lag:>11.1f}s {r.p50_lag:>7.0f}s {r.p95_lag:>7.0f}s "
+              f"{r.active_mean_lag:>12.1f}s {r.quiet_tweets:>10}  {desc}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
+import asyncio
 import logging
+import math
+import random
+import time
 from datetime import datetime, timedelta
+from typing import NamedTuple
 
+from .metrics import REGISTRY
+from .posting_model import DAYS_PER_WEEK, MINUTES_PER_DAY, PostingHistogram
 from .utils import BJT
 
 
@@ -28,15 +35,22 @@ def _in_time_range(now_hour: int, now_minute: int, start_h: int, start_m: int, e
         return now_total >= start_total or now_total < end_total
 
 
-def get_sleep_duration(config) -> int:
-    """根据配置计算下一次检查的休眠秒数。
-    配置项（[Schedule]）：
-    - quiet_start, quiet_end (HH:MM)
-    - high_start, high_end (HH:MM)
-    - critical_minutes, critical_interval, high_interval, normal_interval
-    默认为：
-    quiet 23:02-10:00，high 15:00-23:00，critical_minutes=2，critical=30，高峰=60，普通=300
-    """
+QUIET = 'quiet'
+CRITICAL = 'critical'
+HIGH = 'high'
+NORMAL = 'normal'
+
+
+class _Schedule(NamedTuple):
+    quiet: tuple[int, int, int, int]
+    high: tuple[int, int, int, int]
+    critical_minutes: int
+    critical_interval: int
+    high_interval: int
+    normal_interval: int
+
+
+def _load_schedule(config) -> _Schedule:
     schedule = config['Schedule'] if 'Schedule' in config else {}
 
     quiet_start_h, quiet_start_m = _parse_hhmm(schedule.get('quiet_start', '23:02'), 23, 2)
@@ -53,12 +67,57 @@ def get_sleep_duration(config) -> int:
     except Exception:
         critical_minutes, critical_interval, high_interval, normal_interval = 2, 30, 60, 300
 
+    return _Schedule(
+        (quiet_start_h, quiet_start_m, quiet_end_h, quiet_end_m),
+        (high_start_h, high_start_m, high_end_h, high_end_m),
+        critical_minutes, critical_interval, high_interval, normal_interval,
+    )
+
+
+def _window(schedule: _Schedule, hour: int, minute: int) -> str:
+    if _in_time_range(hour, minute, *schedule.quiet):
+        return QUIET
+    if _in_time_range(hour, minute, *schedule.high):
+        # 整点前后 critical_minutes 分钟
+        if minute >= 60 - schedule.critical_minutes or minute < schedule.critical_minutes:
+            return CRITICAL
+        return HIGH
+    return NORMAL
+
+
+def _interval(schedule: _Schedule, window: str) -> int:
+    """非安静时段的检查间隔（秒），与 get_sleep_duration 一致，下限 10 秒。"""
+    if window == CRITICAL:
+        return max(10, schedule.critical_interval)
+    if window == HIGH:
+        return max(10, schedule.high_interval)
+    return max(10, schedule.normal_interval)
+
+
+def schedule_window(config, when: datetime | None = None) -> str:
+    """给定时刻（默认当前）所处的调度时段：quiet / critical / high / normal。"""
+    moment = (when or datetime.now(BJT)).astimezone(BJT)
+    return _window(_load_schedule(config), moment.hour, moment.minute)
+
+
+def get_sleep_duration(config) -> int:
+    """根据配置计算下一次检查的休眠秒数。
+    配置项（[Schedule]）：
+    - quiet_start, quiet_end (HH:MM)
+    - high_start, high_end (HH:MM)
+    - critical_minutes, critical_interval, high_interval, normal_interval
+    默认为：
+    quiet 23:02-10:00，high 15:00-23:00，critical_minutes=2，critical=30，高峰=60，普通=300
+    """
+    schedule = _load_schedule(config)
     now_bjt = datetime.now(BJT)
     hour = now_bjt.hour
     minute = now_bjt.minute
+    window = _window(schedule, hour, minute)
 
     # 安静时间段：暂停至 quiet_end
-    if _in_time_range(hour, minute, quiet_start_h, quiet_start_m, quiet_end_h, quiet_end_m):
+    if window == QUIET:
+        quiet_start_h, quiet_start_m, quiet_end_h, quiet_end_m = schedule.quiet
         pause_until = now_bjt.replace(hour=quiet_end_h, minute=quiet_end_m, second=0, microsecond=0)
         # 如果当前已过当天 quiet_end，需要顺延到次日
         quiet_end_total = quiet_end_h * 60 + quiet_end_m
@@ -69,15 +128,264 @@ def get_sleep_duration(config) -> int:
         logging.info(f"处于休眠时间段，将暂停至北京时间 {pause_until.strftime('%Y-%m-%d %H:%M:%S')}")
         return max(30, sleep_seconds)
 
-    # 高峰时间段
-    if _in_time_range(hour, minute, high_start_h, high_start_m, high_end_h, high_end_m):
-        # 整点前后 critical_minutes 分钟
-        if minute >= 60 - critical_minutes or minute < critical_minutes:
-            logging.info(f"处于关键时间段，{critical_interval}秒后检查。")
-            return max(10, critical_interval)
-        else:
-            logging.info(f"处于高峰时段，{high_interval}秒后检查。")
-            return max(10, high_interval)
-
-    logging.info(f"处于普通时段，{normal_interval}秒后检查。")
-    return max(10, normal_interval) 
\ No newline at end of file
+    if window == CRITICAL:
+        logging.info(f"处于关键时间段，{schedule.critical_interval}秒后检查。")
+    elif window == HIGH:
+        logging.info(f"处于高峰时段，{schedule.high_interval}秒后检查。")
+    else:
+        logging.info(f"处于普通时段，{schedule.normal_interval}秒后检查。")
+    return _interval(schedule, window)
+
+
+class AdaptiveSchedule:
+    """
+    按历史发帖时间分配检查次数（[Schedule] mode = adaptive）：
+    - 把每日检查预算 daily_budget 分配到一周的各时间格，检查频率与发帖概率的平方根成正比：
+      在总次数固定时，这一分配使平均检测延迟（发帖到下次检查的间隔期望）最小
+    - 固定时段仍是硬约束：安静时段照常暂停，检查间隔不短于 critical_interval、不长于 normal_interval
+    - 下次检查时间按频率向前积分得到，临近发帖高峰时会提前醒来，而不是按当前格的间隔睡过高峰
+    - 样本少于 min_samples 条时沿用固定时段
+    """
+
+    def __init__(self, config, histogram: PostingHistogram, daily_budget: float = 0.0, min_samples: int = 30) -> None:
+        self.config = config
+        self.histogram = histogram
+        self.min_samples = max(1, min_samples)
+        self._schedule = _load_schedule(config)
+        self.floor = max(10, self._schedule.critical_interval)
+        self.ceiling = max(self.floor, self._schedule.normal_interval)
+        # 每分钟在固定时段下的检查间隔（秒），安静时段为 0
+        self._fixed = [0] * (DAYS_PER_WEEK * MINUTES_PER_DAY)
+        for minute in range(len(self._fixed)):
+            window = _window(self._schedule, (minute % MINUTES_PER_DAY) // 60, minute % 60)
+            if window != QUIET:
+                self._fixed[minute] = _interval(self._schedule, window)
+        self.fixed_daily_polls = sum(60 / i for i in self._fixed if i) / DAYS_PER_WEEK
+        # 默认与固定时段的检查次数相同，只改变分布
+        self.daily_budget = daily_budget if daily_budget > 0 else self.fixed_daily_polls
+        self._rates: list[float] = []  # 各格每分钟检查次数
+        self._fitted_total = -1
+        self._warned_samples = False
+
+    @classmethod
+    def from_config(cls, config, histogram: PostingHistogram) -> 'AdaptiveSchedule | None':
+        """读取 [Schedule] mode / daily_budget / min_samples；mode 不是 adaptive 时返回 None。"""
+        schedule = config['Schedule'] if 'Schedule' in config else {}
+        if str(schedule.get('mode', 'fixed')).strip().lower() != 'adaptive':
+            return None
+        try:
+            return cls(
+                config,
+                histogram,
+                daily_budget=float(schedule.get('daily_budget', 0)),
+                min_samples=int(schedule.get('min_samples', 30)),
+            )
+        except ValueError:
+            logging.warning("[Schedule] 自适应调度参数无效，使用默认值。")
+            return cls(config, histogram)
+
+    # ---------- public API ----------
+
+    def sleep_duration(self, now: datetime | None = None) -> int:
+        now_bjt = (now or datetime.now(BJT)).astimezone(BJT)
+        if self.histogram.total < self.min_samples:
+            if not self._warned_samples:
+                logging.info(f"发帖时间样本 {self.histogram.total} 条，少于 {self.min_samples} 条，暂按固定时段调度。")
+                self._warned_samples = True
+            return get_sleep_duration(self.config)
+        minute = now_bjt.weekday() * MINUTES_PER_DAY + now_bjt.hour * 60 + now_bjt.minute
+        if not self._fixed[minute]:
+            return get_sleep_duration(self.config)
+        self._fit()
+
+        # 从当前时刻起累积期望检查次数，达到 1 次的时刻即下次检查
+        elapsed = 0.0
+        offset = now_bjt.second + now_bjt.microsecond / 1e6
+        need = 1.0
+        for step in range(len(self._fixed)):
+            m = (minute + step) % len(self._fixed)
+            span = 60.0 - offset if step == 0 else 60.0
+            rate = self._rates[m // self.histogram.bin_minutes] / 60 if self._fixed[m] else 0.0
+            if rate * span >= need:
+                elapsed += need / rate
+                break
+            need -= rate * span
+            elapsed += span
+        seconds = max(self.floor, int(math.ceil(elapsed)))
+        logging.info(f"自适应调度：当前时段每小时约 {self._rates[minute // self.histogram.bin_minutes] * 60:.1f} 次检查，{seconds}秒后检查。")
+        return seconds
+
+    def expected_lag(self) -> tuple[float, float]:
+        """(自适应, 固定时段) 下非安静时段发帖的平均检测延迟估计（秒）。"""
+        self._fit()
+        density = self.histogram.density()
+        per_bin = self.histogram.bin_minutes
+        adaptive = fixed = weight = 0.0
+        for minute, interval in enumerate(self._fixed):
+            if not interval:
+                continue
+            b = minute // per_bin
+            p = density[b] / per_bin
+            adaptive += p * 30 / self._rates[b]
+            fixed += p * interval / 2
+            weight += p
+        return (adaptive / weight, fixed / weight) if weight else (0.0, 0.0)
+
+    # ---------- internal ----------
+
+    def _fit(self) -> None:
+        """发帖样本变化后重新分配：二分求比例系数，使截断后的总检查次数等于预算。"""
+        total = self.histogram.total
+        if total == self._fitted_total:
+            return
+        self._fitted_total = total
+        per_bin = self.histogram.bin_minutes
+        active = [0] * self.histogram.size
+        for minute, interval in enumerate(self._fixed):
+            if interval:
+                active[minute // per_bin] += 1
+        weights = [math.sqrt(p) for p in self.histogram.density()]
+        low_rate, high_rate = 60 / self.ceiling, 60 / self.floor
+        budget = self.daily_budget * DAYS_PER_WEEK
+
+        def rates_for(scale: float) -> list[float]:
+            return [min(high_rate, max(low_rate, scale * w)) for w in weights]
+
+        def polls(rates: list[float]) -> float:
+            return sum(r * a for r, a in zip(rates, active))
+
+        lo, hi = 0.0, high_rate / max(min(weights), 1e-12)
+        if polls(rates_for(lo)) >= budget:
+            logging.warning(f"每日检查预算 {self.daily_budget:.0f} 次低于 normal_interval 所需的下限，按最长间隔检查。")
+            hi = lo
+        for _ in range(60):
+            mid = (lo + hi) / 2
+            if polls(rates_for(mid)) < budget:
+                lo = mid
+            else:
+                hi = mid
+        self._rates = rates_for(hi)
+        adaptive, fixed = self.expected_lag() if total else (0.0, 0.0)
+        logging.info(
+            f"自适应调度已按 {total} 条发帖样本更新：每日约 {polls(self._rates) / DAYS_PER_WEEK:.0f} 次检查"
+            f"（固定时段 {self.fixed_daily_polls:.0f} 次），非安静时段预计平均检测延迟 {adaptive:.0f} 秒（固定时段 {fixed:.0f} 秒）。"
+        )
+
+
+# 检查时刻相对计划的偏差（秒）的分桶
+_TICK_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def next_critical_boundary(config, after: datetime, until: datetime) -> datetime | None:
+    """(after, until] 内第一个关键整点（高峰时段内、整点落在关键分钟中）；没有则返回 None。"""
+    schedule = _load_schedule(config)
+    if schedule.critical_minutes <= 0:
+        return None
+    boundary = after.astimezone(BJT).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    while boundary <= until:
+        if _window(schedule, boundary.hour, 0) == CRITICAL:
+            return boundary
+        boundary += timedelta(hours=1)
+    return None
+
+
+class PollTimer:
+    """
+    基于单调时钟的截止时间调度：
+    - 下次检查时刻 = 本轮开始时刻 + 间隔，抓取与派发耗时不再累加为漂移；本轮超时则立即开始下一轮，不补发
+    - 计划区间内若有关键整点（如北京时间 HH:00:00），改为在整点后 0~boundary_jitter 秒检查，之后从该时刻重新计间隔
+    - 普通检查加 ±jitter 秒（不超过间隔的 10%）的随机抖动，避免与其他客户端同步打到实例
+    - 等待分段进行（每段至多 max_nap 秒），每次醒来比较墙上时钟与单调时钟的差值；
+      系统时钟跳变（校时、休眠唤醒）超过 1 秒时重新计划：墙上时钟向前跳说明这段时间实际已经过去
+      （休眠期间单调时钟可能停走），剩余间隔相应缩短；向后跳（校时回拨）时单调时钟仍可信，剩余间隔不变；
+      之后按新的墙上时钟重新对齐整点
+    - 计划与实际检查时刻的偏差记入指标
+    """
+
+    def __init__(self, config, jitter: float = 2.0, boundary_jitter: float = 1.0, max_nap: float = 30.0) -> None:
+        self.config = config
+        self.jitter = max(0.0, jitter)
+        self.boundary_jitter = max(0.0, boundary_jitter)
+        self.max_nap = max(1.0, max_nap)
+        self._tick_started = time.monotonic()
+        self._deadline = self._tick_started
+        self._interval_deadline = self._tick_started
+        self._boundary: datetime | None = None
+        self._clock_offset = time.time() - time.monotonic()
+
+    @classmethod
+    def from_config(cls, config) -> 'PollTimer':
+        """读取 [Schedule] jitter / boundary_jitter（秒）。"""
+        schedule = config['Schedule'] if 'Schedule' in config else {}
+        try:
+            return cls(
+                config,
+                jitter=float(schedule.get('jitter', 2)),
+                boundary_jitter=float(schedule.get('boundary_jitter', 1)),
+            )
+        except ValueError:
+            logging.warning("[Schedule] jitter/boundary_jitter 无效，使用默认值。")
+            return cls(config)
+
+    # ---------- public API ----------
+
+    def begin(self) -> None:
+        """一轮检查开始时调用，作为下次计划的起点。"""
+        self._tick_started = time.monotonic()
+
+    def schedule(self, interval: float) -> float:
+        """按本轮开始时刻计划下次检查，返回距现在的秒数。"""
+        jitter = min(self.jitter, interval * 0.1)
+        self._interval_deadline = self._tick_started + interval + random.uniform(-jitter, jitter)
+        now = time.monotonic()
+        if self._interval_deadline < now:
+            REGISTRY.counter('watcher_tick_overruns_total', '本轮耗时超过检查间隔、立即开始下一轮的次数').inc()
+            self._interval_deadline = now
+        self._clock_offset = time.time() - now
+        self._align()
+        return self._deadline - now
+
+    async def wait(self) -> None:
+        while True:
+            now = time.monotonic()
+            offset = time.time() - now
+            jump = offset - self._clock_offset
+            if abs(jump) > 1.0:
+                logging.warning(f"检测到系统时钟跳变 {jump:+.1f} 秒，重新计划下次检查并对齐关键整点。")
+                REGISTRY.counter('watcher_clock_jumps_total', '检测到的系统时钟跳变次数').inc()
+                self._clock_offset = offset
+                # 以当前单调时刻为起点重设间隔截止时间，跳过的墙上时间计入已等待的部分
+                self._interval_deadline = now + max(0.0, self._interval_deadline - now - max(0.0, jump))
+                self._align()
+            remaining = self._deadline - now
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, self.max_nap))
+        self._record()
+
+    # ---------- internal ----------
+
+    def _align(self) -> None:
+        """计划区间内有关键整点时，把下次检查提前到整点之后。"""
+        now_wall = datetime.now(BJT)
+        until = now_wall + timedelta(seconds=max(0.0, self._interval_deadline - time.monotonic()))
+        self._boundary = next_critical_boundary(self.config, now_wall, until)
+        self._deadline = self._interval_deadline
+        if self._boundary is not None:
+            at = self._boundary.timestamp() + random.uniform(0.0, self.boundary_jitter) - self._clock_offset
+            if at < self._deadline:
+                self._deadline = at
+                logging.info(f"下次检查对齐到关键整点 {self._boundary.strftime('%H:%M:%S')}。")
+
+    def _record(self) -> None:
+        now = time.monotonic()
+        late = now - self._deadline
+        REGISTRY.histogram(
+            'watcher_tick_lateness_seconds', '实际检查时刻晚于计划时刻的秒数', _TICK_BUCKETS
+        ).observe(max(0.0, late))
+        REGISTRY.gauge('watcher_tick_offset_seconds', '最近一次检查相对计划时刻的偏差（秒）').set(late)
+        if self._boundary is not None and self._deadline < self._interval_deadline:
+            REGISTRY.histogram(
+                'watcher_boundary_offset_seconds', '关键整点检查实际时刻晚于整点的秒数', _TICK_BUCKETS
+            ).observe(max(0.0, time.time() - self._boundary.timestamp()))
+
@@ -0,0 +1,267 @@
+"""
+推文检测延迟追踪：
+- 每条新推文记录一条追踪：发布（由 Snowflake ID 解出）→ 首次抓到（及来源）→ 命中规则 → 入队 → 各渠道送达
+- 追踪结束（全部推送目标有结果，或未命中任何规则）时以一行紧凑 JSON 追加到追踪日志
+- 离线报告：python -m alpha_watcher.tracing [traces.jsonl]，按来源与调度时段给出检测延迟的 p50/p95/p99
+
+所有时间点均以发布时间为零点、单位为秒。发布时间来自 Twitter 服务器时钟，本机时钟需保持同步（NTP），
+否则延迟会整体偏移。
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter as _Tally
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from .metrics import REGISTRY
+from .utils import BJT, snowflake_timestamp
+
+TRACE_FILE = 'traces.jsonl'
+# 检测延迟从秒级（关键时段）到数小时（安静时段）不等
+LAG_BUCKETS = (5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0, 21600.0)
+
+
+class _Trace:
+    __slots__ = ('tweet_id', 'account', 'source', 'window', 'created', 'fetched', 'matched', 'rules',
+                 'queued', 'pending', 'delivered', 'failed')
+
+    def __init__(self, tweet_id: int, account: str, source: str, window: str, created: float, fetched: float) -> None:
+        self.tweet_id = tweet_id
+        self.account = account
+        self.source = source
+        self.window = window
+        self.created = created
+        self.fetched = fetched
+        self.matched: float | None = None
+        self.rules: list[str] = []
+        self.queued: float | None = None
+        self.pending: _Tally[str] = _Tally()  # 各渠道尚未给出结果的推送目标数
+        self.delivered: dict[str, float] = {}  # 渠道 -> 首个目标送达的时刻
+        self.failed: list[str] = []
+
+    def to_dict(self, complete: bool) -> dict[str, Any]:
+        def lag(moment: float | None) -> float | None:
+            return None if moment is None else round(moment - self.created, 3)
+
+        record: dict[str, Any] = {
+            'id': str(self.tweet_id),
+            'account': self.account,
+            'created': round(self.created, 3),
+            'window': self.window,
+            'source': self.source,
+            'fetched': lag(self.fetched),
+        }
+        if self.matched is not None:
+            record['matched'] = lag(self.matched)
+            record['rules'] = self.rules
+        if self.queued is not None:
+            record['queued'] = lag(self.queued)
+        if self.delivered:
+            record['delivered'] = {channel: lag(moment) for channel, moment in self.delivered.items()}
+        if self.failed:
+            record['failed'] = self.failed
+        if not complete:
+            record['incomplete'] = True
+        return record
+
+
+class DetectionTracer:
+    """
+    按推文 ID 收集追踪，结束后追加写入 path。
+    window_of(created) 返回推文发布时刻所处的调度时段，用于按时段汇总延迟。
+    同一推文被推迟到下一轮时沿用首次抓到的时间与来源。
+    """
+
+    def __init__(self, path: str, window_of: Callable[[float], str], max_pending: int = 1000) -> None:
+        self.path = path
+        self.window_of = window_of
+        self.max_pending = max(1, max_pending)
+        self._traces: dict[int, _Trace] = {}
+
+    @classmethod
+    def from_config(cls, config, window_of: Callable[[float], str]) -> 'DetectionTracer | None':
+        """读取 [Tracing] enabled（默认开启）与 file（默认 traces.jsonl）；关闭时返回 None。"""
+        cfg = config['Tracing'] if 'Tracing' in config else {}
+        if str(cfg.get('enabled', 'true')).strip().lower() in ('0', 'false', 'no', 'off'):
+            return None
+        return cls(cfg.get('file', TRACE_FILE).strip() or TRACE_FILE, window_of)
+
+    # ---------- public API ----------
+
+    def fetched(self, account: str, tweet_id: int, source: str, fetched_at: float) -> None:
+        """新推文首次被抓到；ID 不含发布时间（非 Snowflake）时不追踪。"""
+        if tweet_id in self._traces:
+            return
+        created = snowflake_timestamp(tweet_id)
+        if created is None:
+            return
+        if len(self._traces) >= self.max_pending:
+            # 长期未结束的追踪（如下游一直失败）按最早加入的顺序写出，防止无限增长
+            oldest = next(iter(self._traces))
+            self._finish(self._traces.pop(oldest), complete=False)
+        window = self.window_of(created)
+        self._traces[tweet_id] = _Trace(tweet_id, account, source, window, created, fetched_at)
+        REGISTRY.histogram(
+            'watcher_detection_lag_seconds', '推文发布到首次抓到的延迟（秒），按来源与调度时段区分',
+            LAG_BUCKETS, source=source, window=window,
+        ).observe(max(0.0, fetched_at - created))
+
+    def ignored(self, tweet_id: int) -> None:
+        """未命中任何规则：只记录检测延迟，立即结束。"""
+        trace = self._traces.pop(tweet_id, None)
+        if trace is not None:
+            self._finish(trace)
+
+    def matched(self, tweet_id: int, rules: Iterable[str]) -> None:
+        trace = self._traces.get(tweet_id)
+        if trace is not None:
+            trace.matched = time.time()
+            trace.rules = list(rules)
+
+    def queued(self, tweet_id: int, channels: Iterable[str]) -> None:
+        """已交给派发器；channels 为每个推送目标所属的渠道（同一渠道多个目标时重复出现）。"""
+        trace = self._traces.get(tweet_id)
+        if trace is None:
+            return
+        trace.queued = time.time()
+        trace.pending.update(channels)
+        if not trace.pending:
+            self._finish(self._traces.pop(tweet_id))
+
+    def delivered(self, tweet_ids: Iterable[int], channel: str, ok: bool) -> None:
+        """某个推送目标对这些推文（合并摘要时为多条）给出最终结果。"""
+        now = time.time()
+        for tweet_id in tweet_ids:
+            trace = self._traces.get(tweet_id)
+            if trace is None or trace.pending[channel] <= 0:
+                continue
+            trace.pending[channel] -= 1
+            if ok and channel not in trace.delivered:
+                trace.delivered[channel] = now
+                REGISTRY.histogram(
+                    'watcher_alert_lag_seconds', '推文发布到通知送达的延迟（秒），按渠道区分', LAG_BUCKETS, channel=channel,
+                ).observe(max(0.0, now - trace.created))
+            if trace.pending[channel] <= 0:
+                del trace.pending[channel]
+                if channel not in trace.delivered:
+                    trace.failed.append(channel)
+            if not trace.pending:
+                self._finish(self._traces.pop(tweet_id))
+
+    def close(self) -> None:
+        """退出时写出尚未结束的追踪，标记为 incomplete。"""
+        for trace in self._traces.values():
+            self._finish(trace, complete=False)
+        self._traces.clear()
+
+    # ---------- internal ----------
+
+    def _finish(self, trace: _Trace, complete: bool = True) -> None:
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace.to_dict(complete), ensure_ascii=False, separators=(',', ':')) + '\n')
+        except IOError as e:
+            logging.error(f"写入追踪日志 {self.path} 时失败: {e}")
+
+
+# ---------- 离线报告 ----------
+
+def load_traces(path: str) -> list[dict[str, Any]]:
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def percentile(values: list[float], q: float) -> float:
+    """最近秩分位数，values 须已排序。"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize(records: Iterable[dict[str, Any]], key: Callable[[dict[str, Any]], str | None],
+              value: Callable[[dict[str, Any]], float | None]) -> dict[str, dict[str, float]]:
+    groups: dict[str, list[float]] = {}
+    for record in records:
+        group, lag = key(record), value(record)
+        if group is not None and lag is not None:
+            groups.setdefault(group, []).append(lag)
+    summary = {}
+    for group, lags in sorted(groups.items()):
+        lags.sort()
+        summary[group] = {
+            'count': len(lags),
+            'p50': percentile(lags, 0.50),
+            'p95': percentile(lags, 0.95),
+            'p99': percentile(lags, 0.99),
+            'max': lags[-1],
+        }
+    return summary
+
+
+def _first_delivery(record: dict[str, Any]) -> float | None:
+    delivered = record.get('delivered') or {}
+    return min(delivered.values()) if delivered else None
+
+
+def report(records: list[dict[str, Any]]) -> str:
+    sections = [
+        ("检测延迟（发布 → 首次抓到）按来源", summarize(records, lambda r: r.get('source'), lambda r: r.get('fetched'))),
+        ("检测延迟（发布 → 首次抓到）按调度时段", summarize(records, lambda r: r.get('window'), lambda r: r.get('fetched'))),
+        ("通知延迟（发布 → 首个渠道送达）按调度时段", summarize(records, lambda r: r.get('window'), _first_delivery)),
+    ]
+    channels = sorted({c for r in records for c in (r.get('delivered') or {})})
+    for channel in channels:
+        sections.append((
+            f"通知延迟（发布 → {channel} 送达）按来源",
+            summarize(records, lambda r: r.get('source'), lambda r, c=channel: (r.get('delivered') or {}).get(c)),
+        ))
+
+    lines = []
+    if records:
+        first = datetime.fromtimestamp(min(r['created'] for r in records), BJT)
+        last = datetime.fromtimestamp(max(r['created'] for r in records), BJT)
+        matched = sum(1 for r in records if 'matched' in r)
+        lines.append(f"共 {len(records)} 条追踪（命中 {matched} 条），发布时间 {first:%Y-%m-%d %H:%M} ~ {last:%Y-%m-%d %H:%M}（北京时间）")
+    for title, summary in sections:
+        if not summary:
+            continue
+        lines.append("")
+        lines.append(title)
+        # 中文表头按显示宽度（每字两列）对齐
+        lines.append(f"  {'分组':<20} {'条数':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for group, s in summary.items():
+            lines.append(f"  {group:<24} {s['count']:>6} {s['p50']:>8.1f}s {s['p95']:>8.1f}s {s['p99']:>8.1f}s {s['max']:>8.1f}s")
+    return '\n'.join(lines) if lines else "没有追踪记录。"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="推文检测延迟报告")
+    parser.add_argument('file', nargs='?', default=TRACE_FILE, help=f"追踪日志路径，默认 {TRACE_FILE}")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出按来源/时段的汇总")
+    args = parser.parse_args()
+    if not os.path.exists(args.file):
+        raise SystemExit(f"追踪日志 {args.file} 不存在。")
+    records = load_traces(args.file)
+    if args.json:
+        print(json.dumps({
+            'by_source': summarize(records, lambda r: r.get('source'), lambda r: r.get('fetched')),
+            'by_window': summarize(records, lambda r: r.get('window'), lambda r: r.get('fetched')),
+            'alert_by_window': summarize(records, lambda r: r.get('window'), _first_delivery),
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(report(records))
+
+
+if __name__ == '__main__':
+    main()
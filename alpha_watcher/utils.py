@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import hashlib
 import pytz
 
 # 浏览器 UA 列表
@@ -43,7 +44,52 @@ def normalize_tweet_id(tweet_id_or_url: object) -> str | None:
     return None
 
 
+# Snowflake 推文 ID 的高 41 位是自 Twitter 纪元（2010-11-04 01:42:54.657 UTC）起的毫秒数
+TWITTER_EPOCH_MS = 1288834974657
+# 早于 Snowflake 的推文 ID 为自增序号，不含时间信息
+_FIRST_SNOWFLAKE_ID = 29_700_859_247
+
+
+def snowflake_timestamp(tweet_id: int | str) -> float | None:
+    """从 Snowflake 推文 ID 解出发布时间（Unix 秒）；无法解析或早于 Snowflake 的 ID 返回 None。"""
+    try:
+        value = int(tweet_id)
+    except (TypeError, ValueError):
+        return None
+    if value <= _FIRST_SNOWFLAKE_ID:
+        return None
+    return ((value >> 22) + TWITTER_EPOCH_MS) / 1000
+
+
 def normalize_text_for_fingerprint(text: str) -> str:
     """规范化文本用于计算去重指纹：小写化、合并空白、去掉不可见字符。"""
     simplified = re.sub(r'\s+', ' ', text or '').strip().lower()
-    return simplified 
\ No newline at end of file
+    return simplified 
+
+
+# 近似去重时忽略的内容：链接（含 Nitter 显示的无协议短链）与表情、标点等非文字字符
+_LINK_RE = re.compile(r'https?://\S+|\S*\w\.[a-z]{2,}/\S*', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^\w]+')
+
+
+def normalize_text_for_simhash(text: str) -> str:
+    """规范化文本用于近似去重：小写化，去掉链接、表情与标点，只保留文字、数字与单个空格。"""
+    simplified = _LINK_RE.sub(' ', (text or '').lower())
+    return _NON_WORD_RE.sub(' ', simplified).strip()
+
+
+def simhash64(text: str) -> int | None:
+    """
+    计算 64 位 SimHash：以字符二元组为特征，内容相近的文本汉明距离小。
+    规范化后过短的文本特征太少、结果不可靠，返回 None。
+    """
+    base = normalize_text_for_simhash(text)
+    if len(base) < 8:
+        return None
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(base[i:i + 2].encode('utf-8'), digest_size=8).digest(), 'big'), '064b')
+        for i in range(len(base) - 1)
+    ]
+    # 按位投票：某一位上 1 的个数过半则该位为 1（逐列统计比逐位累加快得多）
+    half = len(rows) / 2
+    return int(''.join('1' if column.count('1') > half else '0' for column in map(''.join, zip(*rows))), 2)
@@ -0,0 +1,168 @@
+"""
+去重器微基准：测量大窗口下每条目的内存占用与 seen()/mark_pushed() 耗时，
+并与旧版布局（十六进制字符串键 + 每次检查重建字典）对比；
+另外对比各存储后端（json 整文件重写 / journal 追加日志 / sqlite WAL）单次登记的落盘耗时，
+以及近似去重（SimHash 分块 LSH）查询耗时随历史规模的变化。
+
+用法：
+    python benchmarks/bench_deduper.py
+    python benchmarks/bench_deduper.py --entries 500000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alpha_watcher.dedup_store import KIND_FINGERPRINT, KIND_ID, open_store  # noqa: E402
+from alpha_watcher.deduper import Deduper, _ExpiringIndex, _NearDuplicateIndex  # noqa: E402
+
+BASE_ID = 1979000000000000000
+
+
+def measure_index(entries: int) -> float:
+    """新版索引：整数键字典 + 登记顺序队列，返回每条目字节数（ID 与指纹各一份）。"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    ids = _ExpiringIndex(entries, 7 * 24 * 3600)
+    fps = _ExpiringIndex(entries, 7 * 24 * 3600)
+    now = time.time()
+    for i in range(entries):
+        ids.add(BASE_ID + i, now)
+        fps.add(int.from_bytes(hashlib.sha1(str(i).encode()).digest()[:8], 'big'), now)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size / entries
+
+
+def measure_legacy(entries: int) -> float:
+    """旧版布局：字符串 ID 与 40 位十六进制指纹作为字典键。"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    ids: dict[str, float] = {}
+    fps: dict[str, float] = {}
+    now = time.time()
+    for i in range(entries):
+        ids[str(BASE_ID + i)] = now
+        fps[hashlib.sha1(str(i).encode()).hexdigest()] = now
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size / entries
+
+
+def legacy_seen(ids: dict[str, float], fps: dict[str, float], key: str, fp: str, ttl: float):
+    """旧版 seen()：每次检查都用推导式重建两个字典。"""
+    expire_before = time.time() - ttl
+    ids = {k: ts for k, ts in ids.items() if ts >= expire_before}
+    fps = {k: ts for k, ts in fps.items() if ts >= expire_before}
+    return ids, fps, key in ids or fp in fps
+
+
+def bench_ops(entries: int, checks: int) -> None:
+    ttl = 7 * 24 * 3600
+    with tempfile.TemporaryDirectory() as tmp:
+        deduper = Deduper(os.path.join(tmp, 'state.json'), max_history=entries, ttl_seconds=ttl)
+        now = time.time()
+        for i in range(entries):
+            deduper._ids.add(BASE_ID + i, now)
+            deduper._fingerprints.add(i, now)
+
+        probes = [str(BASE_ID + random.randrange(entries * 2)) for _ in range(checks)]
+        started = time.perf_counter()
+        for probe in probes:
+            deduper.seen(probe, f"text {probe}")
+        new_seen_us = (time.perf_counter() - started) / checks * 1e6
+
+        started = time.perf_counter()
+        for i in range(checks):
+            deduper._ids.add(BASE_ID + entries + i, now)
+        new_add_us = (time.perf_counter() - started) / checks * 1e6
+
+    ids = {str(BASE_ID + i): now for i in range(entries)}
+    fps = {hashlib.sha1(str(i).encode()).hexdigest(): now for i in range(entries)}
+    legacy_checks = max(1, min(checks, 20))
+    started = time.perf_counter()
+    for probe in probes[:legacy_checks]:
+        ids, fps, _ = legacy_seen(ids, fps, probe, probe, ttl)
+    legacy_seen_us = (time.perf_counter() - started) / legacy_checks * 1e6
+
+    print(f"  seen()        新版 {new_seen_us:10.2f} µs/次   旧版 {legacy_seen_us:12.2f} µs/次")
+    print(f"  登记 + 淘汰   新版 {new_add_us:10.2f} µs/次")
+
+
+def bench_stores(entries: int, marks: int) -> None:
+    """在已有 entries 条历史的前提下，测量各后端 mark_pushed() 的平均耗时。"""
+    ttl = 7 * 24 * 3600
+    for backend in ('json', 'journal', 'sqlite'):
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = {'store': backend, 'sqlite_path': os.path.join(tmp, 'state.db')}
+            state_file = os.path.join(tmp, 'state.json')
+            store = open_store(cfg, state_file, entries + marks, ttl)
+            deduper = Deduper(state_file, max_history=entries + marks, ttl_seconds=ttl, store=store)
+            now = time.time()
+            for i in range(entries):
+                deduper._ids.add(BASE_ID + i, now)
+                deduper._fingerprints.add(i, now)
+            if backend == 'sqlite':
+                with store._conn:
+                    store._conn.execute('BEGIN')
+                    for i in range(entries):
+                        store.append(KIND_ID, BASE_ID + i, now)
+                        store.append(KIND_FINGERPRINT, i, now)
+                store._pending = 0
+            else:
+                store.compact(deduper._state())
+
+            started = time.perf_counter()
+            for i in range(marks):
+                deduper.mark_pushed(str(BASE_ID + entries + i), f"bench {i}")
+            per_mark_ms = (time.perf_counter() - started) / marks * 1000
+
+            started = time.perf_counter()
+            Deduper(state_file, max_history=entries + marks, ttl_seconds=ttl, store=open_store(cfg, state_file, entries + marks, ttl)).close()
+            load_ms = (time.perf_counter() - started) * 1000
+            deduper.close()
+        print(f"  {backend:<8} mark_pushed {per_mark_ms:8.3f} ms/次   启动加载 {load_ms:8.1f} ms")
+
+
+def bench_near_duplicate(sizes: list[int], checks: int, max_distance: int = 4) -> None:
+    """近似去重查询：单次耗时与桶表数量成正比，随历史规模亚线性增长（表数量达到上限前）。"""
+    rng = random.Random(42)
+    for size in sizes:
+        index = _NearDuplicateIndex(size, 7 * 24 * 3600, max_distance)
+        now = time.time()
+        for _ in range(size):
+            index.add(rng.getrandbits(64), now)
+        probes = [rng.getrandbits(64) for _ in range(checks)]
+        started = time.perf_counter()
+        for probe in probes:
+            index.find(probe)
+        per_check_us = (time.perf_counter() - started) / checks * 1e6
+        print(f"  历史 {size:>7} 条   find() {per_check_us:8.2f} µs/次   桶表 {len(index._table_masks):>2} 张")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="去重器内存与耗时微基准")
+    parser.add_argument('--entries', type=int, default=200000, help="窗口条目数")
+    parser.add_argument('--checks', type=int, default=2000, help="查询次数")
+    parser.add_argument('--marks', type=int, default=50, help="存储后端基准中的登记次数")
+    args = parser.parse_args()
+
+    print(f"📦 窗口 {args.entries} 条（ID + 指纹各一份）")
+    print(f"  每条目内存    新版 {measure_index(args.entries):8.1f} B      旧版 {measure_legacy(args.entries):8.1f} B")
+    bench_ops(args.entries, args.checks)
+    print("💾 存储后端")
+    bench_stores(args.entries, args.marks)
+    print("🔍 近似去重（汉明距离 ≤ 4，分块 LSH）")
+    bench_near_duplicate([300, 3000, 30000, 300000], args.checks)
+
+
+if __name__ == '__main__':
+    main()
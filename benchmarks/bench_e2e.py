@@ -0,0 +1,195 @@
+"""
+端到端吞吐基准：在本地模拟服务（benchmarks/stubs.py）上运行真实的 AsyncWatcher 组件
+（对冲抓取、路由、HTTP 快速通道 / RSS、去重、规则匹配、通知派发、SMTP 与企业微信发送），
+按泊松过程发布新推文，报告每秒检查轮数、各来源抓取耗时分位数与通知送达延迟（发布 → 接收端收到）。
+
+每轮检查之间不休眠（或按 --interval），测的是管线本身的开销；状态文件写在临时目录中，不影响当前目录。
+--api 时结束前校验 Twitter API 确实参与了抓取，未参与则以非零状态退出。
+
+用法：
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --duration 60 --instances 4 --latency 0.3 --error-rate 0.1 --api
+    python benchmarks/bench_e2e.py --set Notify.coalesce_window=0 --set Scraper.use_rss=false
+"""
+import argparse
+import asyncio
+import configparser
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright  # noqa: E402
+
+from alpha_watcher.engine import AsyncWatcher  # noqa: E402
+from alpha_watcher.metrics import REGISTRY  # noqa: E402
+from alpha_watcher.tracing import percentile  # noqa: E402
+from stubs import Behavior, StubCluster, StubTweet, delivery_lags, publish  # noqa: E402
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.example.ini')
+KEYWORD = '空投'
+
+
+def build_config(cluster: StubCluster, overrides: list[str]) -> configparser.ConfigParser:
+    """示例配置的默认值 + 指向模拟服务的地址 + --set 覆盖项。"""
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(EXAMPLE_CONFIG, encoding='utf-8')
+    config.read_dict(cluster.config_sections())
+    config['Scraper']['keywords'] = KEYWORD
+    for item in overrides:
+        key, _, value = item.partition('=')
+        section, _, option = key.partition('.')
+        if not option:
+            raise SystemExit(f"无效的 --set {item!r}，格式为 Section.key=value")
+        if section not in config:
+            config[section] = {}
+        config[section][option] = value
+    return config
+
+
+def _quantiles(values: list[float]) -> str:
+    if not values:
+        return '无数据'
+    values = sorted(values)
+    return ' '.join(f"p{int(q * 100)} {percentile(values, q) * 1000:8.1f} ms" for q in (0.5, 0.9, 0.99))
+
+
+async def run(args: argparse.Namespace) -> None:
+    behavior = Behavior(args.latency, args.jitter, args.error_rate, args.challenge_rate, args.cache_lag)
+    cluster = StubCluster(
+        accounts=[f"account{i}" for i in range(args.accounts)],
+        instances=[behavior] * args.instances,
+        api=Behavior(args.latency, args.jitter, args.error_rate) if args.api else None,
+        rss=not args.no_rss,
+    )
+    await cluster.start()
+    config = build_config(cluster, args.set)
+    watcher = AsyncWatcher(config)
+
+    published: list[StubTweet] = []
+    matched: list[StubTweet] = []
+
+    def on_post(tweet: StubTweet, is_match: bool) -> None:
+        published.append(tweet)
+        if is_match:
+            matched.append(tweet)
+
+    poll_seconds: list[float] = []
+    try:
+        async with async_playwright() as playwright:
+            watcher._start(playwright)
+            try:
+                await watcher._init_baseline()
+                publisher = asyncio.create_task(
+                    publish(cluster.feed, args.rate, args.match_ratio, KEYWORD, random.Random(7), on_post)
+                )
+                started = time.monotonic()
+                while time.monotonic() - started < args.duration:
+                    tick = time.monotonic()
+                    await watcher._poll_once()
+                    poll_seconds.append(time.monotonic() - tick)
+                    if args.interval:
+                        await asyncio.sleep(max(0.0, args.interval - (time.monotonic() - tick)))
+                elapsed = time.monotonic() - started
+                publisher.cancel()
+
+                # 不再发布，继续检查直到全部命中推文送达各接收端（或超时），统计才完整
+                channels = sum(sink is not None for sink in (cluster.wecom_sink, cluster.smtp_sink))
+                drain_until = time.monotonic() + args.drain
+                while time.monotonic() < drain_until and _delivered(cluster) < len(matched) * channels:
+                    await watcher._poll_once()
+                    await asyncio.sleep(0.2)
+            finally:
+                await watcher._shutdown()
+    finally:
+        await cluster.close()
+
+    report(args, cluster, published, matched, poll_seconds, elapsed)
+    if args.api:
+        check_api_used(cluster)
+
+
+def check_api_used(cluster: StubCluster) -> None:
+    """--api 时 Twitter API 必须真正参与过抓取；否则路由从未启动它，报告的数字只反映 Nitter。"""
+    api_requests = sum(cluster.twitter.responses.values()) if cluster.twitter is not None else 0
+    series = REGISTRY.to_dict().get('watcher_fetch_seconds', {}).get('series', [])
+    api_fetches = sum(s['count'] for s in series if s['labels'].get('source') == 'Twitter API')
+    if not api_requests or not api_fetches:
+        raise SystemExit(f"Twitter API 未被使用：模拟服务收到 {api_requests} 个请求，抓取 {api_fetches} 次")
+    print(f"  Twitter API 参与抓取 {api_fetches} 次，模拟服务收到 {api_requests} 个请求")
+
+
+def _delivered(cluster: StubCluster) -> int:
+    return sum(len(delivery_lags(d.text, d.received)) for d in cluster.deliveries)
+
+
+def report(args: argparse.Namespace, cluster: StubCluster, published: list[StubTweet], matched: list[StubTweet],
+           poll_seconds: list[float], elapsed: float) -> None:
+    print(f"📏 {args.instances} 个 Nitter 实例{' + Twitter API' if args.api else ''}，{args.accounts} 个账号，"
+          f"延迟 {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms，错误率 {args.error_rate:.0%}，"
+          f"验证页 {args.challenge_rate:.0%}，缓存滞后 {args.cache_lag:.0f}s，RSS {'关闭' if args.no_rss else '开启'}")
+    print(f"  检查 {len(poll_seconds)} 轮 / {elapsed:.1f} 秒 = {len(poll_seconds) / elapsed:.2f} 轮/秒；"
+          f"单轮耗时 {_quantiles(poll_seconds)}")
+
+    fetch = REGISTRY.to_dict().get('watcher_fetch_seconds', {}).get('series', [])
+    print("  来源抓取耗时（watcher_fetch_seconds，按分桶估算）：")
+    for series in sorted(fetch, key=lambda s: (s['labels'].get('source', ''), s['labels'].get('outcome', ''))):
+        labels = series['labels']
+        quantiles = ' '.join(
+            f"{q} {series[q] * 1000:8.1f} ms" if series[q] is not None else f"{q} -" for q in ('p50', 'p90', 'p99')
+        )
+        print(f"    {labels.get('source', ''):<28} {labels.get('outcome', ''):<9} {series['count']:>6} 次  {quantiles}")
+
+    print(f"  发布 {len(published)} 条推文，命中关键词 {len(matched)} 条")
+    for channel in sorted({d.channel for d in cluster.deliveries} | {'email', 'wecom'}):
+        deliveries = [d for d in cluster.deliveries if d.channel == channel]
+        lags = [lag for d in deliveries for lag in delivery_lags(d.text, d.received)]
+        print(f"    {channel:<6} 收到 {len(deliveries):>4} 条通知，含 {len(lags):>4} 条推文；"
+              f"送达延迟 {_quantiles(lags)}")
+
+    print("  模拟服务响应：")
+    for server in cluster.servers:
+        responses = getattr(server, 'responses', None)
+        if responses is not None:
+            counts = ' '.join(f"{status}×{count}" for status, count in sorted(responses.items()))
+            print(f"    {server.name:<12} {counts or '无请求'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="端到端吞吐基准（本地模拟服务）")
+    parser.add_argument('--duration', type=float, default=30, help="测量时长（秒）")
+    parser.add_argument('--interval', type=float, default=0, help="两轮检查的间隔（秒），0 为连续检查")
+    parser.add_argument('--drain', type=float, default=45, help="测量结束后等待通知送达的最长时间（秒）")
+    parser.add_argument('--accounts', type=int, default=2, help="监控账号数")
+    parser.add_argument('--instances', type=int, default=3, help="Nitter 实例数")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务每个请求的平均延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.03, help="延迟的随机波动（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.05, help="返回 502 的比例")
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help="返回验证页的比例（会升级到 Playwright）")
+    parser.add_argument('--cache-lag', type=float, default=0.0, help="镜像缓存滞后（秒）")
+    parser.add_argument('--api', action='store_true', help="同时使用模拟的 Twitter API")
+    parser.add_argument('--no-rss', action='store_true', help="模拟实例不开放 RSS")
+    parser.add_argument('--rate', type=float, default=0.5, help="新推文发布速度（条/秒）")
+    parser.add_argument('--match-ratio', type=float, default=0.5, help="命中关键词的推文比例")
+    parser.add_argument('--set', action='append', default=[], metavar='Section.key=value', help="覆盖配置项，可重复")
+    parser.add_argument('--verbose', action='store_true', help="输出监控引擎日志")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # stats.json、去重状态等写在临时目录
+        os.chdir(workdir)
+        try:
+            asyncio.run(run(args))
+        finally:
+            os.chdir(previous)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+时间线解析微基准：对比旧实现（BeautifulSoup + html.parser 解析整页）与新的定向提取层。
+
+用法：
+    python benchmarks/bench_parser.py                 # 使用 benchmarks/pages/ 下录制的页面
+    python benchmarks/bench_parser.py --rounds 500
+    python benchmarks/bench_parser.py --record https://nitter.example.com/binancezh
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from alpha_watcher import extract  # noqa: E402
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+
+def legacy_parse(html_content: str) -> list[tuple[str, str]]:
+    """旧实现：解析整页 DOM 后再查找 timeline-item。"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    items = []
+    for tweet_div in soup.find_all('div', class_='timeline-item'):
+        link_tag = tweet_div.find('a', class_='tweet-link')
+        content_div = tweet_div.find('div', class_='tweet-content')
+        items.append((
+            str(link_tag['href']) if link_tag and link_tag.has_attr('href') else '',
+            content_div.text.strip() if content_div else '',
+        ))
+    return items
+
+
+def record(url: str) -> None:
+    """录制一个时间线页面到 benchmarks/pages/，供后续基准使用。"""
+    import httpx
+    from alpha_watcher.utils import USER_AGENTS
+
+    response = httpx.get(url, headers={'User-Agent': USER_AGENTS[0]}, timeout=15, follow_redirects=True)
+    response.raise_for_status()
+    parts = urlsplit(url)
+    name = f"{parts.netloc}_{parts.path.strip('/').replace('/', '_').replace(',', '+') or 'index'}.html"
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    with open(os.path.join(PAGES_DIR, name), 'w', encoding='utf-8') as f:
+        f.write(response.text)
+    print(f"✅ 已录制 {url} -> pages/{name} ({len(response.text)} 字节)")
+
+
+def bench(func, html_content: str, rounds: int) -> float:
+    """返回单次调用的平均耗时（毫秒）。"""
+    func(html_content)  # 预热
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(html_content)
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nitter 时间线解析微基准")
+    parser.add_argument('--rounds', type=int, default=200, help="每个页面每种解析器的重复次数")
+    parser.add_argument('--record', metavar='URL', help="录制一个时间线页面后退出")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+        return
+
+    pages = sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))
+    if not pages:
+        print(f"❌ {PAGES_DIR} 下没有录制的页面，请先使用 --record 录制。")
+        return
+
+    parsers = [('BeautifulSoup 整页 (旧)', legacy_parse), ('BeautifulSoup 定向提取 (回退)', extract._extract_soup)]
+    if extract.lxml is not None:
+        parsers.append(('lxml + XPath', extract._extract_lxml))
+    else:
+        print("⚠️ 未安装 lxml，跳过 C 解析器（pip install lxml）。")
+
+    for page in pages:
+        with open(page, encoding='utf-8') as f:
+            html_content = f.read()
+        items = extract.extract_timeline_items(html_content)
+        legacy = legacy_parse(html_content)
+        consistent = [(i.href, i.text) for i in items] == legacy
+        print(f"\n📄 {os.path.basename(page)}: {len(html_content) / 1024:.1f} KB，{len(items)} 条推文，"
+              f"结果与旧实现{'一致' if consistent else '不一致'}")
+
+        baseline = None
+        for name, func in parsers:
+            ms = bench(func, html_content, args.rounds)
+            baseline = baseline or ms
+            print(f"  {name:<32} {ms:8.3f} ms/页  加速 {baseline / ms:5.1f}x  每轮节省 {baseline - ms:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+关键词规则引擎微基准：数千条规则 × 数千条推文，
+对比逐条规则逐个关键词做子串查找（旧实现的推广）与编译后的 Aho-Corasick 引擎，并校验两者结果一致。
+
+用法：
+    python benchmarks/bench_rules.py
+    python benchmarks/bench_rules.py --rules 5000 --tweets 5000
+"""
+import argparse
+import configparser
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alpha_watcher import rules as rules_module  # noqa: E402
+from alpha_watcher.rules import Node, Rule, RuleEngine, parse_expression  # noqa: E402
+
+WORDS = (
+    "币安 Alpha 积分 用户 空投 Launchpool Launchpad 合约 现货 上线 下架 交易 活动 奖励 期 质押 理财 "
+    "钱包 Web3 BNB USDT 新币 挖矿 门槛 快照 领取 公告 维护 升级 提醒 Binance Airdrop Points listing "
+    "futures spot earn staking wallet token reward campaign"
+).split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    """基础词汇加上随机合成词，模拟大量规则各自关注不同的项目名。"""
+    vocab = list(WORDS)
+    while len(vocab) < size:
+        vocab.append(rng.choice(WORDS) + ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(3)))
+    return vocab
+
+
+def make_expression(vocab: list[str], rng: random.Random) -> str:
+    kind = rng.random()
+    pick = lambda n: rng.sample(vocab, n)  # noqa: E731
+    if kind < 0.5:
+        return ','.join(pick(rng.randint(2, 4)))
+    if kind < 0.8:
+        a, b, c, d = pick(4)
+        return f"{a} AND ({b} OR {c}) AND NOT {d}"
+    if kind < 0.97:
+        a, b, c = pick(3)
+        return f"({a} OR {b}) {c}"
+    return f"{rng.choice(vocab)} /第\\s*\\d+\\s*期/"
+
+
+def make_tweet(vocab: list[str], rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    words += [rng.choice(vocab) for _ in range(rng.randint(0, 4))]
+    words.append(f"第 {rng.randint(1, 99)} 期")
+    rng.shuffle(words)
+    return ' '.join(words) + ' https://t.co/' + ''.join(rng.choice('abcdef0123456789') for _ in range(10))
+
+
+def naive_eval(node: Node, text: str) -> bool:
+    """不经编译，逐个关键词在整条文本上做子串查找。"""
+    kind = node[0]
+    if kind == 'lit':
+        return node[1] in text
+    if kind == 're':
+        return re.search(node[1], text) is not None
+    if kind == 'not':
+        return not naive_eval(node[1], text)
+    if kind == 'and':
+        return all(naive_eval(child, text) for child in node[1])
+    if kind == 'or':
+        return any(naive_eval(child, text) for child in node[1])
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="关键词规则引擎微基准")
+    parser.add_argument('--rules', type=int, default=3000, help="规则数")
+    parser.add_argument('--tweets', type=int, default=3000, help="推文数")
+    parser.add_argument('--vocab', type=int, default=4000, help="词汇量")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocab = make_vocabulary(args.vocab, rng)
+    config = configparser.ConfigParser()
+    for i in range(args.rules):
+        config[f"Rule:r{i}"] = {'match': make_expression(vocab, rng)}
+    tweets = [make_tweet(vocab, rng) for _ in range(args.tweets)]
+
+    parsed = [(Rule(name.split(':', 1)[1], config[name]['match']), parse_expression(config[name]['match'])) for name in config.sections()]
+    started = time.perf_counter()
+    naive = [[rule.name for rule, node in parsed if naive_eval(node, text)] for text in tweets]
+    naive_us = (time.perf_counter() - started) / len(tweets) * 1e6
+
+    engines = []
+    started = time.perf_counter()
+    engines.append(('编译引擎', RuleEngine.from_config(config, []), (time.perf_counter() - started) * 1000))
+    if rules_module.ahocorasick is not None:
+        native = rules_module.ahocorasick
+        rules_module.ahocorasick = None
+        started = time.perf_counter()
+        engines.insert(0, ('编译引擎 纯 Python 自动机', RuleEngine.from_config(config, []), (time.perf_counter() - started) * 1000))
+        rules_module.ahocorasick = native
+        engines[1] = ('编译引擎 pyahocorasick', *engines[1][1:])
+
+    matched = sum(len(m) for m in naive)
+    print(f"📏 {args.rules} 条规则 × {args.tweets} 条推文，共命中 {matched} 次")
+    print(f"  {'逐条规则子串查找 (旧)':<28} {naive_us:10.1f} µs/条")
+    for name, engine, compile_ms in engines:
+        started = time.perf_counter()
+        results = [[rule.name for rule in engine.match('binancezh', text)] for text in tweets]
+        per_tweet_us = (time.perf_counter() - started) / len(tweets) * 1e6
+        consistent = results == naive
+        print(f"  {name:<28} {per_tweet_us:10.1f} µs/条  加速 {naive_us / per_tweet_us:6.1f}x  "
+              f"编译 {compile_ms:7.1f} ms  结果{'一致' if consistent else '不一致'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+[Schedule] 离线模拟器基准：生成一年的合成发帖时间（集中在高峰时段整点附近），
+扫描数百种 [Schedule] 配置并统计耗时；另用虚拟时钟逐次调用 get_sleep_duration 回放两周，
+核对模拟器给出的检查时刻与调度函数完全一致。
+
+用法：
+    python benchmarks/bench_schedule.py
+    python benchmarks/bench_schedule.py --tweets 20000 --days 365
+"""
+import argparse
+import configparser
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from alpha_watcher import scheduler  # noqa: E402
+from alpha_watcher.schedule_sim import SECONDS_PER_DAY, _DayPlan, simulate, sweep_configs  # noqa: E402
+from alpha_watcher.utils import BJT  # noqa: E402
+
+START = BJT.localize(datetime(2025, 1, 1))
+
+GRID = {
+    'critical_interval': ['10', '15', '20', '30', '45', '60'],
+    'high_interval': ['30', '45', '60', '90', '120'],
+    'normal_interval': ['120', '180', '300', '600', '900'],
+    'critical_minutes': ['1', '2'],
+}
+
+
+def make_tweets(count: int, days: int, rng: random.Random) -> np.ndarray:
+    """六成在 15:00~23:00 的整点前后 3 分钟内，三成散布在高峰时段，其余全天均匀分布。"""
+    created = []
+    base = START.timestamp()
+    for _ in range(count):
+        day = rng.randrange(days) * SECONDS_PER_DAY
+        kind = rng.random()
+        if kind < 0.6:
+            offset = rng.randint(16, 23) * 3600 + rng.gauss(20, 60)
+        elif kind < 0.9:
+            offset = rng.uniform(15 * 3600, 23 * 3600)
+        else:
+            offset = rng.uniform(0, SECONDS_PER_DAY)
+        created.append(base + day + offset)
+    return np.asarray(created)
+
+
+def replay_reference(config: configparser.ConfigParser, days: int) -> list[int]:
+    """用虚拟时钟逐次调用 get_sleep_duration，返回从 START 起算的检查时刻（秒）。"""
+    clock = [START]
+
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0].astimezone(tz) if tz else clock[0].replace(tzinfo=None)
+
+    real = scheduler.datetime
+    scheduler.datetime = VirtualDatetime
+    polls = []
+    try:
+        while (clock[0] - START).total_seconds() < days * SECONDS_PER_DAY:
+            polls.append(int((clock[0] - START).total_seconds()))
+            clock[0] += timedelta(seconds=scheduler.get_sleep_duration(config))
+    finally:
+        scheduler.datetime = real
+    return polls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="[Schedule] 离线模拟器基准")
+    parser.add_argument('--tweets', type=int, default=20000, help="合成推文数")
+    parser.add_argument('--days', type=int, default=365, help="合成数据覆盖的天数")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    created = make_tweets(args.tweets, args.days, random.Random(7))
+
+    config = configparser.ConfigParser()
+    config['Schedule'] = {}
+    reference = replay_reference(config, 14)
+    schedule = scheduler._load_schedule(config)
+    plan = _DayPlan(schedule, align=False)
+    simulated, t = [], 0
+    while t < 14 * SECONDS_PER_DAY:
+        simulated.append(t)
+        t = plan.next_poll(t)
+    print(f"📏 与 get_sleep_duration 逐次回放核对 14 天：{len(reference)} 次检查，"
+          f"结果{'一致' if simulated == reference else '不一致'}")
+
+    configs = list(sweep_configs(config, GRID))
+    started = time.perf_counter()
+    results = [(overrides, simulate(s, created)) for overrides, s in configs]
+    elapsed = time.perf_counter() - started
+    print(f"📏 {args.tweets} 条推文 × {args.days} 天，扫描 {len(configs)} 种配置："
+          f"{elapsed:.2f} 秒（{elapsed / len(configs) * 1000:.1f} ms/配置）")
+
+    default = simulate(schedule, created)
+    print(f"  默认配置：每日 {default.polls_per_day:.0f} 次检查，平均延迟 {default.mean_lag:.1f}s"
+          f"（非安静时段 {default.active_mean_lag:.1f}s），p95 {default.p95_lag:.0f}s，安静时段 {default.quiet_tweets} 条")
+    budget = default.polls_per_day
+    within = [(o, r) for o, r in results if r.polls_per_day <= budget]
+    if within:
+        overrides, best = min(within, key=lambda row: row[1].active_mean_lag)
+        desc = ' '.join(f"{k}={v}" for k, v in overrides.items())
+        print(f"  同等检查次数下最优：{desc}，每日 {best.polls_per_day:.0f} 次检查，"
+              f"非安静时段平均延迟 {best.active_mean_lag:.1f}s，p95 {best.p95_lag:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
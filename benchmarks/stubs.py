@@ -0,0 +1,581 @@
+"""
+本地模拟服务，不访问外网即可端到端运行监控引擎：
+- Nitter 实例：以录制的时间线页面（benchmarks/pages/）为模板渲染多用户时间线与 RSS，
+  可配置响应延迟、错误率、验证页比例与缓存滞后，RSS 支持 ETag 条件请求
+- Twitter v2 GET /2/users/:id/tweets（配合 [TWITTER] api_base）
+- 企业微信 webhook 接收端（可模拟 45009 限速）与 SMTP 接收端（配合 [Email] smtp_security = plain）
+
+新推文的 ID 按发布时刻生成 Snowflake，正文末尾附 [推文ID]，
+接收端据此算出每条通知从发布到收到的延迟（benchmarks/bench_e2e.py）。
+
+用法（手动调试：启动一组服务并打印可直接使用的配置片段）：
+    python benchmarks/stubs.py
+    python benchmarks/stubs.py --instances 3 --latency 0.3 --error-rate 0.1 --challenge-rate 0.05 --rate 0.2
+"""
+import argparse
+import asyncio
+import base64
+import email
+import email.policy
+import glob
+import hashlib
+import html
+import json
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Callable, NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alpha_watcher.extract import extract_timeline_items  # noqa: E402
+from alpha_watcher.utils import TWITTER_EPOCH_MS, snowflake_timestamp  # noqa: E402
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+HOST = '127.0.0.1'
+# 通知正文中的推文 ID 标记
+_MARKER_RE = re.compile(r'\[(\d{15,20})\]')
+_CHALLENGE_PAGE = (
+    '<!DOCTYPE html><html><head><title>Just a moment...</title></head>'
+    '<body><div id="challenge-platform">Checking your browser before accessing.</div></body></html>'
+)
+
+
+def snowflake_id(timestamp: float, sequence: int = 0) -> int:
+    """按发布时刻生成 Snowflake 推文 ID（低 22 位只放序号）。"""
+    return ((int(timestamp * 1000) - TWITTER_EPOCH_MS) << 22) | (sequence & 0x3FFFFF)
+
+
+def delivery_lags(text: str, received: float) -> list[float]:
+    """通知正文中每条推文从发布到 received 的秒数（合并摘要含多条）。"""
+    lags = []
+    for marker in _MARKER_RE.findall(text):
+        created = snowflake_timestamp(int(marker))
+        if created is not None:
+            lags.append(received - created)
+    return lags
+
+
+@dataclass
+class Behavior:
+    """
+    模拟服务的表现：每个请求延迟 latency ± jitter 秒；
+    以 error_rate 概率返回 502，以 challenge_rate 概率返回验证页（Nitter）；
+    cache_lag 秒内发布的推文不可见（镜像缓存滞后）。
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    challenge_rate: float = 0.0
+    cache_lag: float = 0.0
+
+
+class StubTweet(NamedTuple):
+    tweet_id: int
+    account: str
+    text: str
+
+    @property
+    def created(self) -> float:
+        return snowflake_timestamp(self.tweet_id) or 0.0
+
+
+class Feed:
+    """各账号的时间线，所有模拟来源共享同一份数据。"""
+
+    def __init__(self, accounts: list[str], seed_texts: list[str] | None = None, history: int = 20) -> None:
+        self.accounts = [a.lower() for a in accounts]
+        # user_id -> 用户名，供 Twitter API 模拟使用
+        self.user_ids = {str(1000 + i): account for i, account in enumerate(self.accounts)}
+        self._tweets: dict[str, list[StubTweet]] = {a: [] for a in self.accounts}
+        self._sequence = 0
+        texts = seed_texts or ['历史推文']
+        # 历史推文发布在 1~history 小时前，页面体积与真实时间线相当
+        now = time.time()
+        for account in self.accounts:
+            for age in range(history, 0, -1):
+                self._append(account, texts[(age + len(account)) % len(texts)], now - age * 3600)
+
+    def post(self, account: str, text: str) -> StubTweet:
+        """发布一条新推文，正文末尾附 [推文ID] 标记。"""
+        return self._append(account.lower(), text, time.time(), marker=True)
+
+    def timeline(self, accounts: list[str], cache_lag: float = 0.0, limit: int = 20) -> list[StubTweet]:
+        """多用户时间线，新的在前；cache_lag 秒内发布的推文尚不可见。"""
+        visible_before = time.time() - cache_lag
+        merged = [
+            tweet
+            for account in accounts
+            for tweet in self._tweets.get(account.lower(), ())
+            if tweet.created <= visible_before
+        ]
+        merged.sort(key=lambda t: t.tweet_id, reverse=True)
+        return merged[:limit]
+
+    def since(self, account: str, since_id: int, limit: int) -> list[StubTweet]:
+        tweets = [t for t in self._tweets.get(account, ()) if t.tweet_id > since_id]
+        return sorted(tweets, key=lambda t: t.tweet_id, reverse=True)[:limit]
+
+    def _append(self, account: str, text: str, created: float, marker: bool = False) -> StubTweet:
+        self._sequence += 1
+        tweet_id = snowflake_id(created, self._sequence)
+        tweet = StubTweet(tweet_id, account, f"{text} [{tweet_id}]" if marker else text)
+        self._tweets.setdefault(account, []).append(tweet)
+        return tweet
+
+
+class PageTemplate:
+    """
+    录制的 Nitter 页面拆成页头、置顶推文、单条推文模板与页尾；
+    渲染时把模板中的用户名、ID、正文与时间替换为模拟推文，页面结构与体积与真实页面一致。
+    """
+
+    def __init__(self, prefix: str, pinned: str, item: str, suffix: str, username: str, tweet_id: str) -> None:
+        self.prefix, self.pinned, self.suffix = prefix, pinned, suffix
+        item = re.sub(r'(<div class="tweet-content[^"]*"[^>]*>).*?(</div>)',
+                      lambda m: f"{m.group(1)}\x00text\x00{m.group(2)}", item, count=1)
+        item = re.sub(r'(<span class="tweet-date"><a [^>]*title=")[^"]*(")',
+                      lambda m: f"{m.group(1)}\x00date\x00{m.group(2)}", item, count=1)
+        item = item.replace(tweet_id, '\x00id\x00')
+        self._parts = re.split(rf'(\x00\w+\x00|\b{re.escape(username)}\b)', item)
+        self._username = username
+
+    @classmethod
+    def from_file(cls, path: str) -> 'PageTemplate':
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        starts = [i for i, line in enumerate(lines) if line.startswith('<div class="timeline-item')]
+        if not starts:
+            raise ValueError(f"{path} 中没有时间线条目")
+        items = [lines[i] for i in starts]
+        pinned = next((line for line in items if 'class="pinned"' in line), '')
+        item = next(line for line in items if 'class="pinned"' not in line)
+        match = re.search(r'href="/([^/"]+)/status/(\d+)', item)
+        if match is None:
+            raise ValueError(f"{path} 的时间线条目中没有推文链接")
+        return cls(
+            '\n'.join(lines[:starts[0]]), pinned, item, '\n'.join(lines[starts[-1] + 1:]),
+            match.group(1), match.group(2),
+        )
+
+    def render(self, tweets: list[StubTweet]) -> str:
+        rendered = [self.prefix]
+        if self.pinned:
+            rendered.append(self.pinned)
+        for tweet in tweets:
+            created = datetime.fromtimestamp(tweet.created, timezone.utc)
+            values = {
+                '\x00text\x00': html.escape(tweet.text),
+                # 与 Nitter 一致，如 "Oct 5, 2026 · 7:41 PM UTC"
+                '\x00date\x00': f"{created:%b} {created.day}, {created.year} · {created.hour % 12 or 12}:{created:%M %p} UTC",
+                '\x00id\x00': str(tweet.tweet_id),
+                self._username: tweet.account,
+            }
+            rendered.append(''.join(values.get(part, part) for part in self._parts))
+        rendered.append(self.suffix)
+        return '\n'.join(rendered)
+
+
+def seed_texts(path: str) -> list[str]:
+    """录制页面中的推文正文，用作历史推文。"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [item.text for item in extract_timeline_items(f.read()) if item.text and not item.pinned]
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes = b''
+    content_type: str = 'text/plain; charset=utf-8'
+    headers: dict[str, str] = {}
+
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+            502: 'Bad Gateway', 503: 'Service Unavailable'}
+
+
+class HttpStub:
+    """极简 HTTP/1.1 服务（asyncio，支持 keep-alive），按 Behavior 注入延迟与错误，并按状态码计数。"""
+
+    def __init__(self, name: str, behavior: Behavior | None = None) -> None:
+        self.name = name
+        self.behavior = behavior or Behavior()
+        self.port = 0
+        self.responses: dict[int, int] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._rng = random.Random(name)
+
+    @property
+    def url(self) -> str:
+        return f"http://{HOST}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, HOST, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def handle(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        raise NotImplementedError
+
+    async def _respond(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        behavior = self.behavior
+        delay = behavior.latency + self._rng.uniform(-behavior.jitter, behavior.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._rng.random() < behavior.error_rate:
+            return Response(502, b'bad gateway\n')
+        return await self.handle(method, target, headers, body)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                response = await self._respond(method, target, headers, body)
+                self.responses[response.status] = self.responses.get(response.status, 0) + 1
+                head = [f"HTTP/1.1 {response.status} {_REASONS.get(response.status, 'Unknown')}",
+                        f"Content-Type: {response.content_type}", f"Content-Length: {len(response.body)}"]
+                head += [f"{k}: {v}" for k, v in response.headers.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + response.body)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class NitterStub(HttpStub):
+    """GET /<user1>,<user2>（时间线页面）与 /<user1>,<user2>/rss。"""
+
+    def __init__(self, name: str, feed: Feed, template: PageTemplate, behavior: Behavior | None = None,
+                 rss: bool = True) -> None:
+        super().__init__(name, behavior)
+        self.feed = feed
+        self.template = template
+        self.rss = rss
+
+    async def handle(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        if method != 'GET':
+            return Response(405)
+        if self._rng.random() < self.behavior.challenge_rate:
+            return Response(503, _CHALLENGE_PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+        path = unquote(urlsplit(target).path).strip('/')
+        is_rss = path.endswith('/rss')
+        if is_rss:
+            path = path[:-len('/rss')]
+        accounts = [a for a in path.split(',') if a]
+        if not accounts or (is_rss and not self.rss):
+            return Response(404, b'not found\n')
+        tweets = self.feed.timeline(accounts, self.behavior.cache_lag)
+        if not is_rss:
+            return Response(200, self.template.render(tweets).encode('utf-8'), 'text/html; charset=utf-8')
+
+        etag = '"' + hashlib.sha1(','.join(str(t.tweet_id) for t in tweets).encode()).hexdigest()[:16] + '"'
+        if headers.get('if-none-match') == etag:
+            return Response(304, headers={'ETag': etag})
+        return Response(200, self._render_rss(accounts, tweets).encode('utf-8'),
+                        'application/rss+xml; charset=utf-8', {'ETag': etag})
+
+    def _render_rss(self, accounts: list[str], tweets: list[StubTweet]) -> str:
+        items = ''.join(
+            f"<item><title>{html.escape(t.text)}</title><dc:creator>@{t.account}</dc:creator>"
+            f"<description>&lt;p&gt;{html.escape(html.escape(t.text))}&lt;/p&gt;</description>"
+            f"<pubDate>{format_datetime(datetime.fromtimestamp(t.created, timezone.utc), usegmt=True)}</pubDate>"
+            f"<guid>{self.url}/{t.account}/status/{t.tweet_id}#m</guid>"
+            f"<link>{self.url}/{t.account}/status/{t.tweet_id}#m</link></item>"
+            for t in tweets
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f"<title>{','.join(accounts)} / Nitter</title><link>{self.url}/{','.join(accounts)}</link>"
+            f"{items}</channel></rss>"
+        )
+
+
+class TwitterApiStub(HttpStub):
+    """GET /2/users/:id/tweets，按 since_id 与 max_results 返回，需带 Bearer 令牌。"""
+
+    def __init__(self, feed: Feed, behavior: Behavior | None = None) -> None:
+        super().__init__('Twitter API', behavior)
+        self.feed = feed
+
+    async def handle(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        parts = urlsplit(target)
+        match = re.fullmatch(r'/2/users/(\d+)/tweets', parts.path)
+        if method != 'GET' or match is None or match.group(1) not in self.feed.user_ids:
+            return _json(404, {'title': 'Not Found Error'})
+        if not headers.get('authorization', '').startswith('Bearer '):
+            return _json(401, {'title': 'Unauthorized'})
+        query = parse_qs(parts.query)
+        since_id = int(query.get('since_id', ['0'])[0])
+        limit = int(query.get('max_results', ['10'])[0])
+        tweets = self.feed.since(self.feed.user_ids[match.group(1)], since_id, limit)
+        if self.behavior.cache_lag:
+            tweets = [t for t in tweets if t.created <= time.time() - self.behavior.cache_lag]
+        if not tweets:
+            return _json(200, {'meta': {'result_count': 0}})
+        data = [{'id': str(t.tweet_id), 'text': t.text, 'edit_history_tweet_ids': [str(t.tweet_id)]} for t in tweets]
+        meta = {'result_count': len(data), 'newest_id': data[0]['id'], 'oldest_id': data[-1]['id']}
+        return _json(200, {'data': data, 'meta': meta})
+
+
+class Delivery(NamedTuple):
+    channel: str
+    received: float
+    text: str
+
+
+class WeComSink(HttpStub):
+    """POST /cgi-bin/webhook/send?key=...；rate_limit > 0 时每个 key 每 60 秒超过该条数返回 45009。"""
+
+    def __init__(self, behavior: Behavior | None = None, rate_limit: int = 0) -> None:
+        super().__init__('wecom', behavior)
+        self.rate_limit = rate_limit
+        self.deliveries: list[Delivery] = []
+        self._sent: dict[str, list[float]] = {}
+
+    def webhook_url(self, key: str = 'bench') -> str:
+        return f"{self.url}/cgi-bin/webhook/send?key={key}"
+
+    async def handle(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        parts = urlsplit(target)
+        if method != 'POST' or parts.path != '/cgi-bin/webhook/send':
+            return Response(404, b'not found\n')
+        key = parse_qs(parts.query).get('key', [''])[0]
+        now = time.time()
+        sent = [t for t in self._sent.get(key, []) if t > now - 60]
+        if self.rate_limit and len(sent) >= self.rate_limit:
+            self._sent[key] = sent
+            return _json(200, {'errcode': 45009, 'errmsg': 'api freq out of limit'})
+        self._sent[key] = sent + [now]
+        try:
+            content = json.loads(body)['text']['content']
+        except (ValueError, KeyError, TypeError):
+            return _json(200, {'errcode': 40008, 'errmsg': 'invalid message type'})
+        self.deliveries.append(Delivery('wecom', now, content))
+        return _json(200, {'errcode': 0, 'errmsg': 'ok'})
+
+
+class SmtpSink:
+    """
+    SMTP 接收端（明文，支持 EHLO/AUTH PLAIN/AUTH LOGIN/MAIL/RCPT/DATA/NOOP/RSET/QUIT），接受任意凭据；
+    latency 为每封邮件 DATA 结束后的处理延迟。
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.port = 0
+        self.deliveries: list[Delivery] = []
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, HOST, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode('ascii'))
+
+        try:
+            reply('220 stub ESMTP')
+            while True:
+                await writer.drain()
+                line = (await reader.readline()).decode('utf-8', errors='replace').rstrip('\r\n')
+                if not line:
+                    break
+                verb = line.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    reply('250-stub')
+                    reply('250-AUTH PLAIN LOGIN')
+                    reply('250 8BITMIME')
+                elif verb == 'AUTH':
+                    if line.upper().startswith('AUTH LOGIN'):
+                        for prompt in ('VXNlcm5hbWU6', 'UGFzc3dvcmQ6'):
+                            reply(f"334 {prompt}")
+                            await writer.drain()
+                            base64.b64decode(await reader.readline())
+                    reply('235 2.7.0 Authentication successful')
+                elif verb == 'DATA':
+                    reply('354 End data with <CR><LF>.<CR><LF>')
+                    await writer.drain()
+                    data = await reader.readuntil(b'\r\n.\r\n')
+                    if self.latency > 0:
+                        await asyncio.sleep(self.latency)
+                    message = email.message_from_bytes(data[:-5].replace(b'\r\n..', b'\r\n.'), policy=email.policy.default)
+                    body = message.get_body(preferencelist=('plain',))
+                    text = f"{message['Subject']}\n{body.get_content() if body else ''}"
+                    self.deliveries.append(Delivery('email', time.time(), text))
+                    reply('250 2.0.0 Ok: queued')
+                elif verb == 'QUIT':
+                    reply('221 2.0.0 Bye')
+                    await writer.drain()
+                    break
+                elif verb in ('HELO', 'MAIL', 'RCPT', 'NOOP', 'RSET'):
+                    reply('250 2.0.0 Ok')
+                else:
+                    reply('502 5.5.2 Command not recognized')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+
+def _json(status: int, payload: dict[str, Any]) -> Response:
+    return Response(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+
+@dataclass
+class StubCluster:
+    """一组模拟服务：若干 Nitter 实例、可选的 Twitter API，以及企业微信与 SMTP 接收端。"""
+    accounts: list[str]
+    instances: list[Behavior] = field(default_factory=lambda: [Behavior()])
+    api: Behavior | None = None
+    wecom: Behavior | None = field(default_factory=Behavior)
+    wecom_rate_limit: int = 0
+    smtp_latency: float | None = 0.0
+    rss: bool = True
+    page: str = ''
+
+    def __post_init__(self) -> None:
+        page = self.page or sorted(glob.glob(os.path.join(PAGES_DIR, '*.html')))[0]
+        self.feed = Feed(self.accounts, seed_texts(page))
+        template = PageTemplate.from_file(page)
+        self.nitter = [NitterStub(f"nitter{i}", self.feed, template, b, self.rss) for i, b in enumerate(self.instances)]
+        self.twitter = TwitterApiStub(self.feed, self.api) if self.api is not None else None
+        self.wecom_sink = WeComSink(self.wecom, self.wecom_rate_limit) if self.wecom is not None else None
+        self.smtp_sink = SmtpSink(self.smtp_latency) if self.smtp_latency is not None else None
+
+    @property
+    def servers(self) -> list[Any]:
+        return [s for s in (*self.nitter, self.twitter, self.wecom_sink, self.smtp_sink) if s is not None]
+
+    @property
+    def deliveries(self) -> list[Delivery]:
+        return [d for sink in (self.wecom_sink, self.smtp_sink) if sink is not None for d in sink.deliveries]
+
+    async def start(self) -> None:
+        for server in self.servers:
+            await server.start()
+
+    async def close(self) -> None:
+        for server in self.servers:
+            await server.close()
+
+    def config_sections(self) -> dict[str, dict[str, str]]:
+        """指向模拟服务的配置段，可直接写入 ConfigParser 或 config.ini。"""
+        sections: dict[str, dict[str, str]] = {
+            'Scraper': {'nitter_instances': '\n'.join(s.url for s in self.nitter)},
+            'TWITTER': {'target_username': ','.join(self.accounts)},
+        }
+        if self.twitter is not None:
+            sections['TWITTER'].update(
+                bearer_token='stub-token', api_base=self.twitter.url, user_id=','.join(self.feed.user_ids),
+            )
+        if self.wecom_sink is not None:
+            sections['WeCom'] = {'webhook_urls': self.wecom_sink.webhook_url()}
+        if self.smtp_sink is not None:
+            sections['Email'] = {
+                'smtp_server': HOST, 'smtp_port': str(self.smtp_sink.port), 'smtp_security': 'plain',
+                'sender_email': 'watcher@stub.local', 'sender_password': 'stub', 'receiver_email': 'alerts@stub.local',
+            }
+        return sections
+
+
+async def publish(feed: Feed, rate: float, match_ratio: float, keyword: str, rng: random.Random,
+                  on_post: Callable[[StubTweet, bool], None] | None = None) -> None:
+    """按泊松过程以平均每秒 rate 条的速度随机发布推文，match_ratio 的推文含关键词。"""
+    filler = ['市场周报', '活动回顾', '产品更新说明', '社区问答']
+    while True:
+        await asyncio.sleep(rng.expovariate(rate))
+        matched = rng.random() < match_ratio
+        text = f"{keyword} {rng.choice(filler)}" if matched else rng.choice(filler)
+        tweet = feed.post(rng.choice(feed.accounts), text)
+        if on_post is not None:
+            on_post(tweet, matched)
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    behavior = Behavior(args.latency, args.jitter, args.error_rate, args.challenge_rate, args.cache_lag)
+    cluster = StubCluster(
+        accounts=args.accounts.split(','), instances=[behavior] * args.instances,
+        api=Behavior(args.latency, args.jitter) if args.api else None, wecom_rate_limit=args.wecom_rate_limit,
+    )
+    await cluster.start()
+    print("# 模拟服务已启动，把以下配置合并到 config.ini（Ctrl+C 退出）：")
+    for section, values in cluster.config_sections().items():
+        print(f"[{section}]")
+        for key, value in values.items():
+            print(f"{key} = {value.replace(chr(10), chr(10) + '    ')}")
+        print()
+
+    def on_post(tweet: StubTweet, matched: bool) -> None:
+        print(f"发布 @{tweet.account} {tweet.tweet_id}{' (命中)' if matched else ''}")
+
+    tasks = []
+    if args.rate > 0:
+        tasks.append(asyncio.create_task(publish(cluster.feed, args.rate, 0.5, '空投', random.Random(), on_post)))
+    try:
+        seen = 0
+        while True:
+            await asyncio.sleep(1)
+            deliveries = cluster.deliveries
+            for delivery in deliveries[seen:]:
+                lags = ', '.join(f"{lag:.2f}s" for lag in delivery_lags(delivery.text, delivery.received))
+                print(f"收到 {delivery.channel} 通知，延迟 {lags or '未知'}")
+            seen = len(deliveries)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await cluster.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟 Nitter / Twitter API / 企业微信 / SMTP 服务")
+    parser.add_argument('--accounts', default='binancezh,binance', help="模拟的账号，逗号分隔")
+    parser.add_argument('--instances', type=int, default=2, help="Nitter 实例数")
+    parser.add_argument('--latency', type=float, default=0.1, help="每个请求的平均延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.05, help="延迟的随机波动（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 502 的比例")
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help="返回验证页的比例")
+    parser.add_argument('--cache-lag', type=float, default=0.0, help="镜像缓存滞后（秒）")
+    parser.add_argument('--api', action='store_true', help="同时模拟 Twitter API")
+    parser.add_argument('--wecom-rate-limit', type=int, default=0, help="企业微信每 key 每分钟上限，0 为不限")
+    parser.add_argument('--rate', type=float, default=0.0, help="自动发布新推文的速度（条/秒），0 为不发布")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -101,7 +101,7 @@ class ConfigGUI(tk.Tk):
     def _build_account_tab(self, parent):
         twitter = self.config_parser['TWITTER']
 
-        ttk.Label(parent, text="目标用户名（不含@）：").grid(row=0, column=0, sticky=tk.W, padx=5, pady=8)
+        ttk.Label(parent, text="目标用户名（不含@，多个用逗号分隔）：").grid(row=0, column=0, sticky=tk.W, padx=5, pady=8)
         self.var_username = tk.StringVar(value=twitter.get('target_username', 'binancezh'))
         ttk.Entry(parent, textvariable=self.var_username, width=40).grid(row=0, column=1, padx=5, pady=8)
 
@@ -110,7 +110,7 @@ class ConfigGUI(tk.Tk):
         ttk.Entry(parent, textvariable=self.var_userid, width=40).grid(row=1, column=1, padx=5, pady=8)
 
         # 左侧文本编辑 Nitter
-        ttk.Label(parent, text="Nitter 实例（每行一个，末尾加 /<username>）：").grid(row=2, column=0, sticky=tk.W, padx=5, pady=8)
+        ttk.Label(parent, text="Nitter 实例（每行一个，只需域名）：").grid(row=2, column=0, sticky=tk.W, padx=5, pady=8)
         nitter_text = self.config_parser['Scraper'].get('nitter_instances', '').strip()
         self.txt_nitter = tk.Text(parent, width=45, height=12)
         self.txt_nitter.grid(row=2, column=1, padx=5, pady=8, sticky=tk.NW)
@@ -299,8 +299,9 @@ class ConfigGUI(tk.Tk):
         if not (nitter_ok or twitter_ok):
             problems.append("未配置 Nitter 实例，且 Twitter API 未就绪（bearer_token + user_id）")
 
-        # 关键词
-        if not self.config_parser['Scraper'].get('keywords', '').strip():
+        # 关键词（或 [Rule:*] 匹配规则）
+        has_rules = any(name.lower().startswith('rule:') for name in self.config_parser.sections())
+        if not self.config_parser['Scraper'].get('keywords', '').strip() and not has_rules:
             problems.append("关键词未设置")
 
         return problems
@@ -2,6 +2,7 @@ import configparser
 import os
 import sys
 import random
+from urllib.parse import urlsplit
 import tweepy
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 
@@ -100,6 +101,9 @@ def main():
         print("🟡 跳过: 配置文件中缺少 Nitter 实例。")
     else:
         nitter_instances = [url.strip() for url in config['Scraper']['nitter_instances'].split('\n') if url.strip()]
+        # 新格式只填域名，测试时拼上第一个目标账号
+        target = config['TWITTER'].get('target_username', 'binancezh').split(',')[0].strip() if 'TWITTER' in config else 'binancezh'
+        nitter_instances = [url if urlsplit(url).path.strip('/') else f"{url.rstrip('/')}/{target or 'binancezh'}" for url in nitter_instances]
         if not nitter_instances:
             print("🟡 跳过: Nitter 实例列表为空。")
         else:
@@ -0,0 +1,222 @@
+import json
+
+import pytest
+
+from alpha_watcher import dedup_store
+from alpha_watcher.dedup_store import (
+    KIND_FINGERPRINT,
+    KIND_ID,
+    KIND_SIMHASH,
+    DedupState,
+    JournalStore,
+    JsonStore,
+    SqliteStore,
+    open_store,
+)
+
+
+def journal_lines(store):
+    with open(store.journal_file, 'rb') as f:
+        return f.read().splitlines(keepends=True)
+
+
+# ---------- journal ----------
+
+def test_journal_replays_on_top_of_snapshot(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    store = JournalStore(state_file)
+    store.compact(DedupState(ids=[(1, 100.0)], high_water_mark=1))
+    store.append(KIND_ID, 2, 200.0)
+    store.append(KIND_SIMHASH, 1 << 63, 200.0)
+    store.set_meta('last_push_ts', 200.0)
+    store.set_meta('high_water_mark', 2)
+    store.close()
+
+    state = JournalStore(state_file).load()
+    assert state.ids == [(1, 100.0), (2, 200.0)]
+    assert state.simhashes == [(1 << 63, 200.0)]
+    assert state.last_push_ts == 200.0
+    assert state.high_water_mark == 2
+
+
+@pytest.mark.parametrize('tail', [
+    b'["id",3,30',           # 只写了一半
+    b'["id",3,300.0]',       # 内容完整但缺少换行符
+    b'\xff\xfe',             # 写入了无法解码的字节
+])
+def test_journal_truncates_torn_tail(tmp_path, tail):
+    state_file = str(tmp_path / 'state.json')
+    store = JournalStore(state_file)
+    store.append(KIND_ID, 1, 100.0)
+    store.append(KIND_ID, 2, 200.0)
+    store.close()
+    with open(store.journal_file, 'ab') as f:
+        f.write(tail)
+
+    recovered = JournalStore(state_file)
+    assert recovered.load().ids == [(1, 100.0), (2, 200.0)]
+    assert recovered._pending == 2
+    assert b''.join(journal_lines(recovered)) == b'["id",1,100.0]\n["id",2,200.0]\n'
+
+    # 截断后的追加从新行开始，再次加载不会丢失任何一条
+    recovered.append(KIND_ID, 4, 400.0)
+    recovered.close()
+    assert JournalStore(state_file).load().ids == [(1, 100.0), (2, 200.0), (4, 400.0)]
+
+
+def test_journal_stops_at_first_bad_line(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    store = JournalStore(state_file)
+    with open(store.journal_file, 'wb') as f:
+        f.write(b'["id",1,100.0]\n["id",2\n["id",3,300.0]\n')
+
+    assert store.load().ids == [(1, 100.0)]
+    assert journal_lines(store) == [b'["id",1,100.0]\n']
+
+
+def test_journal_compacts_after_compact_every(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    store = JournalStore(state_file, compact_every=3)
+    state = store.load()
+    for key in (1, 2, 3):
+        assert not store.should_compact()
+        store.append(KIND_ID, key, float(key))
+        state.ids.append((key, float(key)))
+    assert store.should_compact()
+
+    store.compact(state)
+    assert not store.should_compact()
+    assert journal_lines(store) == []
+    assert JsonStore(state_file).load().ids == [(1, 1.0), (2, 2.0), (3, 3.0)]
+
+    store.append(KIND_ID, 4, 4.0)
+    store.close()
+    assert JournalStore(state_file).load().ids == [(1, 1.0), (2, 2.0), (3, 3.0), (4, 4.0)]
+
+
+def test_journal_fsync(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(dedup_store.os, 'fsync', synced.append)
+
+    JournalStore(str(tmp_path / 'a.json')).append(KIND_ID, 1, 1.0)
+    assert synced == []
+    store = JournalStore(str(tmp_path / 'b.json'), fsync=True)
+    store.append(KIND_ID, 1, 1.0)
+    store.set_meta('last_push_ts', 1.0)
+    assert len(synced) == 2
+    store.close()
+
+
+def test_json_snapshot_reads_legacy_format(tmp_path):
+    # 旧版以 {字符串 ID: 时间戳} 与 40 位十六进制 SHA1 保存
+    state_file = tmp_path / 'state.json'
+    sha1 = 'ab' * 20
+    state_file.write_text(json.dumps({
+        'ids': {'123': 100.0},
+        'fingerprints': {sha1: 100.0},
+        'last_push_ts': 100.0,
+    }), encoding='utf-8')
+
+    state = JournalStore(str(state_file)).load()
+    assert state.ids == [(123, 100.0)]
+    assert state.fingerprints == [(int(sha1[:16], 16), 100.0)]
+    assert state.last_push_ts == 100.0
+    assert state.high_water_mark == 0
+
+
+# ---------- sqlite ----------
+
+def legacy_state(tmp_path, name='binance.json'):
+    state_file = str(tmp_path / name)
+    store = JournalStore(state_file)
+    store.compact(DedupState(ids=[(1, 100.0)], fingerprints=[((1 << 64) - 1, 100.0)], last_push_ts=100.0))
+    store.append(KIND_ID, 2, 200.0)
+    store.set_meta('high_water_mark', 2)
+    store.close()
+    return state_file
+
+
+def test_sqlite_imports_legacy_state_once(tmp_path):
+    db = str(tmp_path / 'dedup.db')
+    state_file = legacy_state(tmp_path)
+
+    store = SqliteStore(db, 'binance', 100, 3600, legacy_state_file=state_file)
+    state = store.load()
+    # 快照与日志中的条目都被导入，无符号指纹经过有符号 64 位折算后保持原值
+    assert state.ids == [(1, 100.0), (2, 200.0)]
+    assert state.fingerprints == [((1 << 64) - 1, 100.0)]
+    assert state.last_push_ts == 100.0
+    assert state.high_water_mark == 2
+    store.append(KIND_ID, 3, 300.0)
+    store.close()
+
+    # 数据库已有该账号的数据，旧文件再变化也不会重复导入
+    JournalStore(state_file).compact(DedupState(ids=[(9, 900.0)]))
+    store = SqliteStore(db, 'binance', 100, 3600, legacy_state_file=state_file)
+    assert [key for key, _ in store.load().ids] == [1, 2, 3]
+    store.close()
+
+
+def test_sqlite_without_legacy_file(tmp_path):
+    store = SqliteStore(str(tmp_path / 'dedup.db'), 'binance', 100, 3600,
+                        legacy_state_file=str(tmp_path / 'missing.json'))
+    assert store.load() == DedupState()
+    store.close()
+
+
+def test_sqlite_namespaces_are_shared_but_separate(tmp_path):
+    db = str(tmp_path / 'dedup.db')
+    a = SqliteStore(db, 'a', 100, 3600)
+    b = SqliteStore(db, 'b', 100, 3600)
+    other_a = SqliteStore(db, 'a', 100, 3600)
+    a.append(KIND_FINGERPRINT, 7, 100.0)
+
+    # 另一个进程的同一账号能查到，其他账号查不到
+    assert other_a.contains(KIND_FINGERPRINT, 7, since=50.0)
+    assert not other_a.contains(KIND_FINGERPRINT, 7, since=150.0)
+    assert not b.contains(KIND_FINGERPRINT, 7, since=0.0)
+    assert b.load().fingerprints == []
+
+    a.set_meta('high_water_mark', 10)
+    other_a.set_meta('high_water_mark', 5)
+    assert other_a.load().high_water_mark == 10
+    for store in (a, b, other_a):
+        store.close()
+
+
+def test_sqlite_compact_drops_expired_and_overflow(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_store.time, 'time', lambda: 1000.0)
+    store = SqliteStore(str(tmp_path / 'dedup.db'), 'a', max_history=2, ttl_seconds=500, compact_every=4)
+    for key, ts in ((1, 100.0), (2, 600.0), (3, 700.0), (4, 800.0)):
+        store.append(KIND_ID, key, ts)
+    assert store.should_compact()
+
+    store.compact(store.load())
+    assert store.load().ids == [(3, 700.0), (4, 800.0)]
+    assert not store.should_compact()
+    store.close()
+
+
+# ---------- open_store ----------
+
+@pytest.mark.parametrize('backend, expected', [
+    ('json', JsonStore),
+    ('journal', JournalStore),
+    ('sqlite', SqliteStore),
+    ('unknown', JournalStore),
+])
+def test_open_store_backends(tmp_path, backend, expected):
+    cfg = {'store': backend, 'sqlite_path': str(tmp_path / 'dedup.db')}
+    store = open_store(cfg, str(tmp_path / 'dedup_state_binance.json'), 100, 3600)
+    assert type(store) is expected
+    if expected is SqliteStore:
+        assert store.namespace == 'dedup_state_binance'
+        assert store.legacy_state_file == str(tmp_path / 'dedup_state_binance.json')
+    store.close()
+
+
+def test_open_store_journal_options(tmp_path):
+    cfg = {'compact_every': 'bad', 'journal_fsync': 'yes'}
+    store = open_store(cfg, str(tmp_path / 'state.json'), 100, 3600)
+    assert store.compact_every == 1000
+    assert store.fsync
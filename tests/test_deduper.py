@@ -0,0 +1,191 @@
+import random
+from itertools import combinations
+from math import comb
+
+import pytest
+
+from alpha_watcher.deduper import _MAX_SIMHASH_TABLES, _ExpiringIndex, _NearDuplicateIndex
+
+FULL_MASK = (1 << 64) - 1
+
+
+# ---------- _ExpiringIndex ----------
+
+def test_evicts_oldest_beyond_max_size():
+    evicted = []
+    index = _ExpiringIndex(3, ttl_seconds=100, on_evict=evicted.append)
+    for key in range(5):
+        index.add(key, float(key))
+    assert len(index) == 3
+    assert evicted == [0, 1]
+    assert 0 not in index and 1 not in index
+    assert list(index.items()) == [(2, 2.0), (3, 3.0), (4, 4.0)]
+
+
+def test_expire_drops_entries_older_than_ttl():
+    evicted = []
+    index = _ExpiringIndex(10, ttl_seconds=10, on_evict=evicted.append)
+    for key, ts in ((1, 0.0), (2, 5.0), (3, 10.0)):
+        index.add(key, ts)
+    index.expire(15.0)
+    # 正好 ttl 秒前登记的条目仍保留
+    assert [k for k, _ in index.items()] == [2, 3]
+    assert evicted == [1]
+    index.expire(100.0)
+    assert len(index) == 0
+    assert evicted == [1, 2, 3]
+
+
+def test_readd_refreshes_timestamp_and_position():
+    evicted = []
+    index = _ExpiringIndex(10, ttl_seconds=10, on_evict=evicted.append)
+    index.add(1, 0.0)
+    index.add(2, 1.0)
+    index.add(1, 8.0)
+    assert len(index) == 2
+    assert list(index.items()) == [(2, 1.0), (1, 8.0)]
+    # 旧副本过期时不能删掉刚刷新的键
+    index.expire(12.0)
+    assert list(index.items()) == [(1, 8.0)]
+    assert evicted == [2]
+    index.expire(20.0)
+    assert len(index) == 0
+    assert evicted == [2, 1]
+
+
+def test_readd_does_not_count_towards_max_size():
+    evicted = []
+    index = _ExpiringIndex(2, ttl_seconds=100, on_evict=evicted.append)
+    index.add(1, 0.0)
+    index.add(2, 1.0)
+    index.add(1, 2.0)
+    assert evicted == []
+    index.add(3, 3.0)
+    # 队首是 1 的旧副本，跳过后淘汰的是 2
+    assert evicted == [2]
+    assert list(index.items()) == [(1, 2.0), (3, 3.0)]
+
+
+def test_load_restores_in_timestamp_order():
+    index = _ExpiringIndex(2, ttl_seconds=100)
+    index.add(99, 0.0)
+    index.load([(3, 30.0), (1, 10.0), (2, 20.0)])
+    assert 99 not in index
+    # 按时间排序后登记，超出上限时淘汰最早的
+    assert list(index.items()) == [(2, 20.0), (3, 30.0)]
+
+
+# ---------- _NearDuplicateIndex ----------
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def _blocks(masks):
+    """表掩码由若干互不重叠的块组成：单块即在所有表掩码中同时出现或同时缺席的最小位集合。"""
+    signature: dict[tuple[bool, ...], int] = {}
+    for bit in range(64):
+        key = tuple(bool(mask >> bit & 1) for mask in masks)
+        signature[key] = signature.get(key, 0) | 1 << bit
+    return list(signature.values())
+
+
+@pytest.mark.parametrize('max_size, max_distance', [
+    (300, 0), (300, 3), (300, 7), (10 ** 6, 3), (10 ** 6, 7),
+])
+def test_band_layout(max_size, max_distance):
+    index = _NearDuplicateIndex(max_size, 100, max_distance)
+    masks = index._table_masks
+    assert len(masks) <= _MAX_SIMHASH_TABLES
+
+    blocks = _blocks(masks)
+    assert sum(blocks) == FULL_MASK
+    # 均分 64 位，块宽最多相差 1
+    widths = [b.bit_count() for b in blocks]
+    assert max(widths) - min(widths) <= 1
+
+    # 块数 = max_distance + 1 + r，每张表取 r + 1 块，表数为组合数
+    chosen = sum(1 for b in blocks if masks[0] & b == b)
+    assert len(blocks) == max_distance + chosen
+    assert len(masks) == comb(len(blocks), chosen)
+    assert sorted(masks) == sorted(sum(c) for c in combinations(blocks, chosen))
+
+
+@pytest.mark.parametrize('max_size, max_distance, tables', [
+    # 4 块各 16 位已足够区分 300 条
+    (300, 3, 4),
+    # 百万条需要更长的桶键：5 块取 2，10 张表
+    (10 ** 6, 3, 10),
+    # 默认阈值（距离 4）：300 条 5 张表，3000 条起 15 张，之后不再增长
+    (300, 4, 5),
+    (3000, 4, 15),
+    (300000, 4, 15),
+    # 再加一块就要 36 张表，超过上限，停在 8 块取 1
+    (300, 7, 8),
+    (300000, 7, 8),
+])
+def test_table_count_grows_with_history_until_capped(max_size, max_distance, tables):
+    """
+    查询代价与表数量成正比。表数量随 max_size 增长（有意的取舍：亚线性而非常数），
+    到 _MAX_SIMHASH_TABLES 为止；此后桶键不再加长，每桶候选数随历史线性增长。
+    """
+    index = _NearDuplicateIndex(max_size, 100, max_distance)
+    masks = index._table_masks
+    assert len(masks) == tables
+    blocks = len(_blocks(masks))
+    chosen = blocks - max_distance
+    key_bits = min(mask.bit_count() for mask in masks)
+    # 桶键位数足够区分 max_size 条历史，或再多分一块会超过表数量上限
+    assert key_bits >= max_size.bit_length() + 2 or comb(blocks + 1, chosen + 1) > _MAX_SIMHASH_TABLES
+
+
+@pytest.mark.parametrize('max_distance', [1, 3, 7])
+def test_finds_every_neighbour_within_max_distance(max_distance):
+    rng = random.Random(max_distance)
+    index = _NearDuplicateIndex(10 ** 5, 100, max_distance)
+    base = rng.getrandbits(64)
+    index.add(base, 0.0)
+    assert index.find(base) == 0
+    for _ in range(500):
+        k = rng.randint(1, max_distance)
+        assert index.find(_flip(base, rng.sample(range(64), k))) == k
+    # 翻转位均匀分散到各块时也至少有 r + 1 块保持不变
+    step = 64 // (max_distance + 1)
+    assert index.find(_flip(base, range(0, step * max_distance, step))) == max_distance
+    assert index.find(_flip(base, rng.sample(range(64), max_distance + 1))) is None
+
+
+def test_find_returns_closest_candidate():
+    index = _NearDuplicateIndex(300, 100, 3)
+    base = 0x0123456789ABCDEF
+    index.add(_flip(base, [1, 20, 40]), 0.0)
+    index.add(_flip(base, [63]), 1.0)
+    assert index.find(base) == 1
+
+
+def test_eviction_and_expiry_remove_buckets():
+    index = _NearDuplicateIndex(2, 10, 3)
+    first, second, third = 0x1111, 0xFFFF << 32, 0xF0F0F0F0F0F0F0F0
+    index.add(first, 0.0)
+    index.add(second, 5.0)
+    index.add(third, 6.0)
+    assert len(index) == 2
+    assert index.find(first) is None
+    assert index.find(_flip(second, [0])) == 1
+    index.expire(15.5)
+    assert index.find(second) is None
+    assert index.find(third) == 0
+    index.expire(100.0)
+    assert len(index) == 0
+    assert all(not buckets for buckets in index._buckets)
+
+
+def test_load_rebuilds_buckets():
+    index = _NearDuplicateIndex(300, 100, 3)
+    index.add(0xABC, 0.0)
+    index.load([(0xDEF0, 2.0), (0x1234 << 40, 1.0)])
+    assert index.find(0xABC) is None
+    assert index.find(0xDEF0) == 0
+    assert [k for k, _ in index.items()] == [0x1234 << 40, 0xDEF0]
@@ -0,0 +1,242 @@
+import asyncio
+
+from alpha_watcher.dispatcher import NotificationDispatcher, _Target
+from alpha_watcher.notifier import NotifyError
+
+
+class FakeTarget:
+    """记录每次发送；failures 中依次取出本次要抛出的错误（None 表示成功）。"""
+
+    def __init__(self, name, channel='wecom', failures=(), log=None):
+        self.name = name
+        self.channel = channel
+        self.failures = list(failures)
+        self.sent = []
+        self.log = log if log is not None else []
+
+    async def send(self, n):
+        await asyncio.sleep(0)
+        error = self.failures.pop(0) if self.failures else None
+        self.log.append((self.name, n.subject, error is None))
+        if error is not None:
+            raise error
+        self.sent.append(n)
+
+    def target(self):
+        return _Target(self.channel, f"key-{self.name}", self.name, self.send)
+
+
+def make_dispatcher(*fakes, **options):
+    options.setdefault('retry_backoff', 0.01)
+    options.setdefault('retry_backoff_max', 0.02)
+    options.setdefault('coalesce_window', 0)
+    dispatcher = NotificationDispatcher([fake.target() for fake in fakes], **options)
+    dispatcher.results = []
+    dispatcher.on_result = lambda n, channel, ok: dispatcher.results.append((n.subject, channel, ok))
+    return dispatcher
+
+
+def submit(dispatcher, subject, channels=('wecom',), tweet_id=1):
+    return dispatcher.submit(subject, f"{subject} text", frozenset(channels), (tweet_id,))
+
+
+def stats_of(dispatcher, fake):
+    stats = {}
+    dispatcher.export(stats)
+    return stats['notifications']['targets'][f"key-{fake.name}"]
+
+
+# ---------- 重试 ----------
+
+def test_retryable_error_is_retried_until_success():
+    fake = FakeTarget('a', failures=[NotifyError('429'), NotifyError('429')])
+    dispatcher = make_dispatcher(fake, max_attempts=3)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'hello')
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert [n.subject for n in fake.sent] == ['hello']
+    stats = stats_of(dispatcher, fake)
+    assert (stats['attempts'], stats['successes'], stats['failures'], stats['retries']) == (3, 1, 2, 2)
+    assert stats['last_error'] == '429'
+    assert dispatcher.results == [('hello', 'wecom', True)]
+
+
+def test_gives_up_after_max_attempts():
+    fake = FakeTarget('a', failures=[NotifyError('down')] * 5)
+    dispatcher = make_dispatcher(fake, max_attempts=3)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'hello')
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert fake.sent == []
+    stats = stats_of(dispatcher, fake)
+    assert (stats['attempts'], stats['failures'], stats['retries']) == (3, 3, 2)
+    assert dispatcher.results == [('hello', 'wecom', False)]
+
+
+def test_non_retryable_error_is_not_retried():
+    fake = FakeTarget('a', failures=[NotifyError('invalid webhook', retryable=False)])
+    dispatcher = make_dispatcher(fake, max_attempts=3)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'hello')
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert len(fake.log) == 1
+    assert stats_of(dispatcher, fake)['retries'] == 0
+    assert dispatcher.results == [('hello', 'wecom', False)]
+
+
+def test_retrying_target_keeps_order_and_does_not_block_others():
+    log = []
+    slow = FakeTarget('slow', failures=[NotifyError('429')], log=log)
+    fast = FakeTarget('fast', log=log)
+    dispatcher = make_dispatcher(slow, fast, retry_backoff=0.05, retry_backoff_max=0.05)
+
+    async def main():
+        dispatcher.start()
+        for i in range(3):
+            submit(dispatcher, f"n{i}", tweet_id=i)
+        await dispatcher.close()
+    asyncio.run(main())
+
+    # workers = 1：重试期间后面的通知不会越过正在重试的那条
+    assert [n.subject for n in slow.sent] == ['n0', 'n1', 'n2']
+    assert [n.subject for n in fast.sent] == ['n0', 'n1', 'n2']
+    # 另一个目标在退避期间照常发送完毕
+    assert log.index(('fast', 'n2', True)) < log.index(('slow', 'n0', True))
+
+
+# ---------- 入队 ----------
+
+def test_notification_only_goes_to_its_channels():
+    email = FakeTarget('mail', channel='email')
+    wecom = FakeTarget('hook')
+    dispatcher = make_dispatcher(email, wecom)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'wecom only', channels=('wecom',))
+        submit(dispatcher, 'nowhere', channels=())
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert email.sent == []
+    assert [n.subject for n in wecom.sent] == ['wecom only']
+
+
+def test_full_queue_drops_and_reports():
+    fake = FakeTarget('a')
+    dispatcher = make_dispatcher(fake, queue_size=1)
+
+    async def main():
+        # worker 尚未启动，队列只容纳一条
+        assert submit(dispatcher, 'first')
+        assert not submit(dispatcher, 'second', tweet_id=2)
+        dispatcher.start()
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert [n.subject for n in fake.sent] == ['first']
+    assert dispatcher.dropped == 1
+    assert ('second', 'wecom', False) in dispatcher.results
+
+
+# ---------- 突发合并 ----------
+
+def test_first_notification_is_immediate_then_burst_is_coalesced():
+    fake = FakeTarget('a')
+    dispatcher = make_dispatcher(fake, coalesce_window=0.05, coalesce_max_delay=1)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'hit', tweet_id=1)
+        await asyncio.sleep(0.01)
+        assert [n.trace_ids for n in fake.sent] == [(1,)]
+        submit(dispatcher, 'hit', tweet_id=2)
+        submit(dispatcher, 'hit', tweet_id=3)
+        await asyncio.sleep(0.02)
+        assert len(fake.sent) == 1
+        # 静默 coalesce_window 秒后合并发送
+        await asyncio.sleep(0.1)
+        assert len(fake.sent) == 2
+        await dispatcher.close()
+    asyncio.run(main())
+
+    digest = fake.sent[1]
+    assert digest.subject == 'hit（2 条合并）'
+    assert digest.trace_ids == (2, 3)
+    assert digest.text == '[1] hit text\n\n[2] hit text'
+
+
+def test_coalesce_max_items_flushes_early():
+    fake = FakeTarget('a')
+    dispatcher = make_dispatcher(fake, coalesce_window=10, coalesce_max_delay=10, coalesce_max_items=2)
+
+    async def main():
+        dispatcher.start()
+        for i in range(1, 5):
+            submit(dispatcher, f"n{i}", tweet_id=i)
+        await asyncio.sleep(0.01)
+        # 第 1 条立即发送；2、3 凑满上限，在第 4 条到来时提前发送
+        assert [n.trace_ids for n in fake.sent] == [(1,), (2, 3)]
+        # 关闭时发出仍在合并的通知
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert [n.trace_ids for n in fake.sent] == [(1,), (2, 3), (4,)]
+    assert fake.sent[1].subject == '【重要提醒】2 条新动态合并推送'
+
+
+def test_coalesce_max_delay_bounds_continuous_burst():
+    fake = FakeTarget('a')
+    dispatcher = make_dispatcher(fake, coalesce_window=0.1, coalesce_max_delay=0.2)
+
+    async def main():
+        dispatcher.start()
+        # 每 0.03 秒一条，静默窗口永远等不到；距第一条 coalesce_max_delay 秒时仍要发送
+        for i in range(15):
+            submit(dispatcher, 'hit', tweet_id=i)
+            await asyncio.sleep(0.03)
+        assert len(fake.sent) >= 2
+        await dispatcher.close()
+    asyncio.run(main())
+
+    assert [tid for n in fake.sent for tid in n.trace_ids] == list(range(15))
+
+
+# ---------- 统计 ----------
+
+def test_stats_round_trip_and_legacy_target_keys():
+    fake = FakeTarget('a')
+    dispatcher = make_dispatcher(fake)
+
+    async def main():
+        dispatcher.start()
+        submit(dispatcher, 'hello')
+        await dispatcher.close()
+    asyncio.run(main())
+
+    stats = {}
+    dispatcher.export(stats)
+    assert stats['notifications']['wecom']['successes'] == 1
+    assert stats['notifications']['targets']['key-a']['name'] == 'a'
+
+    restored = make_dispatcher(FakeTarget('a'))
+    restored.restore(stats)
+    assert stats_of(restored, fake)['successes'] == 1
+
+    # 旧版以日志名称为键的目标统计迁移到当前的 key
+    legacy = {'notifications': {'targets': {'a': {'attempts': 4, 'successes': 4}}}}
+    migrated = make_dispatcher(FakeTarget('a'))
+    migrated.restore(legacy)
+    assert stats_of(migrated, fake)['attempts'] == 4
@@ -0,0 +1,109 @@
+import configparser
+import time
+
+import pytest
+
+from alpha_watcher.dedup_store import DedupState, JournalStore
+from alpha_watcher.engine import AsyncWatcher
+from alpha_watcher.fetchers import Tweet
+
+
+def make_watcher(target_username='binance'):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_dict({
+        'TWITTER': {'target_username': target_username},
+        'Scraper': {'nitter_instances': 'http://127.0.0.1:9', 'keywords': '空投'},
+        'Dedup': {'near_duplicate': 'true', 'min_push_interval': '90'},
+    })
+    return AsyncWatcher(config)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # 去重状态、stats.json 等写在临时目录
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def watcher(workdir):
+    return make_watcher()
+
+
+def count_calls(monkeypatch, obj, name):
+    calls = []
+    original = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, wrapper)
+    return calls
+
+
+def tweet(tweet_id, text):
+    return Tweet(tweet_id, 'binance', text, f"https://twitter.com/binance/status/{tweet_id}")
+
+
+def test_new_tweet_is_looked_up_once(watcher, monkeypatch):
+    state = watcher.states['binance']
+    seen = count_calls(monkeypatch, state.deduper, 'seen')
+    find = count_calls(monkeypatch, state.deduper._near, 'find')
+
+    assert watcher._process(state, tweet(1, '币安 空投 第 1 期'), 'test', time.time())
+    assert len(seen) == 1
+    assert len(find) == 1
+    assert state.deduper.seen('1', '币安 空投 第 1 期')
+
+
+def test_min_push_interval_defers_without_second_lookup(watcher, monkeypatch):
+    state = watcher.states['binance']
+    assert watcher._process(state, tweet(1, '币安 空投 第 1 期'), 'test', time.time())
+
+    seen = count_calls(monkeypatch, state.deduper, 'seen')
+    # 距上次推送不足 min_push_interval：留到下一轮，且不登记
+    assert not watcher._process(state, tweet(2, 'Launchpool 空投 开始'), 'test', time.time())
+    assert len(seen) == 1
+    assert not state.deduper.seen('2', 'Launchpool 空投 开始')
+
+
+# ---------- 旧版去重状态的归属 ----------
+
+def write_legacy_state(workdir, tweet_id, journal=False):
+    store = JournalStore(str(workdir / 'dedup_state.json'))
+    if journal:
+        store.append('id', tweet_id, time.time())
+    else:
+        store.compact(DedupState(ids=[(tweet_id, time.time())]))
+    store.close()
+
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_legacy_state_is_adopted_by_first_account(workdir, journal):
+    write_legacy_state(workdir, 42, journal=journal)
+    watcher = make_watcher('binance, binancezh')
+
+    assert not (workdir / 'dedup_state.json').exists()
+    assert not (workdir / 'dedup_state.json.journal').exists()
+    assert watcher.states['binance'].deduper.seen('42', '')
+    assert not watcher.states['binancezh'].deduper.seen('42', '')
+
+
+def test_reordering_accounts_keeps_legacy_state_with_its_owner(workdir):
+    write_legacy_state(workdir, 42)
+    make_watcher('binance, binancezh')
+
+    watcher = make_watcher('binancezh, binance')
+    assert watcher.states['binance'].deduper.seen('42', '')
+    assert not watcher.states['binancezh'].deduper.seen('42', '')
+
+
+def test_legacy_state_does_not_overwrite_existing_account_state(workdir):
+    JournalStore(str(workdir / 'dedup_state.binance.json')).compact(DedupState(ids=[(7, time.time())]))
+    write_legacy_state(workdir, 42)
+
+    watcher = make_watcher('binance')
+    assert watcher.states['binance'].deduper.seen('7', '')
+    assert not watcher.states['binance'].deduper.seen('42', '')
+    assert (workdir / 'dedup_state.json').exists()
@@ -0,0 +1,155 @@
+import configparser
+
+import pytest
+
+from alpha_watcher import router
+from alpha_watcher.router import CLOSED, HALF_OPEN, OPEN, InstanceRouter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(router.time, 'time', fake.time)
+    return fake
+
+
+@pytest.fixture
+def r(clock):
+    return InstanceRouter(failure_threshold=3, cooldown_seconds=60, max_cooldown_seconds=200)
+
+
+def state(r, name):
+    return r._health[name].state
+
+
+def fail(r, name, times=1):
+    for _ in range(times):
+        r.record(name, False, 1.0)
+
+
+def test_opens_after_consecutive_failures(r):
+    fail(r, 'a', 2)
+    assert state(r, 'a') == CLOSED
+    assert 'a' in r.order(['a', 'b'])
+    fail(r, 'a')
+    assert state(r, 'a') == OPEN
+    assert r.order(['a', 'b']) == ['b']
+
+
+def test_success_resets_failure_count(r):
+    fail(r, 'a', 2)
+    r.record('a', True, 1.0)
+    fail(r, 'a', 2)
+    assert state(r, 'a') == CLOSED
+
+
+def test_half_open_after_cooldown_allows_single_probe(r, clock):
+    fail(r, 'a', 3)
+    clock.advance(59)
+    assert r.due_probes(['a', 'b']) == []
+    assert state(r, 'a') == OPEN
+    clock.advance(1)
+    assert r.due_probes(['a', 'b']) == ['a']
+    assert state(r, 'a') == HALF_OPEN
+    # 探测进行中不再重复发起，半开来源也不参与常规顺序
+    assert r.due_probes(['a', 'b']) == []
+    assert r.order(['a', 'b']) == ['b']
+
+
+def test_probe_success_closes(r, clock):
+    fail(r, 'a', 3)
+    clock.advance(60)
+    assert r.due_probes(['a']) == ['a']
+    r.record('a', True, 1.0)
+    assert state(r, 'a') == CLOSED
+    assert r._health['a'].cooldown == 0
+    assert 'a' in r.order(['a', 'b'])
+    # 恢复后需要重新累计 failure_threshold 次失败才会再次熔断
+    fail(r, 'a', 2)
+    assert state(r, 'a') == CLOSED
+
+
+def test_probe_failure_doubles_cooldown_up_to_max(r, clock):
+    fail(r, 'a', 3)
+    cooldowns = []
+    for _ in range(4):
+        clock.advance(r._health['a'].cooldown)
+        assert r.due_probes(['a']) == ['a']
+        fail(r, 'a')
+        assert state(r, 'a') == OPEN
+        cooldowns.append(r._health['a'].cooldown)
+    assert cooldowns == [120, 200, 200, 200]
+    # 冷却未结束前保持熔断
+    clock.advance(199)
+    assert r.due_probes(['a']) == []
+
+
+def test_all_open_falls_back_to_every_source(r):
+    fail(r, 'a', 3)
+    fail(r, 'b', 3)
+    assert sorted(r.order(['a', 'b'])) == ['a', 'b']
+    assert state(r, 'a') == OPEN and state(r, 'b') == OPEN
+
+
+def test_order_by_expected_cost(r):
+    r.record('slow', True, 10.0)
+    r.record('fast', True, 0.1)
+    r.record('flaky', True, 0.1)
+    fail(r, 'flaky', 2)
+    assert r.order(['slow', 'flaky', 'fast']) == ['fast', 'flaky', 'slow']
+
+
+def test_unmeasured_source_is_tried_before_measured_ones(r):
+    r.record('nitter', True, 0.05)
+    # 新来源（如 Twitter API）先排在最前，否则快速的实例总会在错峰启动它之前返回
+    assert r.order(['nitter', 'api']) == ['api', 'nitter']
+    # 第一次测量直接替换先验，而不是从 0 缓慢爬升
+    r.record('api', True, 0.8)
+    assert r._health['api'].ewma_latency == pytest.approx(0.8)
+    assert r.order(['nitter', 'api']) == ['nitter', 'api']
+
+
+def test_cancelled_unmeasured_source_uses_elapsed_as_lower_bound(r):
+    r.record('nitter', True, 0.05)
+    r.order(['nitter', 'api'])
+    r.record_cancelled('api', 1.5)
+    assert r._health['api'].ewma_latency == pytest.approx(1.5)
+    assert r.order(['nitter', 'api']) == ['nitter', 'api']
+
+
+def test_initial_latency_from_config(clock):
+    config = configparser.ConfigParser(interpolation=None)
+    config['Router'] = {'initial_latency': '3'}
+    seeded = InstanceRouter.from_config(config)
+    seeded.record('nitter', True, 0.05)
+    assert seeded.order(['nitter', 'api']) == ['nitter', 'api']
+
+
+def test_export_skips_unmeasured_priors(r):
+    r.order(['a', 'b'])
+    r.record('a', True, 0.5)
+    stats = {}
+    r.export(stats)
+    assert list(stats) == ['a']
+
+
+def test_export_and_restore_keep_ewma_but_not_breaker(r):
+    fail(r, 'a', 3)
+    stats = {}
+    r.export(stats)
+    assert stats['a']['breaker'] == OPEN
+    restored = InstanceRouter()
+    restored.restore(stats)
+    assert restored._health['a'].ewma_success == pytest.approx(stats['a']['ewma_success'], abs=1e-4)
+    assert state(restored, 'a') == CLOSED
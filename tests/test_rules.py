@@ -0,0 +1,161 @@
+import configparser
+
+import pytest
+
+from alpha_watcher import rules
+from alpha_watcher.accounts import Account
+from alpha_watcher.rules import Rule, RuleEngine, RuleSyntaxError, parse_expression
+
+
+def lit(text, ignore_case=False):
+    return ('lit', text, ignore_case)
+
+
+@pytest.fixture(params=['native', 'python'])
+def automaton(request, monkeypatch):
+    """分别用 pyahocorasick 与纯 Python 自动机运行。"""
+    if request.param == 'python':
+        monkeypatch.setattr(rules, 'ahocorasick', None)
+    elif rules.ahocorasick is None:
+        pytest.skip("未安装 pyahocorasick")
+    return request.param
+
+
+def engine_for(expression, ignore_case=False):
+    rule = Rule('r', expression, ignore_case=ignore_case)
+    return RuleEngine([(rule, parse_expression(expression, ignore_case))])
+
+
+# ---------- 解析 ----------
+
+@pytest.mark.parametrize('expression, expected', [
+    # NOT > AND > OR
+    ('a OR b AND c', ('or', [lit('a'), ('and', [lit('b'), lit('c')])])),
+    ('a AND b OR c', ('or', [('and', [lit('a'), lit('b')]), lit('c')])),
+    ('NOT a b', ('and', [('not', lit('a')), lit('b')])),
+    ('NOT a OR b', ('or', [('not', lit('a')), lit('b')])),
+    ('NOT NOT a', ('not', ('not', lit('a')))),
+    # 相邻的词与逗号均为 AND
+    ('a b', ('and', [lit('a'), lit('b')])),
+    ('币安,Alpha,积分', ('and', [lit('币安'), lit('Alpha'), lit('积分')])),
+])
+def test_precedence(expression, expected):
+    assert parse_expression(expression) == expected
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('(a OR b) c', ('and', [('or', [lit('a'), lit('b')]), lit('c')])),
+    ('a AND (b OR c)', ('and', [lit('a'), ('or', [lit('b'), lit('c')])])),
+    ('NOT (a OR b)', ('not', ('or', [lit('a'), lit('b')]))),
+    ('((a))', lit('a')),
+])
+def test_parentheses(expression, expected):
+    assert parse_expression(expression) == expected
+
+
+def test_quoted_and_regex_tokens():
+    assert parse_expression('"a OR b"') == lit('a OR b')
+    assert parse_expression(r'"say \"hi\""') == lit('say "hi"')
+    assert parse_expression('/launch(pool|pad)/i') == ('re', 'launch(pool|pad)', True)
+    assert parse_expression('(/alpha/i)') == ('re', 'alpha', True)
+    assert parse_expression('/a/,b') == ('and', [('re', 'a', False), lit('b')])
+    # 运算符只认大写，小写视为普通词
+    assert parse_expression('a and b') == ('and', [lit('a'), lit('and'), lit('b')])
+    assert parse_expression('x', ignore_case=True) == lit('x', True)
+
+
+@pytest.mark.parametrize('expression, expected', [
+    # 结束的 / 后面不是分隔符时整体是普通词，不会拆成正则加零散的词
+    ('/abc/index', lit('/abc/index')),
+    ('/abc/i.html', lit('/abc/i.html')),
+    ('/api/v1/ Launchpool', ('and', [lit('/api/v1/'), lit('Launchpool')])),
+    ('binance.com/zh-CN/support', lit('binance.com/zh-CN/support')),
+])
+def test_path_like_words_are_literals(expression, expected):
+    assert parse_expression(expression) == expected
+
+
+def test_path_like_word_matches_as_substring(automaton):
+    assert engine_for('/abc/index').match('binance', 'see https://x.com/abc/index.html')
+    assert not engine_for('/abc/index').match('binance', 'abc ndex')
+
+
+@pytest.mark.parametrize('expression', [
+    '"unterminated',
+    'a )',
+    '(a',
+    'a AND',
+    'NOT',
+    'OR a',
+    'a OR OR b',
+    '()',
+    '/[/',
+])
+def test_syntax_errors(expression):
+    with pytest.raises(RuleSyntaxError):
+        parse_expression(expression)
+
+
+@pytest.mark.parametrize('expression', ['', '   '])
+def test_empty_expression_matches_everything(expression, automaton):
+    assert parse_expression(expression) == ('true',)
+    assert engine_for(expression).match('anyone', 'whatever')
+
+
+# ---------- 求值 ----------
+
+@pytest.mark.parametrize('expression, text, expected', [
+    ('空投 OR Launchpool AND 币安', '空投来了', True),
+    ('空投 OR Launchpool AND 币安', 'new Launchpool', False),
+    ('空投 OR Launchpool AND 币安', '币安 new Launchpool', True),
+    ('(空投 OR Launchpool) 币安', '空投来了', False),
+    ('(空投 OR Launchpool) 币安', '币安空投', True),
+    ('Alpha NOT 结束', 'Alpha 积分活动', True),
+    ('Alpha NOT 结束', 'Alpha 积分活动已结束', False),
+    ('NOT 结束', '随便什么', True),
+    ('/launch(pool|pad)/i', 'New LAUNCHPAD project', True),
+    ('/launch(pool|pad)/', 'New LAUNCHPAD project', False),
+])
+def test_match(expression, text, expected, automaton):
+    assert bool(engine_for(expression).match('binance', text)) is expected
+
+
+def test_ignore_case(automaton):
+    assert engine_for('alpha', ignore_case=True).match('binance', 'ALPHA 积分')
+    assert not engine_for('alpha').match('binance', 'ALPHA 积分')
+
+
+# ---------- 关键词与规则配置 ----------
+
+def config_with(**sections):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_dict(sections)
+    return config
+
+
+def test_empty_keyword_sets_without_rules_are_unconfigured():
+    engine = RuleEngine.from_config(config_with(), [Account('a'), Account('b')])
+    assert len(engine) == 0
+
+
+def test_account_without_keywords_pushes_everything(automaton):
+    accounts = [Account('a', keywords=['空投']), Account('b')]
+    engine = RuleEngine.from_config(config_with(), accounts)
+    assert [r.name for r in engine.match('b', '任意内容')] == ['keywords:@b']
+    assert engine.match('a', '任意内容') == []
+    assert [r.name for r in engine.match('a', '空投')] == ['keywords:@a']
+
+
+def test_rules_replace_empty_keyword_sets(automaton):
+    config = config_with(**{'Rule:launch': {'match': 'Launchpool', 'channels': 'wecom'}})
+    engine = RuleEngine.from_config(config, [Account('a'), Account('b', keywords=['空投'])])
+    assert [r.name for r in engine.rules] == ['launch', 'keywords']
+    assert engine.match('a', '任意内容') == []
+    assert [r.name for r in engine.match('a', 'new Launchpool')] == ['launch']
+    assert [r.name for r in engine.match('b', '空投 Launchpool')] == ['launch', 'keywords']
+
+
+def test_invalid_rule_is_skipped():
+    config = config_with(**{'Rule:bad': {'match': '(a'}, 'Rule:good': {'match': 'a'}})
+    engine = RuleEngine.from_config(config, [Account('a')])
+    assert [r.name for r in engine.rules] == ['good']
@@ -0,0 +1,132 @@
+import asyncio
+import configparser
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from alpha_watcher import scheduler
+from alpha_watcher.scheduler import PollTimer
+from alpha_watcher.utils import BJT
+
+
+class FakeClock:
+    """单调时钟与墙上时钟分开推进；sleep 时两者同步前进，可在指定次数后注入时钟跳变。"""
+
+    def __init__(self, wall: datetime) -> None:
+        self.mono = 1000.0
+        self.wall = wall.timestamp()
+        self.sleeps: list[float] = []
+        self.on_sleep = None
+
+    def monotonic(self) -> float:
+        return self.mono
+
+    def time(self) -> float:
+        return self.wall
+
+    def advance(self, seconds: float) -> None:
+        self.mono += seconds
+        self.wall += seconds
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.advance(seconds)
+        if self.on_sleep is not None:
+            self.on_sleep(len(self.sleeps))
+
+    def jump_after_first_nap(self, seconds: float) -> None:
+        """第一次 sleep 之后墙上时钟跳变 seconds 秒，单调时钟不变。"""
+        def jump(count: int) -> None:
+            if count == 1:
+                self.wall += seconds
+        self.on_sleep = jump
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 默认在普通时段（北京时间 12:00），不会对齐关键整点
+    fake = FakeClock(BJT.localize(datetime(2025, 3, 3, 12, 0, 0)))
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(fake.wall, tz)
+
+    monkeypatch.setattr(scheduler, 'time', SimpleNamespace(monotonic=fake.monotonic, time=fake.time))
+    monkeypatch.setattr(scheduler, 'datetime', FakeDatetime)
+    monkeypatch.setattr(scheduler, 'asyncio', SimpleNamespace(sleep=fake.sleep))
+    return fake
+
+
+def make_timer(**schedule) -> PollTimer:
+    config = configparser.ConfigParser(interpolation=None)
+    config['Schedule'] = schedule
+    return PollTimer(config, jitter=0, boundary_jitter=0, max_nap=10)
+
+
+def test_deadline_counts_from_tick_start(clock):
+    timer = make_timer()
+    timer.begin()
+    clock.advance(7)  # 本轮抓取耗时
+    assert timer.schedule(60) == pytest.approx(53)
+    asyncio.run(timer.wait())
+    assert clock.mono == pytest.approx(1060)
+    assert max(clock.sleeps) <= 10
+
+
+def test_overrun_starts_next_tick_immediately(clock):
+    timer = make_timer()
+    timer.begin()
+    clock.advance(90)
+    assert timer.schedule(60) == 0
+    asyncio.run(timer.wait())
+    assert clock.sleeps == []
+
+
+def test_aligns_to_critical_boundary(clock):
+    clock.wall = BJT.localize(datetime(2025, 3, 3, 15, 59, 40)).timestamp()
+    timer = make_timer()
+    timer.begin()
+    # 计划区间跨过 16:00，提前到整点检查
+    assert timer.schedule(60) == pytest.approx(20)
+
+
+def test_forward_jump_rebases_interval_deadline(clock):
+    timer = make_timer(critical_minutes='0')
+    timer.begin()
+    timer.schedule(60)
+    # 休眠一小时：墙上时钟前进，单调时钟停走
+    clock.jump_after_first_nap(3600)
+    asyncio.run(timer.wait())
+    # 唤醒后立即检查，而不是按旧的截止时间再等 50 秒
+    assert clock.mono == pytest.approx(1010)
+
+
+def test_small_forward_jump_shortens_remaining_interval(clock):
+    timer = make_timer(critical_minutes='0')
+    timer.begin()
+    timer.schedule(60)
+    clock.jump_after_first_nap(20)
+    asyncio.run(timer.wait())
+    assert clock.mono == pytest.approx(1040)
+
+
+def test_backward_jump_keeps_remaining_interval(clock):
+    timer = make_timer(critical_minutes='0')
+    timer.begin()
+    timer.schedule(60)
+    clock.jump_after_first_nap(-30)
+    asyncio.run(timer.wait())
+    assert clock.mono == pytest.approx(1060)
+
+
+def test_jump_realigns_to_boundary_on_new_wall_clock(clock):
+    clock.wall = BJT.localize(datetime(2025, 3, 3, 17, 0, 0)).timestamp()
+    timer = make_timer()
+    timer.begin()
+    timer.schedule(300)
+    # 第一次醒来时（17:00:10）校时回拨到 15:59:50：剩余间隔不变，但其中出现了关键整点
+    clock.jump_after_first_nap(-(60 * 60 + 20))
+    asyncio.run(timer.wait())
+    assert datetime.fromtimestamp(clock.wall, BJT) == BJT.localize(datetime(2025, 3, 3, 16, 0, 0))